@@ -0,0 +1,58 @@
+"""
+Analytics app admin control panel module.
+"""
+from datetime import timedelta
+
+from django.contrib import admin
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
+
+from .misc import get_sales_series, get_top_sales
+from .models import SalesRollup
+
+
+@admin.register(SalesRollup)
+class SalesRollupAdmin(admin.ModelAdmin):
+    """
+    Read-only admin of the sales rollups with a sales report page.
+
+    Attributes:
+        list_display: Array of fields that displays at the admin panel.
+        list_filter: Array of fields used to filter rollups.
+        date_hierarchy: Field used to drill down the rollups by date.
+        change_list_template: Template of the rollups list with the report link.
+
+    Methods:
+        get_urls: Add report page url.
+        report_view: Render sales report of the last days.
+    """
+    list_display = 'bucket', 'granularity', 'dimension', 'key', 'revenue', 'orders', 'units'
+    list_filter = 'granularity', 'dimension'
+    date_hierarchy = 'bucket'
+    change_list_template = 'admin/analytics/salesrollup_change_list.html'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('report/', self.admin_site.admin_view(self.report_view), name='analytics_sales_report'),
+        ] + super().get_urls()
+
+    def report_view(self, request):
+        days = 30
+        end = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        start = end - timedelta(days=days)
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': f'Продажи за {days} дней',
+            'series': get_sales_series(SalesRollup.Granularity.DAY, start, end),
+            'products': get_top_sales(SalesRollup.Dimension.PRODUCT, start, end),
+            'categories': get_top_sales(SalesRollup.Dimension.CATEGORY, start, end),
+        }
+        return TemplateResponse(request, 'admin/analytics/sales_report.html', context)
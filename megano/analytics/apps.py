@@ -0,0 +1,27 @@
+"""
+Analytics app config module
+"""
+from django.apps import AppConfig
+
+
+class AnalyticsConfig(AppConfig):
+    """
+    Config of the analytics app.
+
+    Attributes:
+        default_auto_field: A field that automatically increases when an object is added.
+        name: Name of the app.
+        verbose_name: Representing name of the app.
+
+    Methods:
+        ready: Subscribe rollups update to the order events.
+    """
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'analytics'
+    verbose_name = 'Аналитика'
+
+    def ready(self):
+        from orders.outbox import CallbackHandler
+        from .rollups import schedule_rollups_update
+
+        CallbackHandler.subscribe(schedule_rollups_update)
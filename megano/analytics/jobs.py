@@ -0,0 +1,21 @@
+"""
+Background jobs of the analytics app.
+"""
+from jobs.queue import job
+from .rollups import update_sales_rollups
+
+
+@job
+def update_rollups() -> int:
+    """
+    Apply all pending order events to the sales rollups.
+
+    Returns:
+        int: Number of processed events.
+    """
+    processed = 0
+    while True:
+        batch = update_sales_rollups()
+        processed += batch
+        if not batch:
+            return processed
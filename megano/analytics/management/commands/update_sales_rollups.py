@@ -0,0 +1,44 @@
+"""
+Updater of the sales rollups.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from analytics.rollups import rebuild_sales_rollups, update_sales_rollups
+
+
+class Command(BaseCommand):
+    """
+    Apply pending order events to the sales rollups.
+
+    Runs once by default, or keeps updating with --interval. With --rebuild
+    all rollups are recomputed from the orders.
+    """
+    help = 'Update hourly and daily sales rollups.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Number of events processed per batch.')
+        parser.add_argument('--rebuild', action='store_true', help='Recompute all rollups from the orders.')
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Keep updating with this pause (in seconds) between runs.',
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            written = rebuild_sales_rollups()
+            self.stdout.write(f'Rebuilt rollups, {written} hourly rows')
+        while True:
+            processed = 0
+            while True:
+                batch = update_sales_rollups(options['batch_size'])
+                processed += batch
+                if not batch:
+                    break
+            self.stdout.write(f'Processed {processed} order events')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.4 on 2026-10-18 22:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Агрегация')),
+                ('position', models.BigIntegerField(default=0, verbose_name='Последнее событие')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Отметка агрегации',
+                'verbose_name_plural': 'Отметки агрегации',
+            },
+        ),
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Час'), ('day', 'День')], max_length=5, verbose_name='Период')),
+                ('bucket', models.DateTimeField(verbose_name='Начало периода')),
+                ('dimension', models.CharField(choices=[('total', 'Всего'), ('product', 'Товар'), ('category', 'Категория')], max_length=10, verbose_name='Разрез')),
+                ('key', models.BigIntegerField(default=0, verbose_name='Ключ')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Выручка')),
+                ('orders', models.PositiveIntegerField(default=0, verbose_name='Заказы')),
+                ('units', models.PositiveIntegerField(default=0, verbose_name='Продано единиц')),
+            ],
+            options={
+                'verbose_name': 'Продажи',
+                'verbose_name_plural': 'Продажи',
+                'constraints': [models.UniqueConstraint(fields=('granularity', 'dimension', 'bucket', 'key'), name='unique_sales_rollup')],
+            },
+        ),
+    ]
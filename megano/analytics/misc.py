@@ -0,0 +1,75 @@
+"""
+Misc functions for analytics app.
+"""
+from datetime import datetime
+
+from django.db.models import Sum
+
+from products.models import Category, Product
+from .models import SalesRollup
+
+
+def get_sales_series(granularity: str, start: datetime, end: datetime) -> list[dict]:
+    """
+    Get total sales of every period in the range.
+
+    Args:
+        granularity: Period length.
+        start: Range start.
+        end: Range end (exclusive).
+
+    Returns:
+        list: Periods with revenue, orders and units.
+    """
+    rows = (SalesRollup.objects
+            .filter(
+                granularity=granularity,
+                dimension=SalesRollup.Dimension.TOTAL,
+                key=0,
+                bucket__gte=start,
+                bucket__lt=end,
+            )
+            .order_by('bucket')
+            .values('bucket', 'revenue', 'orders', 'units'))
+    return list(rows)
+
+
+def get_top_sales(dimension: str, start: datetime, end: datetime, limit: int = 10) -> list[dict]:
+    """
+    Get products or categories with the highest revenue in the range.
+
+    Daily rollups are used, so the range is rounded to whole days.
+
+    Args:
+        dimension: Aggregation dimension (product or category).
+        start: Range start.
+        end: Range end (exclusive).
+        limit: Number of returned rows.
+
+    Returns:
+        list: Rows with primary key, title, revenue, orders and units.
+    """
+    rows = list(
+        SalesRollup.objects
+        .filter(
+            granularity=SalesRollup.Granularity.DAY,
+            dimension=dimension,
+            bucket__gte=start,
+            bucket__lt=end,
+        )
+        .values('key')
+        .annotate(total_revenue=Sum('revenue'), total_orders=Sum('orders'), total_units=Sum('units'))
+        .order_by('-total_revenue')[:limit]
+    )
+    model = Product if dimension == SalesRollup.Dimension.PRODUCT else Category
+    titles = dict(model.objects.filter(pk__in=[row['key'] for row in rows]).values_list('pk', 'title'))
+    return [
+        {
+            'id': row['key'],
+            'title': titles.get(row['key']),
+            'revenue': row['total_revenue'],
+            'orders': row['total_orders'],
+            'units': row['total_units'],
+        }
+        for row in rows
+    ]
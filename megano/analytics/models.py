@@ -0,0 +1,74 @@
+"""
+Analytics app models.
+"""
+from django.db import models
+
+
+class SalesRollup(models.Model):
+    """
+    Represents sales of one period aggregated by product, by category or in total.
+
+    Meta:
+        verbose_name: representing name of the model.
+        verbose_name_plural: plural form of the verbose_name.
+        constraints: One row per period, dimension and key.
+
+    Attributes:
+        Granularity: Period lengths.
+        Dimension: Aggregation dimensions.
+        granularity: Period length.
+        bucket: Period start.
+        dimension: Aggregation dimension.
+        key: Product or category primary key (0 for the totals and the products without a category).
+        revenue: Cost of the sold products.
+        orders: Number of paid orders.
+        units: Number of sold items.
+    """
+    class Granularity(models.TextChoices):
+        HOUR = 'hour', 'Час'
+        DAY = 'day', 'День'
+
+    class Dimension(models.TextChoices):
+        TOTAL = 'total', 'Всего'
+        PRODUCT = 'product', 'Товар'
+        CATEGORY = 'category', 'Категория'
+
+    class Meta:
+        verbose_name = 'Продажи'
+        verbose_name_plural = 'Продажи'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['granularity', 'dimension', 'bucket', 'key'],
+                name='unique_sales_rollup',
+            ),
+        ]
+
+    granularity = models.CharField(max_length=5, choices=Granularity.choices, verbose_name='Период')
+    bucket = models.DateTimeField(verbose_name='Начало периода')
+    dimension = models.CharField(max_length=10, choices=Dimension.choices, verbose_name='Разрез')
+    key = models.BigIntegerField(default=0, verbose_name='Ключ')
+    revenue = models.DecimalField(decimal_places=2, max_digits=14, default=0, verbose_name='Выручка')
+    orders = models.PositiveIntegerField(default=0, verbose_name='Заказы')
+    units = models.PositiveIntegerField(default=0, verbose_name='Продано единиц')
+
+
+class RollupWatermark(models.Model):
+    """
+    Represents position of an incremental rollup in the order events stream.
+
+    Meta:
+        verbose_name: representing name of the model.
+        verbose_name_plural: plural form of the verbose_name.
+
+    Attributes:
+        name: Rollup name.
+        position: Primary key of the last processed order event.
+        updated: When the rollup was updated.
+    """
+    class Meta:
+        verbose_name = 'Отметка агрегации'
+        verbose_name_plural = 'Отметки агрегации'
+
+    name = models.CharField(max_length=50, unique=True, verbose_name='Агрегация')
+    position = models.BigIntegerField(default=0, verbose_name='Последнее событие')
+    updated = models.DateTimeField(auto_now=True, verbose_name='Обновлено')
@@ -0,0 +1,237 @@
+"""
+Incremental sales rollups.
+
+Hourly rollups are computed from the paid order lines and daily rollups are
+computed from the hourly ones. The rollups are updated from the order events
+outbox: every batch of events after the stored watermark marks the hours of
+the changed orders, and only those hours and their days are recomputed. An
+order that is paid or declined long after it was created simply recomputes
+its old hour, so late updates are applied without rescanning the history.
+
+Revenue is the cost of the sold products without the delivery.
+"""
+from collections.abc import Iterable
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from orders.models import OrderEvent, OrderItem
+from orders.outbox import ORDER_CONFIRMED, ORDER_DECLINED, ORDER_PAID
+from .models import RollupWatermark, SalesRollup
+
+ROLLUP_NAME = 'sales'
+
+SALES_EVENT_TYPES = ORDER_CONFIRMED, ORDER_PAID, ORDER_DECLINED
+
+HOUR = timedelta(hours=1)
+
+DIMENSIONS = (
+    (SalesRollup.Dimension.TOTAL, None),
+    (SalesRollup.Dimension.PRODUCT, 'product_id'),
+    (SalesRollup.Dimension.CATEGORY, 'product__category_id'),
+)
+
+
+def truncate_hour(moment: datetime) -> datetime:
+    """
+    Get start of the hour in the current time zone.
+
+    Args:
+        moment: Aware datetime.
+
+    Returns:
+        datetime: Start of the hour.
+    """
+    return timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+
+
+def truncate_day(moment: datetime) -> datetime:
+    """
+    Get start of the day in the current time zone.
+
+    Args:
+        moment: Aware datetime.
+
+    Returns:
+        datetime: Start of the day.
+    """
+    return timezone.localtime(moment).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _to_ranges(buckets: Iterable[datetime], length: timedelta) -> list[tuple[datetime, datetime]]:
+    ranges = []
+    for start in sorted(set(buckets)):
+        if ranges and ranges[-1][1] == start:
+            ranges[-1] = ranges[-1][0], start + length
+        else:
+            ranges.append((start, start + length))
+    return ranges
+
+
+def _in_ranges(field: str, ranges: list[tuple[datetime, datetime]]) -> Q:
+    condition = Q()
+    for start, end in ranges:
+        condition |= Q(**{f'{field}__gte': start, f'{field}__lt': end})
+    return condition
+
+
+def rebuild_hours(hours: Iterable[datetime]) -> int:
+    """
+    Recompute hourly rollups of the hours and daily rollups of their days.
+
+    Args:
+        hours: Hour starts.
+
+    Returns:
+        int: Number of written hourly rollups.
+    """
+    hour_ranges = _to_ranges(hours, HOUR)
+    if not hour_ranges:
+        return 0
+    items = (OrderItem.objects
+             .filter(_in_ranges('order__date', hour_ranges), order__status=2)
+             .annotate(bucket=TruncHour('order__date')))
+    revenue = Sum(F('price') * F('count'), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+    rollups = []
+    for dimension, field in DIMENSIONS:
+        fields = ('bucket', field) if field else ('bucket',)
+        rows = items.values(*fields).annotate(
+            revenue=revenue,
+            units=Sum('count'),
+            orders=Count('order', distinct=True),
+        )
+        rollups.extend(
+            SalesRollup(
+                granularity=SalesRollup.Granularity.HOUR,
+                bucket=row['bucket'],
+                dimension=dimension,
+                # Sales of the products without a category are kept under key 0.
+                key=(row[field] or 0) if field else 0,
+                revenue=row['revenue'],
+                units=row['units'],
+                orders=row['orders'],
+            )
+            for row in rows
+        )
+
+    days = set()
+    for start, end in hour_ranges:
+        day = truncate_day(start)
+        while day < end:
+            days.add(day)
+            # Noon of the next day is on the next date even across DST changes.
+            day = truncate_day(day + timedelta(hours=36))
+    day_ranges = _to_ranges(days, timedelta(days=1))
+    with transaction.atomic():
+        SalesRollup.objects.filter(
+            _in_ranges('bucket', hour_ranges),
+            granularity=SalesRollup.Granularity.HOUR,
+        ).delete()
+        SalesRollup.objects.bulk_create(rollups, batch_size=500)
+        _rebuild_days(day_ranges)
+    return len(rollups)
+
+
+def _rebuild_days(day_ranges: list[tuple[datetime, datetime]]) -> None:
+    rows = (SalesRollup.objects
+            .filter(_in_ranges('bucket', day_ranges), granularity=SalesRollup.Granularity.HOUR)
+            .annotate(day=TruncDay('bucket'))
+            .values('day', 'dimension', 'key')
+            .annotate(day_revenue=Sum('revenue'), day_units=Sum('units'), day_orders=Sum('orders')))
+    rollups = [
+        SalesRollup(
+            granularity=SalesRollup.Granularity.DAY,
+            bucket=row['day'],
+            dimension=row['dimension'],
+            key=row['key'],
+            revenue=row['day_revenue'],
+            units=row['day_units'],
+            orders=row['day_orders'],
+        )
+        for row in rows
+    ]
+    SalesRollup.objects.filter(_in_ranges('bucket', day_ranges), granularity=SalesRollup.Granularity.DAY).delete()
+    SalesRollup.objects.bulk_create(rollups, batch_size=500)
+
+
+def update_sales_rollups(batch_size: int = None) -> int:
+    """
+    Apply one batch of order events after the watermark to the rollups.
+
+    Events younger than ANALYTICS_ROLLUP_SETTLE_SECONDS are left for the
+    next run, so events of transactions committed out of order are not
+    skipped by the watermark.
+
+    Args:
+        batch_size: Maximum number of processed events. Defaults to ANALYTICS_ROLLUP_BATCH_SIZE.
+
+    Returns:
+        int: Number of processed events.
+    """
+    batch_size = batch_size or settings.ANALYTICS_ROLLUP_BATCH_SIZE
+    settled = timezone.now() - timedelta(seconds=settings.ANALYTICS_ROLLUP_SETTLE_SECONDS)
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=ROLLUP_NAME)
+        events = list(
+            OrderEvent.objects
+            .filter(pk__gt=watermark.position, created__lt=settled)
+            .order_by('pk')
+            .values_list('pk', 'type', 'order__date')[:batch_size]
+        )
+        if not events:
+            return 0
+        rebuild_hours(truncate_hour(date) for _, event_type, date in events if event_type in SALES_EVENT_TYPES)
+        watermark.position = events[-1][0]
+        watermark.save()
+    return len(events)
+
+
+def rebuild_sales_rollups(days_per_batch: int = 7) -> int:
+    """
+    Recompute all rollups from the orders and move the watermark to the last order event.
+
+    Used to build the rollups of the orders created before the events outbox.
+
+    Args:
+        days_per_batch: Number of days recomputed per transaction.
+
+    Returns:
+        int: Number of written hourly rollups.
+    """
+    from orders.models import Order
+
+    last_event_id = OrderEvent.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+    first_date = Order.objects.order_by('date').values_list('date', flat=True).first()
+    written = 0
+    if first_date is not None:
+        start = truncate_day(first_date)
+        end = timezone.now()
+        while start <= end:
+            hours = (start + HOUR * number for number in range(24 * days_per_batch))
+            written += rebuild_hours(hours)
+            start += timedelta(days=days_per_batch)
+    RollupWatermark.objects.update_or_create(name=ROLLUP_NAME, defaults={'position': last_event_id})
+    return written
+
+
+def schedule_rollups_update(event: OrderEvent) -> None:
+    """
+    Queue rollups update after an order event that changes sales.
+
+    Updates are delayed by ANALYTICS_ROLLUP_DELAY seconds, so events of that
+    period are applied in one batch.
+
+    Args:
+        event: Dispatched order event.
+    """
+    if event.type not in SALES_EVENT_TYPES:
+        return
+    from jobs.queue import enqueue
+    from .jobs import update_rollups
+
+    enqueue(update_rollups, dedup_key='analytics.update_rollups', delay=settings.ANALYTICS_ROLLUP_DELAY)
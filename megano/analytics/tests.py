@@ -0,0 +1,94 @@
+"""
+Analytics app tests.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+from orders.outbox import ORDER_DECLINED, ORDER_PAID, record_order_event
+from products.models import Category, Product
+from .models import SalesRollup
+from .rollups import rebuild_sales_rollups, truncate_day, truncate_hour, update_sales_rollups
+
+Granularity, Dimension = SalesRollup.Granularity, SalesRollup.Dimension
+
+
+@override_settings(ANALYTICS_ROLLUP_SETTLE_SECONDS=0)
+class SalesRollupTests(TestCase):
+    """
+    Tests of the incremental sales rollups.
+    """
+    def setUp(self):
+        self.category = Category.objects.create(title='Phones')
+        self.phone = Product.objects.create(title='Phone', description='Phone', fullDescription='Phone', price=100,
+                                            category=self.category)
+        self.case = Product.objects.create(title='Case', description='Case', fullDescription='Case', price=5)
+        self.date = timezone.now() - timedelta(days=3)
+
+    def create_order(self, date=None, **counts) -> Order:
+        order = Order.objects.create()
+        Order.objects.filter(pk=order.pk).update(date=date or self.date)
+        order.refresh_from_db()
+        products = {'phone': self.phone, 'case': self.case}
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, product=products[name], count=count, price=products[name].price)
+            for name, count in counts.items()
+        )
+        return order
+
+    def pay(self, order: Order) -> None:
+        Order.objects.filter(pk=order.pk).update(status=2)
+        record_order_event(order, ORDER_PAID)
+
+    def rollups(self, granularity: str = Granularity.HOUR) -> dict:
+        return {
+            (rollup.dimension, rollup.key): (rollup.revenue, rollup.units, rollup.orders)
+            for rollup in SalesRollup.objects.filter(granularity=granularity)
+        }
+
+    def test_paid_orders_are_rolled_up(self):
+        self.pay(self.create_order(phone=2, case=1))
+        self.pay(self.create_order(phone=1))
+        record_order_event(self.create_order(phone=5), ORDER_DECLINED)
+        self.assertEqual(update_sales_rollups(), 3)
+        expected = {
+            (Dimension.TOTAL, 0): (Decimal('305'), 4, 2),
+            (Dimension.PRODUCT, self.phone.pk): (Decimal('300'), 3, 2),
+            (Dimension.PRODUCT, self.case.pk): (Decimal('5'), 1, 1),
+            (Dimension.CATEGORY, self.category.pk): (Decimal('300'), 3, 2),
+            (Dimension.CATEGORY, 0): (Decimal('5'), 1, 1),
+        }
+        self.assertEqual(self.rollups(), expected)
+        self.assertEqual(self.rollups(Granularity.DAY), expected)
+        self.assertEqual(SalesRollup.objects.get(granularity=Granularity.HOUR, dimension=Dimension.TOTAL).bucket,
+                         truncate_hour(self.date))
+        self.assertEqual(SalesRollup.objects.get(granularity=Granularity.DAY, dimension=Dimension.TOTAL).bucket,
+                         truncate_day(self.date))
+
+    def test_late_payment_updates_old_hour(self):
+        self.pay(self.create_order(phone=1))
+        update_sales_rollups()
+        self.pay(self.create_order(date=self.date + timedelta(minutes=1), phone=1))
+        self.assertEqual(update_sales_rollups(), 1)
+        self.assertEqual(self.rollups()[Dimension.TOTAL, 0], (Decimal('200'), 2, 2))
+        self.assertEqual(update_sales_rollups(), 0)
+
+    @override_settings(ANALYTICS_ROLLUP_SETTLE_SECONDS=60)
+    def test_unsettled_events_wait_for_next_run(self):
+        self.pay(self.create_order(phone=1))
+        self.assertEqual(update_sales_rollups(), 0)
+        self.assertFalse(SalesRollup.objects.exists())
+
+    def test_rebuild_matches_incremental_update(self):
+        self.pay(self.create_order(phone=2))
+        self.pay(self.create_order(date=self.date - timedelta(days=1), case=3))
+        update_sales_rollups()
+        hourly, daily = self.rollups(), self.rollups(Granularity.DAY)
+        SalesRollup.objects.all().delete()
+        rebuild_sales_rollups()
+        self.assertEqual(self.rollups(), hourly)
+        self.assertEqual(self.rollups(Granularity.DAY), daily)
+        self.assertEqual(update_sales_rollups(), 0)
@@ -0,0 +1,13 @@
+"""
+Module with urlpatterns for analytics app.
+
+Attributes:
+    urlpatterns: List of url paths that are available for analytics app.
+"""
+from django.urls import path
+
+from .views import SalesView
+
+urlpatterns: list[path] = [
+    path('analytics/sales', SalesView.as_view(), name='analytics-sales'),
+]
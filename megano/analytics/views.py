@@ -0,0 +1,64 @@
+"""
+Views for the analytics app.
+"""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .misc import get_sales_series, get_top_sales
+from .models import SalesRollup
+
+
+class SalesView(APIView):
+    """
+    API view for retrieving sales reports.
+
+    Attributes:
+        permission_classes: Array of permissions required to access the view.
+
+    Methods:
+        get: Retrieve sales series and top products and categories.
+    """
+    permission_classes = [IsAdminUser]
+
+    @classmethod
+    def get(cls, request: Request) -> Response:
+        """
+        Handles get requests.
+
+        Query params:
+            granularity: hour or day (default).
+            from: First day of the report (YYYY-MM-DD), defaults to 30 days ago.
+            to: Last day of the report (YYYY-MM-DD), defaults to today.
+            limit: Number of top products and categories.
+
+        Args:
+            request: Current HTTP request.
+
+        Returns:
+            Response: response with the report or 400 status code.
+        """
+        granularity = request.query_params.get('granularity', SalesRollup.Granularity.DAY)
+        today = timezone.localdate()
+        try:
+            first_day = parse_date(request.query_params.get('from', '')) or today - timedelta(days=29)
+            last_day = parse_date(request.query_params.get('to', '')) or today
+            limit = min(int(request.query_params.get('limit', 10)), 100)
+        except ValueError:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        if granularity not in SalesRollup.Granularity.values or first_day > last_day:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
+        start = timezone.make_aware(datetime.combine(first_day, time.min))
+        end = timezone.make_aware(datetime.combine(last_day + timedelta(days=1), time.min))
+        return Response({
+            'series': get_sales_series(granularity, start, end),
+            'products': get_top_sales(SalesRollup.Dimension.PRODUCT, start, end, limit),
+            'categories': get_top_sales(SalesRollup.Dimension.CATEGORY, start, end, limit),
+        })
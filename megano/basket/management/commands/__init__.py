@@ -0,0 +1 @@
+"""Basket app management commands"""
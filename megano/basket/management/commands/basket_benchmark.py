@@ -0,0 +1,123 @@
+"""
+Basket-heavy load benchmark for session engines.
+"""
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import Client, override_settings
+
+from megano import sessions
+from products.models import Category, Product
+
+
+class SessionWriteCounter:
+    """
+    Database execute wrapper that counts statements writing to the session table.
+
+    Attributes:
+        count: Number of counted statements.
+    """
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        if 'django_session' in sql and not sql.lstrip().upper().startswith('SELECT'):
+            with self._lock:
+                self.count += 1
+        return execute(sql, params, many, context)
+
+    def install(self, sender=None, connection=None, **kwargs) -> None:
+        """
+        Install counter into the database connection.
+
+        Args:
+            sender: Signal sender.
+            connection: Database connection.
+        """
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+
+class Command(BaseCommand):
+    """
+    Simulate shoppers changing their baskets and compare session engines.
+
+    Every shopper keeps its own session and runs a random mix of basket
+    reads, additions and removals.
+    """
+    help = 'Run basket-heavy load against one or more session engines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shoppers', type=int, default=20, help='Number of concurrent shoppers.')
+        parser.add_argument('--requests', type=int, default=50, help='Number of requests per shopper.')
+        parser.add_argument('--products', type=int, default=20, help='Number of benchmark products.')
+        parser.add_argument(
+            '--engine',
+            action='append',
+            dest='engines',
+            help='Session engine to benchmark (can be repeated).',
+        )
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        engines = options['engines'] or ['django.contrib.sessions.backends.db', 'megano.sessions']
+        category = Category.objects.create(title='basket benchmark')
+        products = Product.objects.bulk_create(
+            Product(title=f'benchmark {i}', description='', fullDescription='', price=i + 1, category=category)
+            for i in range(options['products'])
+        )
+        product_ids = [product.pk for product in products]
+        try:
+            for engine in engines:
+                self._run_engine(engine, product_ids, options)
+        finally:
+            category.delete()
+
+    def _run_engine(self, engine: str, product_ids: list[int], options: dict) -> None:
+        counter = SessionWriteCounter()
+        counter.install(connection=connection)
+        connection_created.connect(counter.install)
+        errors = []
+        statuses = []
+
+        def shopper(number: int) -> None:
+            rng = random.Random(options['seed'] + number)
+            client = Client()
+            try:
+                for _ in range(options['requests']):
+                    action = rng.random()
+                    data = {'id': rng.choice(product_ids), 'count': rng.randint(1, 3)}
+                    if action < 0.4:
+                        response = client.get('/api/basket')
+                    elif action < 0.85:
+                        response = client.post('/api/basket', data, content_type='application/json')
+                    else:
+                        response = client.delete('/api/basket', data, content_type='application/json')
+                    statuses.append(response.status_code)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        with override_settings(SESSION_ENGINE=engine, ALLOWED_HOSTS=['*']):
+            started = time.perf_counter()
+            threads = [threading.Thread(target=shopper, args=(number,)) for number in range(options['shoppers'])]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+            flushed = sessions.writer.flush()
+        connection_created.disconnect(counter.install)
+        connection.execute_wrappers.remove(counter)
+
+        total = len(statuses)
+        self.stdout.write(f'{engine}:')
+        self.stdout.write(f'  requests: {total} in {elapsed:.2f}s ({total / elapsed:.1f} req/s)')
+        self.stdout.write(f'  session table writes: {counter.count} (last flush wrote {flushed} sessions)')
+        self.stdout.write(f'  failed responses: {sum(1 for code in statuses if code >= 400)}, errors: {len(errors)}')
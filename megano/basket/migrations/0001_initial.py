@@ -0,0 +1,45 @@
+# Generated by Django 5.1.4 on 2026-10-18 22:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('products', '0007_sale'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Basket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=32, null=True, unique=True, verbose_name='Токен')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Дата изменения')),
+                ('user', models.OneToOneField(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='basket', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Корзина',
+                'verbose_name_plural': 'Корзины',
+            },
+        ),
+        migrations.CreateModel(
+            name='BasketItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Количество')),
+                ('basket', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='basket.basket', verbose_name='Корзина')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='basket_items', to='products.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Товар в корзине',
+                'verbose_name_plural': 'Товары в корзине',
+                'constraints': [models.UniqueConstraint(fields=('basket', 'product'), name='unique_basket_product')],
+            },
+        ),
+    ]
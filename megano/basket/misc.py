@@ -1,19 +1,204 @@
 """
 Misc functions for basket app.
+
+Baskets are stored in the database. A basket belongs either to a user or to
+an anonymous visitor, whose session keeps only the basket token. Basket lines
+are changed with atomic conditional updates, so concurrent requests from
+several tabs don't overwrite each other's changes.
 """
+from datetime import timedelta
+from uuid import uuid4
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from megano.metrics import BASKET_SIZE
 from products.models import Product
 from products.serializers import ProductSerializer
+from .models import Basket, BasketItem
+
+
+def get_basket(request, create: bool = False) -> Basket | None:
+    """
+    Get basket of the current user or anonymous visitor.
+
+    Baskets kept in the session by the older versions are moved to the database.
+
+    Args:
+        request: Current HTTP request.
+        create: Create basket if it does not exist yet.
+
+    Returns:
+        Basket | None: Current basket.
+    """
+    session = request.session
+    legacy_basket = session.get(settings.BASKET_SESSION_ID)
+    if legacy_basket:
+        create = True
+
+    if request.user.is_authenticated:
+        if create:
+            basket, _ = Basket.objects.get_or_create(user=request.user)
+        else:
+            basket = Basket.objects.filter(user=request.user).first()
+    else:
+        token = session.get(settings.BASKET_TOKEN_SESSION_ID)
+        basket = Basket.objects.filter(token=token).first() if token else None
+        if basket is None and create:
+            basket = Basket.objects.create(token=uuid4().hex)
+            session[settings.BASKET_TOKEN_SESSION_ID] = basket.token
+
+    if legacy_basket:
+        if isinstance(legacy_basket, list):
+            legacy_basket = {product['id']: product['count'] for product in legacy_basket}
+        existing_ids = get_existing_product_ids(legacy_basket)
+        for product_id, count in legacy_basket.items():
+            if int(product_id) in existing_ids:
+                change_basket(basket, int(product_id), count)
+        del session[settings.BASKET_SESSION_ID]
+    return basket
+
 
-def get_and_serialize_product(product_id: int) -> dict:
+def get_basket_items(basket: Basket | None) -> dict[int, int]:
     """
-    Get and serialize product
+    Get basket content.
 
     Args:
+        basket: Basket instance.
+
+    Returns:
+        dict: Map of product primary keys to their counts.
+    """
+    if basket is None:
+        items = {}
+    else:
+        items = dict(basket.items.order_by('pk').values_list('product_id', 'count'))
+    BASKET_SIZE.labels().observe(len(items))
+    return items
+
+
+def change_basket(basket: Basket, product_id: int, count: int) -> None:
+    """
+    Add count of product to the basket or remove it if count is negative.
+
+    Args:
+        basket: Basket instance.
         product_id: Product primary key.
+        count: Number of items to add (or to remove if it is negative).
+    """
+    # Keeps anonymous baskets in use from being deleted by clear_expired_baskets.
+    Basket.objects.filter(pk=basket.pk).update(updated=timezone.now())
+    items = BasketItem.objects.filter(basket=basket, product_id=product_id)
+    if count > 0:
+        if items.update(count=F('count') + count):
+            return
+        try:
+            with transaction.atomic():
+                BasketItem.objects.create(basket=basket, product_id=product_id, count=count)
+        except IntegrityError:
+            # The line was created by a concurrent request.
+            items.update(count=F('count') + count)
+    elif count < 0:
+        with transaction.atomic():
+            items.filter(count__lte=-count).delete()
+            items.update(count=F('count') + count)
+
+
+def clear_basket(request) -> None:
+    """
+    Remove all products from the current basket.
+
+    Args:
+        request: Current HTTP request.
+    """
+    basket = get_basket(request)
+    if basket is not None:
+        basket.items.all().delete()
+
+
+def merge_baskets(request, user) -> None:
+    """
+    Move anonymous visitor basket into the user basket.
+
+    Must be called after the user was logged in.
+
+    Args:
+        request: Current HTTP request.
+        user: Logged-in user.
+    """
+    token = request.session.pop(settings.BASKET_TOKEN_SESSION_ID, None)
+    if not token:
+        return
+    anonymous_basket = Basket.objects.filter(token=token).first()
+    if anonymous_basket is None:
+        return
+    with transaction.atomic():
+        user_basket, _ = Basket.objects.get_or_create(user=user)
+        for product_id, count in get_basket_items(anonymous_basket).items():
+            change_basket(user_basket, product_id, count)
+        anonymous_basket.delete()
+
+
+def clear_expired_baskets(batch_size: int = 1000) -> int:
+    """
+    Delete anonymous baskets that were not changed for SESSION_COOKIE_AGE seconds.
+
+    The sessions keeping their tokens have expired by then, so nobody can
+    reach these baskets anymore.
+
+    Args:
+        batch_size: Number of baskets deleted per query.
+
+    Returns:
+        int: Number of deleted baskets.
+    """
+    expired = Basket.objects.filter(
+        user__isnull=True,
+        updated__lt=timezone.now() - timedelta(seconds=settings.SESSION_COOKIE_AGE),
+    )
+    deleted = 0
+    while True:
+        basket_ids = list(expired.values_list('pk', flat=True)[:batch_size])
+        if not basket_ids:
+            return deleted
+        Basket.objects.filter(pk__in=basket_ids).delete()
+        deleted += len(basket_ids)
+
+
+def get_existing_product_ids(product_ids) -> set[int]:
+    """
+    Get primary keys of products that exist in the database.
+
+    Args:
+        product_ids: Iterable of product primary keys.
+
+    Returns:
+        set: Existing product primary keys.
+    """
+    return set(Product.objects.filter(pk__in=product_ids).values_list('pk', flat=True))
+
+
+def serialize_basket(basket: dict[int, int]) -> list[dict]:
+    """
+    Hydrate basket with current product data.
+
+    Args:
+        basket: Map of product primary keys to their counts.
 
     Returns:
-        dict: Serialized product data.
+        list: Serialized basket products with their counts.
     """
-    product = Product.objects.get(pk=product_id)
-    serializer = ProductSerializer(product)
-    return serializer.data
+    if not basket:
+        return []
+    products = (Product.objects
+                .filter(pk__in=[int(pk) for pk in basket])
+                .prefetch_related('images', 'tags', 'specifications')
+                .annotate(review_count=Count('reviews')))
+    products = {product.pk: product for product in products}
+    items = [(products[int(pk)], count) for pk, count in basket.items() if int(pk) in products]
+    data = ProductSerializer([product for product, _ in items], many=True).data
+    for item, (_, count) in zip(data, items):
+        item['count'] = count
+    return data
@@ -0,0 +1,64 @@
+"""
+Basket app models.
+"""
+from django.conf import settings
+from django.db import models
+
+
+class Basket(models.Model):
+    """
+    Represents basket of a user or of an anonymous visitor.
+
+    Meta:
+        verbose_name: representing name of the model.
+        verbose_name_plural: plural form of the verbose_name.
+
+    Attributes:
+        user: Owner of the basket (empty for anonymous visitors).
+        token: Anonymous basket token kept in the visitor session.
+        updated: When the basket was changed last time.
+    """
+    class Meta:
+        verbose_name = 'Корзина'
+        verbose_name_plural = 'Корзины'
+
+    user = models.OneToOneField(
+        to=settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='basket',
+        null=True,
+        verbose_name='Пользователь',
+    )
+    token = models.CharField(max_length=32, unique=True, null=True, verbose_name='Токен')
+    updated = models.DateTimeField(auto_now=True, verbose_name='Дата изменения')
+
+
+class BasketItem(models.Model):
+    """
+    Represents product line in a basket.
+
+    Meta:
+        verbose_name: representing name of the model.
+        verbose_name_plural: plural form of the verbose_name.
+        constraints: Basket contains each product only once.
+
+    Attributes:
+        basket: Which basket the line belongs to.
+        product: Product in the basket.
+        count: Number of product items.
+    """
+    class Meta:
+        verbose_name = 'Товар в корзине'
+        verbose_name_plural = 'Товары в корзине'
+        constraints = [
+            models.UniqueConstraint(fields=['basket', 'product'], name='unique_basket_product'),
+        ]
+
+    basket = models.ForeignKey(Basket, on_delete=models.CASCADE, related_name='items', verbose_name='Корзина')
+    product = models.ForeignKey(
+        to='products.Product',
+        on_delete=models.CASCADE,
+        related_name='basket_items',
+        verbose_name='Товар',
+    )
+    count = models.PositiveIntegerField(default=0, verbose_name='Количество')
@@ -0,0 +1,26 @@
+"""
+Serializers for the basket app.
+"""
+from rest_framework import serializers
+
+
+class BasketItemSerializer(serializers.Serializer):
+    """
+    Serializer for single basket change.
+
+    Attributes:
+        id: Product primary key.
+        count: Number of items to add or remove.
+    """
+    id = serializers.IntegerField()
+    count = serializers.IntegerField(min_value=1)
+
+
+class BasketOperationSerializer(BasketItemSerializer):
+    """
+    Serializer for basket change used in batch requests.
+
+    Attributes:
+        action: Whether to add items to the basket or to remove them.
+    """
+    action = serializers.ChoiceField(choices=('add', 'remove'))
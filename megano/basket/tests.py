@@ -0,0 +1,107 @@
+"""
+Basket app tests.
+"""
+import json
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from products.models import Product
+from .misc import change_basket, clear_expired_baskets, get_basket_items
+from .models import Basket
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def create_product(title: str) -> Product:
+    return Product.objects.create(title=title, description=title, fullDescription=title, price=10)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BasketViewTests(TestCase):
+    """
+    Tests of the basket API.
+    """
+    def setUp(self):
+        self.phone = create_product('Phone')
+        self.case = create_product('Case')
+
+    def add(self, product: Product, count: int = 1):
+        return self.client.post('/api/basket', {'id': product.pk, 'count': count}, content_type='application/json')
+
+    def counts(self, response) -> dict[int, int]:
+        return {item['id']: item['count'] for item in response.json()}
+
+    def test_basket_is_kept_between_requests(self):
+        self.add(self.phone, 2)
+        self.add(self.case)
+        self.add(self.phone)
+        self.assertEqual(self.counts(self.client.get('/api/basket')), {self.phone.pk: 3, self.case.pk: 1})
+        self.assertEqual(Basket.objects.get().token, self.client.session[settings.BASKET_TOKEN_SESSION_ID])
+
+    def test_removing_all_items_deletes_line(self):
+        self.add(self.phone, 2)
+        response = self.client.delete('/api/basket', {'id': self.phone.pk, 'count': 5},
+                                      content_type='application/json')
+        self.assertEqual(response.json(), [])
+
+    def test_batch_with_missing_product_changes_nothing(self):
+        response = self.client.post('/api/basket/batch', [
+            {'id': self.phone.pk, 'count': 1, 'action': 'add'},
+            {'id': 0, 'count': 1, 'action': 'add'},
+        ], content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'missing': [0]})
+        self.assertFalse(Basket.objects.exists())
+
+    def test_deleted_product_is_skipped(self):
+        self.add(self.phone)
+        self.add(self.case)
+        self.case.delete()
+        self.assertEqual(self.counts(self.client.get('/api/basket')), {self.phone.pk: 1})
+
+    def test_session_basket_is_moved_to_database(self):
+        session = self.client.session
+        session[settings.BASKET_SESSION_ID] = {str(self.phone.pk): 2, '0': 1}
+        session.save()
+        self.assertEqual(self.counts(self.client.get('/api/basket')), {self.phone.pk: 2})
+        self.assertNotIn(settings.BASKET_SESSION_ID, self.client.session)
+
+    def test_guest_basket_is_merged_on_sign_in(self):
+        user = User.objects.create_user('buyer', password='secret')
+        change_basket(Basket.objects.create(user=user), self.phone.pk, 1)
+        self.add(self.phone, 2)
+        self.add(self.case)
+        credentials = json.dumps({'username': 'buyer', 'password': 'secret'})
+        response = self.client.post('/api/sign-in', urlencode({credentials: ''}),
+                                    content_type='application/x-www-form-urlencoded')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_basket_items(Basket.objects.get(user=user)), {self.phone.pk: 3, self.case.pk: 1})
+        self.assertFalse(Basket.objects.filter(user__isnull=True).exists())
+
+
+class ClearExpiredBasketsTests(TestCase):
+    """
+    Tests of the removal of abandoned guest baskets.
+    """
+    def setUp(self):
+        self.product = create_product('Phone')
+        self.expired = timezone.now() - timedelta(seconds=settings.SESSION_COOKIE_AGE + 60)
+
+    def test_abandoned_guest_baskets_are_deleted(self):
+        abandoned = Basket.objects.create(token='abandoned')
+        Basket.objects.create(token='recent')
+        user_basket = Basket.objects.create(user=User.objects.create_user('buyer'))
+        Basket.objects.filter(pk__in=[abandoned.pk, user_basket.pk]).update(updated=self.expired)
+        self.assertEqual(clear_expired_baskets(batch_size=1), 1)
+        self.assertEqual(set(Basket.objects.values_list('token', flat=True)), {'recent', None})
+
+    def test_changed_basket_is_kept(self):
+        basket = Basket.objects.create(token='in-use')
+        Basket.objects.filter(pk=basket.pk).update(updated=self.expired)
+        change_basket(basket, self.product.pk, 1)
+        self.assertEqual(clear_expired_baskets(), 0)
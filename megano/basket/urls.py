@@ -6,9 +6,10 @@ Attributes:
 """
 from django.urls import path
 
-from .views import BasketView
+from .views import BasketView, BasketBatchView
 
 urlpatterns: list[path] = [
     path('basket', BasketView.as_view(), name='basket'),
     path('basket/', BasketView.as_view(), name='basket'),
+    path('basket/batch', BasketBatchView.as_view(), name='basket-batch'),
     ]
@@ -2,12 +2,15 @@
 Views for the basket app.
 """
 
+from django.db import transaction
+from rest_framework import status
 from rest_framework.request import Request
 from rest_framework.response import Response
-from django.conf import settings
 from rest_framework.views import APIView
 
-from .misc import get_and_serialize_product
+from .misc import get_basket, get_basket_items, change_basket, serialize_basket, get_existing_product_ids
+from .serializers import BasketItemSerializer, BasketOperationSerializer
+
 
 class BasketView(APIView):
     """
@@ -29,11 +32,8 @@ class BasketView(APIView):
         Returns:
             Response: Response with current basket data.
         """
-        basket = request.session.get(settings.BASKET_SESSION_ID)
-        if not basket:
-            basket = []
-            request.session[settings.BASKET_SESSION_ID] = basket
-        return Response(basket)
+        basket = get_basket(request)
+        return Response(serialize_basket(get_basket_items(basket)))
 
 
     def post(self, request: Request):
@@ -46,24 +46,15 @@ class BasketView(APIView):
         Returns:
             Response: Response with updated basket data.
         """
-        product_id, count = request.data['id'], int(request.data['count'])
-        basket = request.session.get(settings.BASKET_SESSION_ID)
-
-        if basket:
-            for index, product in enumerate(basket):
-                if product.get('id') == product_id:
-                    basket[index]['count'] += count
-                    break
-            else:
-                product = get_and_serialize_product(product_id)
-                product['count'] = count
-                basket.append(product)
-        else:
-            product = get_and_serialize_product(product_id)
-            product['count'] = count
-            basket = [product]
-        request.session[settings.BASKET_SESSION_ID] = basket
-        return Response(basket, status=201)
+        serializer = BasketItemSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        product_id, count = serializer.validated_data['id'], serializer.validated_data['count']
+        if not get_existing_product_ids([product_id]):
+            return Response(status=status.HTTP_404_NOT_FOUND)
+
+        basket = get_basket(request, create=True)
+        change_basket(basket, product_id, count)
+        return Response(serialize_basket(get_basket_items(basket)), status=201)
 
     def delete(self, request: Request):
         """
@@ -75,15 +66,46 @@ class BasketView(APIView):
         Returns:
             Response: Response with updated basket data.
         """
-        product_id, count = int(request.data['id']), int(request.data['count'])
-        basket = request.session.get(settings.BASKET_SESSION_ID)
-        if basket:
-            for index in range(len(basket)):
-                if basket[index]['id'] == product_id:
-                    basket[index]['count'] -= count
-                    if basket[index]['count'] == 0:
-                        basket.pop(index)
-        else:
-            basket = []
-        request.session[settings.BASKET_SESSION_ID] = basket
-        return Response(basket, status=200)
+        serializer = BasketItemSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        product_id, count = serializer.validated_data['id'], serializer.validated_data['count']
+
+        basket = get_basket(request)
+        if basket is not None:
+            change_basket(basket, product_id, -count)
+        return Response(serialize_basket(get_basket_items(basket)), status=200)
+
+
+class BasketBatchView(APIView):
+    """
+    API view for applying several basket changes in one request.
+
+    Methods:
+        post: Apply list of add/remove operations to the basket.
+    """
+    def post(self, request: Request):
+        """
+        Handles post requests.
+
+        Args:
+            request: Current HTTP request with list of operations.
+
+        Returns:
+            Response: Response with updated basket data or 404 status code
+                if some of the added products do not exist.
+        """
+        serializer = BasketOperationSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        operations = serializer.validated_data
+
+        added_ids = {operation['id'] for operation in operations if operation['action'] == 'add'}
+        missing_ids = added_ids - get_existing_product_ids(added_ids)
+        if missing_ids:
+            return Response({'missing': sorted(missing_ids)}, status=status.HTTP_404_NOT_FOUND)
+
+        basket = get_basket(request, create=True)
+        with transaction.atomic():
+            for operation in operations:
+                count = operation['count'] if operation['action'] == 'add' else -operation['count']
+                change_basket(basket, operation['id'], count)
+        return Response(serialize_basket(get_basket_items(basket)), status=200)
@@ -1,12 +1,12 @@
 var mix = {
 	methods: {
 		getHistoryOrder() {
-			this.getData("/api/orders")
+			this.getData(this.nextPage || "/api/orders")
 				.then(data => {
-					console.log(data)
-					this.orders = data
+					this.orders = this.orders.concat(data.items)
+					this.nextPage = data.next
 				}).catch(() => {
-				this.orders = []
+				this.nextPage = null
 				console.warn('Ошибка при получении списка заказов')
 			})
 		}
@@ -17,6 +17,7 @@ var mix = {
 	data() {
 		return {
 			orders: [],
+			nextPage: null,
 		}
 	}
-}
\ No newline at end of file
+}
@@ -17,14 +17,17 @@ var mix = {
 				year: this.year,
 				month: this.month,
 				code: this.code
-			}).then(() => {
-				alert('Успешная оплата')
+			}).then(({ data, status }) => {
+				if (status !== 202) {
+					alert('Ошибка при оплате')
+					return
+				}
 				this.number1 = ''
 				this.name = ''
 				this.year = ''
 				this.month = ''
 				this.code = ''
-				location.assign('/')
+				location.assign(`/progress-payment/?order=${data.orderId}`)
 			}).catch(() => {
 			 	console.warn('Ошибка при оплате')
 			})
@@ -0,0 +1,31 @@
+var mix = {
+	methods: {
+		waitPayment() {
+			const orderId = new URLSearchParams(location.search).get('order')
+			if (!orderId) {
+				return
+			}
+			this.getData(`/api/payment/${orderId}/status`, { wait: 20 })
+				.then(data => {
+					if (data.status === 'succeeded') {
+						alert('Успешная оплата')
+						location.assign(`/orders/${orderId}/`)
+					} else if (data.status === 'failed') {
+						this.paymentError = data.paymentError
+					} else {
+						this.waitPayment()
+					}
+				}).catch(() => {
+				console.warn('Ошибка при получении статуса оплаты')
+			})
+		}
+	},
+	mounted() {
+		this.waitPayment();
+	},
+	data() {
+		return {
+			paymentError: null,
+		}
+	}
+}
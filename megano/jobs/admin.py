@@ -0,0 +1,40 @@
+"""
+Jobs app admin control panel module.
+"""
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job
+from .queue import requeue_jobs
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """
+    Admin form for a Job model.
+
+    Attributes:
+        list_display: Array of fields that displays at the admin panel.
+        list_filter: Array of fields used to filter jobs.
+        search_fields: Array of fields used to search jobs.
+        readonly_fields: Fields filled by the workers.
+        actions: Array of admin actions.
+
+    Methods:
+        retry_jobs: Queue selected failed jobs again unless the same job is pending.
+    """
+    list_display = 'name', 'queue', 'status', 'run_at', 'attempts', 'finished'
+    list_filter = 'status', 'queue'
+    search_fields = 'name', 'dedup_key'
+    readonly_fields = 'attempts', 'claimed_by', 'claimed_at', 'error', 'created', 'finished'
+    actions = 'retry_jobs',
+
+    @admin.action(description='Повторить выбранные задачи')
+    def retry_jobs(self, request, queryset):
+        retried = requeue_jobs(
+            queryset.filter(status=Job.Status.FAILED),
+            run_at=timezone.now(),
+            attempts=0,
+            finished=None,
+        )
+        self.message_user(request, f'Повторено задач: {retried}')
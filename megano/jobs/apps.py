@@ -0,0 +1,26 @@
+"""
+Jobs app config module
+"""
+from django.apps import AppConfig
+
+
+class JobsConfig(AppConfig):
+    """
+    Config of the jobs app.
+
+    Attributes:
+        default_auto_field: A field that automatically increases when an object is added.
+        name: Name of the app.
+        verbose_name: Representing name of the app.
+
+    Methods:
+        ready: Import job functions of the installed apps.
+    """
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'jobs'
+    verbose_name = 'Фоновые задачи'
+
+    def ready(self):
+        from django.utils.module_loading import autodiscover_modules
+
+        autodiscover_modules('jobs')
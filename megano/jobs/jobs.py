@@ -0,0 +1,33 @@
+"""
+Jobs of the jobs app.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Job
+from .queue import job
+
+
+@job
+def purge_finished_jobs(batch_size: int = 1000) -> int:
+    """
+    Delete jobs that finished more than JOB_RETENTION seconds ago.
+
+    Args:
+        batch_size: Number of jobs deleted per query.
+
+    Returns:
+        int: Number of deleted jobs.
+    """
+    finished = Job.objects.filter(
+        status__in=[Job.Status.SUCCEEDED, Job.Status.FAILED],
+        finished__lt=timezone.now() - timedelta(seconds=settings.JOB_RETENTION),
+    )
+    deleted = 0
+    while True:
+        job_ids = list(finished.values_list('pk', flat=True)[:batch_size])
+        if not job_ids:
+            return deleted
+        deleted += Job.objects.filter(pk__in=job_ids).delete()[0]
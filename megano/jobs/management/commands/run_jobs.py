@@ -0,0 +1,98 @@
+"""
+Worker that runs queued jobs.
+"""
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from jobs.jobs import purge_finished_jobs
+from jobs.queue import claim_jobs, enqueue, requeue_stalled_jobs, run_claimed_job
+
+
+class Command(BaseCommand):
+    """
+    Run queued jobs with a pool of worker threads or processes.
+
+    Stops claiming new jobs on SIGINT or SIGTERM and waits for the running
+    ones to finish. Every JOB_PURGE_INTERVAL seconds the worker queues the
+    purge of the old finished jobs, workers share a single pending purge.
+    """
+    help = 'Run queued background jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queues',
+            default=None,
+            help='Comma separated queue names. Defaults to all queues from JOB_QUEUES.',
+        )
+        parser.add_argument('--workers', type=int, default=4, help='Number of jobs run at the same time.')
+        parser.add_argument('--processes', action='store_true', help='Run jobs in worker processes instead of threads.')
+        parser.add_argument('--burst', action='store_true', help='Exit when there are no due jobs.')
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=None,
+            help='Pause (in seconds) between checks for due jobs. Defaults to JOB_POLL_INTERVAL.',
+        )
+
+    def handle(self, *args, **options):
+        queues = options['queues'].split(',') if options['queues'] else list(settings.JOB_QUEUES)
+        workers = options['workers']
+        poll_interval = options['poll_interval'] or settings.JOB_POLL_INTERVAL
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        if options['processes']:
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup,
+            )
+        else:
+            executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job-worker')
+
+        stopping = []
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stopping.append(True))
+
+        self.stdout.write(f'Worker {worker_id} runs queues: {", ".join(queues)}')
+        running = set()
+        finished = 0
+        next_requeue = 0
+        next_purge = 0
+        with executor:
+            while not stopping:
+                if time.monotonic() >= next_purge:
+                    enqueue(purge_finished_jobs, dedup_key='jobs.purge_finished_jobs')
+                    next_purge = time.monotonic() + settings.JOB_PURGE_INTERVAL
+                claimed = 0
+                for queue in queues:
+                    free = workers - len(running)
+                    if free <= 0:
+                        break
+                    for claimed_job in claim_jobs(queue, free, worker_id):
+                        running.add(executor.submit(run_claimed_job, claimed_job.pk, claimed_job.claimed_by))
+                        claimed += 1
+                if not claimed and not running and options['burst']:
+                    break
+                if running and (claimed == 0 or len(running) >= workers):
+                    done, running = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                    finished += len(done)
+                elif not claimed:
+                    time.sleep(poll_interval)
+                if time.monotonic() >= next_requeue:
+                    self.requeue_stalled()
+                    next_requeue = time.monotonic() + settings.JOB_LOCK_TIMEOUT / 2
+            done, running = wait(running)
+            finished += len(done)
+        self.stdout.write(f'Finished {finished} jobs')
+
+    def requeue_stalled(self):
+        requeued = requeue_stalled_jobs()
+        if requeued:
+            self.stdout.write(f'Requeued {requeued} stalled jobs')
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.4 on 2026-10-18 22:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('queue', models.CharField(default='default', max_length=50, verbose_name='Очередь')),
+                ('name', models.CharField(max_length=200, verbose_name='Задача')),
+                ('args', models.JSONField(blank=True, default=list, verbose_name='Аргументы')),
+                ('kwargs', models.JSONField(blank=True, default=dict, verbose_name='Именованные аргументы')),
+                ('status', models.IntegerField(choices=[(0, 'В очереди'), (1, 'Выполняется'), (2, 'Выполнена'), (3, 'Ошибка')], default=0, verbose_name='Статус')),
+                ('run_at', models.DateTimeField(verbose_name='Запуск')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Попытки')),
+                ('max_attempts', models.PositiveIntegerField(default=5, verbose_name='Максимум попыток')),
+                ('dedup_key', models.CharField(blank=True, max_length=200, null=True, verbose_name='Ключ дедупликации')),
+                ('claimed_by', models.CharField(blank=True, db_index=True, max_length=100, null=True, verbose_name='Исполнитель')),
+                ('claimed_at', models.DateTimeField(blank=True, null=True, verbose_name='Взята')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Ошибка')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Создана')),
+                ('finished', models.DateTimeField(blank=True, null=True, verbose_name='Завершена')),
+            ],
+            options={
+                'verbose_name': 'Задача',
+                'verbose_name_plural': 'Задачи',
+                'indexes': [models.Index(fields=['status', 'queue', 'run_at'], name='job_due_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status__in', [0, 1])), fields=('dedup_key',), name='unique_active_job_dedup_key')],
+            },
+        ),
+    ]
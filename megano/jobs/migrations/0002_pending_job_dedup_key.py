@@ -0,0 +1,21 @@
+# Generated by Django 5.1.4 on 2026-10-18 23:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='job',
+            name='unique_active_job_dedup_key',
+        ),
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 0)), fields=('dedup_key',), name='unique_pending_job_dedup_key'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+"""
+Jobs app models.
+"""
+from django.db import models
+
+
+class Job(models.Model):
+    """
+    Represents job queued for background execution.
+
+    Meta:
+        verbose_name: representing name of the model.
+        verbose_name_plural: plural form of the verbose_name.
+        indexes: Index used by the workers to claim due jobs.
+        constraints: Only one pending job may have the same deduplication key.
+
+    Attributes:
+        Status: Job execution statuses.
+        queue: Name of the queue.
+        name: Registered name of the job function.
+        args: Positional arguments of the job function.
+        kwargs: Keyword arguments of the job function.
+        status: Current execution status.
+        run_at: When the job becomes due.
+        attempts: Number of started executions.
+        max_attempts: Number of executions before the job is failed.
+        dedup_key: Key that prevents queueing a job twice while it is pending.
+        claimed_by: Claim token of the worker that runs the job.
+        claimed_at: When the job was claimed.
+        error: Last execution error.
+        created: When the job was queued.
+        finished: When the job succeeded or failed.
+    """
+    class Status(models.IntegerChoices):
+        PENDING = 0, 'В очереди'
+        RUNNING = 1, 'Выполняется'
+        SUCCEEDED = 2, 'Выполнена'
+        FAILED = 3, 'Ошибка'
+
+    class Meta:
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+        indexes = [
+            models.Index(fields=['status', 'queue', 'run_at'], name='job_due_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedup_key'],
+                condition=models.Q(status=0),
+                name='unique_pending_job_dedup_key',
+            ),
+        ]
+
+    queue = models.CharField(max_length=50, default='default', verbose_name='Очередь')
+    name = models.CharField(max_length=200, verbose_name='Задача')
+    args = models.JSONField(default=list, blank=True, verbose_name='Аргументы')
+    kwargs = models.JSONField(default=dict, blank=True, verbose_name='Именованные аргументы')
+    status = models.IntegerField(choices=Status.choices, default=Status.PENDING, verbose_name='Статус')
+    run_at = models.DateTimeField(verbose_name='Запуск')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Попытки')
+    max_attempts = models.PositiveIntegerField(default=5, verbose_name='Максимум попыток')
+    dedup_key = models.CharField(max_length=200, null=True, blank=True, verbose_name='Ключ дедупликации')
+    claimed_by = models.CharField(max_length=100, null=True, blank=True, db_index=True, verbose_name='Исполнитель')
+    claimed_at = models.DateTimeField(null=True, blank=True, verbose_name='Взята')
+    error = models.TextField(blank=True, default='', verbose_name='Ошибка')
+    created = models.DateTimeField(auto_now_add=True, verbose_name='Создана')
+    finished = models.DateTimeField(null=True, blank=True, verbose_name='Завершена')
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
@@ -0,0 +1,314 @@
+"""
+Database-backed job queue.
+
+Jobs are rows of the Job table. Job functions are registered with the job
+decorator in the jobs.py modules of the installed apps and are referenced by
+name, so a job can be queued in the same transaction as the data it works
+on and is only visible to the workers after the commit.
+
+Workers claim due jobs in batches. On databases that support it the claim
+uses SELECT ... FOR UPDATE SKIP LOCKED, on SQLite it is a single conditional
+UPDATE, so concurrent workers never run the same job twice. Failed jobs are
+retried with exponential backoff until they run out of attempts.
+
+Attributes:
+    registry: Registered job functions by name.
+"""
+import logging
+import random
+import traceback
+from datetime import datetime, timedelta
+from typing import Callable
+from uuid import uuid4
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+SUPERSEDED = 'Superseded by a pending job with the same deduplication key'
+
+
+class Task:
+    """
+    Job function registered in the queue.
+
+    Attributes:
+        function: Job function.
+        name: Registered name of the function.
+        queue: Default queue of the jobs.
+        max_attempts: Default number of attempts of the jobs.
+
+    Methods:
+        delay: Queue job with the given arguments.
+    """
+    def __init__(self, function: Callable, name: str, queue: str, max_attempts: int = None):
+        self.function = function
+        self.name = name
+        self.queue = queue
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.function(*args, **kwargs)
+
+    def delay(self, *args, **kwargs) -> Job:
+        """
+        Queue job with the given arguments.
+
+        Returns:
+            Job: Queued job.
+        """
+        return enqueue(self, args, kwargs)
+
+
+registry: dict[str, Task] = {}
+
+
+def job(function: Callable = None, *, name: str = None, queue: str = 'default', max_attempts: int = None):
+    """
+    Register function as a job.
+
+    Arguments of the jobs must be JSON serializable.
+
+    Args:
+        function: Job function.
+        name: Registered name. Defaults to the function module and name.
+        queue: Default queue of the jobs.
+        max_attempts: Default number of attempts. Defaults to JOB_DEFAULT_MAX_ATTEMPTS.
+
+    Returns:
+        Task: Registered job or a decorator if the function is not given.
+    """
+    def decorator(function: Callable) -> Task:
+        task = Task(function, name or f'{function.__module__}.{function.__qualname__}', queue, max_attempts)
+        registry[task.name] = task
+        return task
+
+    if function is not None:
+        return decorator(function)
+    return decorator
+
+
+def enqueue(
+        task: Task | str,
+        args: list | tuple = (),
+        kwargs: dict = None,
+        *,
+        queue: str = None,
+        delay: float = 0,
+        run_at: datetime = None,
+        dedup_key: str = None,
+        max_attempts: int = None,
+) -> Job:
+    """
+    Queue job.
+
+    Args:
+        task: Registered job or its name.
+        args: Positional arguments of the job function.
+        kwargs: Keyword arguments of the job function.
+        queue: Queue name. Defaults to the queue of the registered job.
+        delay: Number of seconds before the job becomes due.
+        run_at: When the job becomes due. Overrides delay.
+        dedup_key: If a pending job has the same key, it is returned instead of queueing a new one.
+            Running jobs don't block new ones, so changes made while a job runs are not missed.
+        max_attempts: Number of executions before the job is failed.
+
+    Returns:
+        Job: Queued job.
+
+    Raises:
+        LookupError: If the job is not registered.
+    """
+    if isinstance(task, str):
+        if task not in registry:
+            raise LookupError(f'Job {task} is not registered')
+        task = registry[task]
+    values = {
+        'queue': queue or task.queue,
+        'name': task.name,
+        'args': list(args),
+        'kwargs': kwargs or {},
+        'run_at': run_at or timezone.now() + timedelta(seconds=delay),
+        'max_attempts': max_attempts or task.max_attempts or settings.JOB_DEFAULT_MAX_ATTEMPTS,
+        'dedup_key': dedup_key,
+    }
+    if dedup_key is None:
+        return Job.objects.create(**values)
+    try:
+        with transaction.atomic():
+            return Job.objects.create(**values)
+    except IntegrityError:
+        existing = Job.objects.filter(dedup_key=dedup_key, status=Job.Status.PENDING).first()
+        if existing is not None:
+            return existing
+        # The pending job has just been claimed.
+        return Job.objects.create(**values)
+
+
+def requeue_jobs(jobs, **values) -> int:
+    """
+    Return jobs to the queue.
+
+    A job whose deduplication key is taken by a pending job is failed
+    instead, the pending job does its work. The reason is added to its error.
+
+    Args:
+        jobs: Jobs to return.
+        **values: Other fields to update, such as run_at.
+
+    Returns:
+        int: Number of returned jobs.
+    """
+    values = {'status': Job.Status.PENDING, 'claimed_by': None, **values}
+    requeued = jobs.filter(dedup_key__isnull=True).update(**values)
+    for job_id in jobs.filter(dedup_key__isnull=False).values_list('pk', flat=True):
+        try:
+            with transaction.atomic():
+                requeued += jobs.filter(pk=job_id).update(**values)
+        except IntegrityError:
+            jobs.filter(pk=job_id).update(
+                status=Job.Status.FAILED,
+                error=Concat(Value(values['error']) if 'error' in values else F('error'), Value(SUPERSEDED)),
+                finished=timezone.now(),
+                claimed_by=None,
+            )
+    return requeued
+
+
+def claim_jobs(queue: str, limit: int, worker: str) -> list[Job]:
+    """
+    Claim due jobs of the queue.
+
+    The number of claimed jobs is limited by the queue concurrency from
+    JOB_QUEUES, counted across all workers. Workers that claim at the same
+    moment may briefly exceed the limit by their batch sizes.
+
+    Args:
+        queue: Queue name.
+        limit: Maximum number of claimed jobs.
+        worker: Worker identifier.
+
+    Returns:
+        list: Claimed jobs.
+    """
+    concurrency = settings.JOB_QUEUES.get(queue, {}).get('concurrency')
+    token = f'{worker}:{uuid4().hex[:12]}'
+    now = timezone.now()
+    claim = {
+        'status': Job.Status.RUNNING,
+        'claimed_by': token,
+        'claimed_at': now,
+        'attempts': F('attempts') + 1,
+    }
+    due = Job.objects.filter(queue=queue, status=Job.Status.PENDING, run_at__lte=now).order_by('run_at', 'pk')
+
+    if concurrency is not None:
+        limit = min(limit, concurrency - Job.objects.filter(queue=queue, status=Job.Status.RUNNING).count())
+    if limit <= 0:
+        return []
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job_ids = list(due.select_for_update(skip_locked=True).values_list('pk', flat=True)[:limit])
+            Job.objects.filter(pk__in=job_ids).update(**claim)
+    else:
+        # A single UPDATE takes the SQLite write lock at once, so the claim
+        # can't be interleaved with a claim of another worker.
+        Job.objects.filter(pk__in=due.values('pk')[:limit], status=Job.Status.PENDING).update(**claim)
+    return list(Job.objects.filter(claimed_by=token, status=Job.Status.RUNNING).order_by('run_at', 'pk'))
+
+
+def get_retry_delay(attempts: int) -> float:
+    """
+    Get delay before the next attempt of a failed job.
+
+    Args:
+        attempts: Number of made attempts.
+
+    Returns:
+        float: Number of seconds.
+    """
+    delay = min(settings.JOB_RETRY_BASE_DELAY * 2 ** (attempts - 1), settings.JOB_RETRY_MAX_DELAY)
+    return delay * random.uniform(0.5, 1)
+
+
+def execute_job(job: Job) -> int:
+    """
+    Run claimed job and store its result.
+
+    Args:
+        job: Claimed job.
+
+    Returns:
+        int: New job status.
+    """
+    claimed = Job.objects.filter(pk=job.pk, claimed_by=job.claimed_by)
+    try:
+        task = registry.get(job.name)
+        if task is None:
+            raise LookupError(f'Job {job.name} is not registered')
+        task.function(*job.args, **job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning('Job %s #%s failed (attempt %s of %s)', job.name, job.pk, job.attempts, job.max_attempts)
+        if job.attempts >= job.max_attempts:
+            claimed.update(status=Job.Status.FAILED, error=error, finished=timezone.now(), claimed_by=None)
+            return Job.Status.FAILED
+        if not requeue_jobs(
+            claimed,
+            error=error,
+            run_at=timezone.now() + timedelta(seconds=get_retry_delay(job.attempts)),
+        ):
+            return Job.Status.FAILED
+        return Job.Status.PENDING
+    claimed.update(status=Job.Status.SUCCEEDED, error='', finished=timezone.now(), claimed_by=None)
+    return Job.Status.SUCCEEDED
+
+
+def run_claimed_job(job_id: int, token: str) -> int | None:
+    """
+    Load claimed job and run it.
+
+    Used by the worker pools, so it only takes picklable arguments.
+
+    Args:
+        job_id: Job primary key.
+        token: Claim token of the job.
+
+    Returns:
+        int | None: New job status or None if the job was claimed again by another worker.
+    """
+    try:
+        claimed_job = Job.objects.filter(pk=job_id, claimed_by=token).first()
+        if claimed_job is None:
+            return None
+        return execute_job(claimed_job)
+    finally:
+        close_old_connections()
+
+
+def requeue_stalled_jobs() -> int:
+    """
+    Return jobs left running by a stopped worker to the queue.
+
+    Jobs that have run out of attempts are failed.
+
+    Returns:
+        int: Number of returned jobs.
+    """
+    stalled = Job.objects.filter(
+        status=Job.Status.RUNNING,
+        claimed_at__lt=timezone.now() - timedelta(seconds=settings.JOB_LOCK_TIMEOUT),
+    )
+    stalled.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.Status.FAILED,
+        error='Worker stopped while running the job',
+        finished=timezone.now(),
+        claimed_by=None,
+    )
+    return requeue_jobs(stalled, run_at=timezone.now())
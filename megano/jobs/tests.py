@@ -0,0 +1,114 @@
+"""
+Jobs app tests.
+"""
+import signal
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .models import Job
+from .queue import claim_jobs, enqueue, execute_job, job, requeue_jobs, requeue_stalled_jobs
+
+
+@job(name='jobs.tests.succeed')
+def succeed():
+    pass
+
+
+@job(name='jobs.tests.fail', max_attempts=2)
+def fail():
+    raise RuntimeError('Job failed')
+
+
+class EnqueueTests(TestCase):
+    """
+    Tests of the job deduplication.
+    """
+    def test_pending_job_is_reused(self):
+        first = enqueue(succeed, dedup_key='key')
+        self.assertEqual(enqueue(succeed, dedup_key='key'), first)
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_running_job_does_not_block_new_one(self):
+        first = enqueue(succeed, dedup_key='key')
+        claim_jobs('default', 1, 'worker')
+        second = enqueue(succeed, dedup_key='key')
+        self.assertNotEqual(second, first)
+        self.assertEqual(second.status, Job.Status.PENDING)
+
+    def test_unknown_job_is_rejected(self):
+        with self.assertRaises(LookupError):
+            enqueue('jobs.tests.unknown')
+
+
+class ExecuteJobTests(TestCase):
+    """
+    Tests of the job execution and retries.
+    """
+    def run_job(self) -> int:
+        claimed, = claim_jobs('default', 1, 'worker')
+        return execute_job(claimed)
+
+    def test_failed_job_is_retried_later(self):
+        enqueue(fail)
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            self.assertEqual(self.run_job(), Job.Status.PENDING)
+        retried = Job.objects.get()
+        self.assertGreater(retried.run_at, timezone.now())
+        self.assertIn('Job failed', retried.error)
+
+    def test_job_fails_after_last_attempt(self):
+        enqueue(fail, max_attempts=1)
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            self.assertEqual(self.run_job(), Job.Status.FAILED)
+        self.assertIsNotNone(Job.objects.get().finished)
+
+    def test_retry_is_superseded_by_pending_job(self):
+        enqueue(fail, dedup_key='key')
+        claimed, = claim_jobs('default', 1, 'worker')
+        pending = enqueue(fail, dedup_key='key')
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            self.assertEqual(execute_job(claimed), Job.Status.FAILED)
+        superseded = Job.objects.get(pk=claimed.pk)
+        self.assertEqual(superseded.status, Job.Status.FAILED)
+        self.assertTrue(superseded.error.endswith('Superseded by a pending job with the same deduplication key'))
+        self.assertEqual(Job.objects.get(pk=pending.pk).status, Job.Status.PENDING)
+
+    def test_stalled_job_is_requeued(self):
+        enqueue(succeed)
+        Job.objects.update(status=Job.Status.RUNNING, claimed_by='gone', claimed_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(requeue_stalled_jobs(), 1)
+        self.assertEqual(self.run_job(), Job.Status.SUCCEEDED)
+
+    def test_failed_job_can_be_retried(self):
+        enqueue(fail, max_attempts=1)
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            self.run_job()
+        self.assertEqual(requeue_jobs(Job.objects.filter(status=Job.Status.FAILED), attempts=0, finished=None), 1)
+        retried = Job.objects.get()
+        self.assertEqual((retried.status, retried.attempts), (Job.Status.PENDING, 0))
+
+
+@override_settings(JOB_RETENTION=60)
+class RunJobsTests(TransactionTestCase):
+    """
+    Tests of the jobs worker.
+    """
+    def setUp(self):
+        # The worker installs its own stop handlers.
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            self.addCleanup(signal.signal, signum, signal.getsignal(signum))
+
+    def test_worker_purges_old_finished_jobs(self):
+        old = enqueue(succeed)
+        recent = enqueue(succeed)
+        Job.objects.filter(pk=old.pk).update(status=Job.Status.SUCCEEDED, finished=timezone.now() - timedelta(hours=1))
+        Job.objects.filter(pk=recent.pk).update(status=Job.Status.SUCCEEDED, finished=timezone.now())
+        call_command('run_jobs', burst=True, workers=1, stdout=StringIO())
+        self.assertFalse(Job.objects.filter(pk=old.pk).exists())
+        self.assertTrue(Job.objects.filter(pk=recent.pk).exists())
+        purge = Job.objects.get(name='jobs.jobs.purge_finished_jobs')
+        self.assertEqual(purge.status, Job.Status.SUCCEEDED)
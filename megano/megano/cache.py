@@ -0,0 +1,307 @@
+"""
+Page cache helpers shared by the project apps.
+
+The stock ``cache_page`` decorator lets every concurrent request recompute a page
+once its entry expires. ``coalesced_cache_page`` keeps the same contract but lets
+a single request per key recompute the page (single-flight), expires entries a bit
+early with a probability that grows towards the deadline and, optionally, serves
+the stale body while the page is refreshed in the background.
+
+Pages are cached per variant like with ``cache_page``: the keys are built
+by ``get_cache_key``/``learn_cache_key`` from the URL and the request
+headers listed in the Vary header of the response.
+
+The lock that lets one worker process recompute a page is taken with the
+``add`` of the cache backend. It's atomic on memcached, Redis and the
+database cache, but a check-then-set on the file cache, so there the
+protection across processes is best-effort and two workers may sometimes
+compute the same page. Requests of one process are always coalesced.
+
+Cached pages of a key prefix are dropped all at once by
+``invalidate_cached_pages``, which bumps the generation stored in the cache
+and included in every page key of the prefix.
+"""
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from hashlib import md5
+from typing import Callable
+
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from django.db import close_old_connections
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import get_cache_key, learn_cache_key, patch_response_headers
+
+from .metrics import CACHE_LOOKUPS
+from .timing import timed
+
+_refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='page-cache-refresh')
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key inside one process.
+
+    The first caller (the leader) runs the function, the others block until
+    the leader finishes and receive the same result.
+
+    Methods:
+        do: Run function once for all concurrent callers of the key.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[str, dict] = {}
+
+    def do(self, key: str, function: Callable) -> tuple:
+        """
+        Run function once for all concurrent callers of the key.
+
+        Args:
+            key: Coalescing key.
+            function: Callable without arguments to run.
+
+        Returns:
+            tuple: Function result and a flag that is True for the leader call.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {'event': threading.Event(), 'result': None, 'error': None}
+                self._calls[key] = call
+
+        if not leader:
+            call['event'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result'], False
+
+        try:
+            call['result'] = function()
+        except Exception as error:
+            call['error'] = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['event'].set()
+        return call['result'], True
+
+
+_single_flight = SingleFlight()
+
+
+def bump_version(cache: BaseCache, key: str) -> None:
+    """
+    Increment version counter shared by the workers through the cache.
+
+    The counter never expires. Concurrent bumps may be merged into one on
+    backends without atomic incr, the version changes anyway.
+
+    Args:
+        cache: Cache that stores the counter.
+        key: Cache key of the counter.
+    """
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # The counter was evicted after add.
+        cache.set(key, 1, timeout=None)
+
+
+def _build_generation_key(key_prefix: str) -> str:
+    return f'coalesced_page.{key_prefix}.generation'
+
+
+def _build_flight_key(request: HttpRequest, key_prefix: str) -> str:
+    """
+    Build key that coalesces requests of a page whose variant key is not known yet.
+
+    Args:
+        request: Current HTTP request.
+        key_prefix: Cache key prefix with the generation.
+
+    Returns:
+        str: Coalescing key.
+    """
+    url = md5(request.build_absolute_uri().encode('ascii', 'ignore')).hexdigest()
+    return f'coalesced_page.{key_prefix}.{url}'
+
+
+def invalidate_cached_pages(key_prefix: str = None, cache: str = None) -> None:
+    """
+    Drop all pages cached by coalesced_cache_page with the key prefix.
+
+    The entries are not deleted one by one: the prefix generation is bumped,
+    so the following requests use new keys and old entries expire.
+
+    Args:
+        key_prefix: Cache key prefix. Defaults to CACHE_MIDDLEWARE_KEY_PREFIX.
+        cache: Cache alias. Defaults to CACHE_MIDDLEWARE_ALIAS.
+    """
+    if key_prefix is None:
+        key_prefix = settings.CACHE_MIDDLEWARE_KEY_PREFIX
+    bump_version(caches[cache or settings.CACHE_MIDDLEWARE_ALIAS], _build_generation_key(key_prefix))
+
+
+def _is_fresh(entry: dict, beta: float) -> bool:
+    """
+    Check whether cache entry can be served without recomputing.
+
+    Uses probabilistic early expiration: the closer the entry is to its
+    deadline and the longer it took to compute, the higher the chance that
+    the entry is treated as expired.
+
+    Args:
+        entry: Cached page entry.
+        beta: Early expiration aggressiveness (0 disables early expiration).
+
+    Returns:
+        bool: Is entry fresh or not.
+    """
+    early = entry['delta'] * beta * -math.log(1.0 - random.random())
+    return time.time() + early < entry['expires']
+
+
+def _to_response(entry: dict) -> HttpResponse:
+    """
+    Restore response from the cache entry.
+
+    Args:
+        entry: Cached page entry.
+
+    Returns:
+        HttpResponse: Restored response.
+    """
+    return HttpResponse(entry['content'], status=entry['status'], headers=entry['headers'])
+
+
+def coalesced_cache_page(
+        timeout: int,
+        *,
+        stale_while_revalidate: int = 0,
+        beta: float = None,
+        cache: str = None,
+        key_prefix: str = None,
+) -> Callable:
+    """
+    Cache view responses with stampede protection.
+
+    Args:
+        timeout: Number of seconds the page is considered fresh.
+        stale_while_revalidate:
+            Number of seconds after expiration the stale page may be served
+            while it is refreshed in the background. Zero disables the mode.
+        beta: Early expiration aggressiveness. Defaults to PAGE_CACHE_EARLY_EXPIRATION_BETA.
+        cache: Cache alias. Defaults to CACHE_MIDDLEWARE_ALIAS.
+        key_prefix: Cache key prefix. Defaults to CACHE_MIDDLEWARE_KEY_PREFIX.
+
+    Returns:
+        Callable: View decorator.
+    """
+    if beta is None:
+        beta = settings.PAGE_CACHE_EARLY_EXPIRATION_BETA
+    cache_alias = cache or settings.CACHE_MIDDLEWARE_ALIAS
+    if key_prefix is None:
+        key_prefix = settings.CACHE_MIDDLEWARE_KEY_PREFIX
+    lock_timeout = settings.PAGE_CACHE_LOCK_TIMEOUT
+
+    def decorator(view: Callable) -> Callable:
+
+        def lookup(request: HttpRequest, prefix: str) -> tuple[str | None, dict | None]:
+            page_cache = caches[cache_alias]
+            key = get_cache_key(request, prefix, 'GET', cache=page_cache)
+            return key, page_cache.get(key) if key is not None else None
+
+        def compute(request: HttpRequest, prefix: str, *args, **kwargs) -> tuple:
+            started = time.time()
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                response = response.render()
+            if response.status_code != 200 or response.streaming:
+                return response, None
+            patch_response_headers(response, timeout)
+            finished = time.time()
+            entry = {
+                'content': response.content,
+                'status': response.status_code,
+                'headers': dict(response.items()),
+                'expires': finished + timeout,
+                'delta': finished - started,
+            }
+            page_cache = caches[cache_alias]
+            key = learn_cache_key(request, response, timeout + stale_while_revalidate, prefix, cache=page_cache)
+            page_cache.set(key, entry, timeout + stale_while_revalidate)
+            return response, entry
+
+        def refresh(request: HttpRequest, prefix: str, flight_key: str, lock_key: str, *args, **kwargs) -> None:
+            try:
+                _single_flight.do(flight_key, lambda: compute(request, prefix, *args, **kwargs))
+            finally:
+                caches[cache_alias].delete(lock_key)
+                close_old_connections()
+
+        def load(request: HttpRequest, prefix: str, lock_key: str, *args, **kwargs) -> tuple:
+            page_cache = caches[cache_alias]
+            if page_cache.add(lock_key, 1, lock_timeout):
+                try:
+                    return compute(request, prefix, *args, **kwargs)
+                finally:
+                    page_cache.delete(lock_key)
+
+            # Another worker process is computing the page, wait for its result.
+            deadline = time.time() + lock_timeout
+            while time.time() < deadline:
+                time.sleep(settings.PAGE_CACHE_LOCK_POLL_INTERVAL)
+                _, entry = lookup(request, prefix)
+                if entry is not None:
+                    return None, entry
+            return compute(request, prefix, *args, **kwargs)
+
+        @wraps(view)
+        def wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+            if request.method != 'GET':
+                return view(request, *args, **kwargs)
+
+            page_cache = caches[cache_alias]
+            with timed('cache'):
+                generation = page_cache.get(_build_generation_key(key_prefix), 0)
+                prefix = f'{key_prefix}.{generation}'
+                key, entry = lookup(request, prefix)
+            CACHE_LOOKUPS.labels('pages', 'miss' if entry is None else 'hit').inc()
+            # Requests of a page whose variants are not known yet are coalesced by URL.
+            flight_key = key or _build_flight_key(request, prefix)
+            lock_key = f'{flight_key}.lock'
+
+            if entry is not None:
+                if _is_fresh(entry, beta):
+                    return _to_response(entry)
+                expired = time.time() >= entry['expires']
+                if not page_cache.add(lock_key, 1, lock_timeout):
+                    # Somebody else is recomputing the page.
+                    return _to_response(entry)
+                if not expired or stale_while_revalidate:
+                    _refresh_executor.submit(refresh, request, prefix, flight_key, lock_key, *args, **kwargs)
+                    return _to_response(entry)
+                page_cache.delete(lock_key)
+
+            (response, entry), leader = _single_flight.do(
+                flight_key, lambda: load(request, prefix, lock_key, *args, **kwargs)
+            )
+            if leader:
+                return response if response is not None else _to_response(entry)
+            # The leader may have computed another variant of the page.
+            _, entry = lookup(request, prefix)
+            if entry is not None:
+                return _to_response(entry)
+            # The page is not cacheable, every follower renders it on its own.
+            return view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
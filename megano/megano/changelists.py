@@ -0,0 +1,156 @@
+"""
+Admin changelists that stay fast on large tables.
+
+The stock changelist counts all rows twice per page (filtered and total)
+and pages with OFFSET, so both the count and deep pages scan the table.
+ScalableAdminMixin replaces them with:
+
+* counts that are exact up to ADMIN_EXACT_COUNT_LIMIT rows and estimated
+  above it;
+* keyset paging by primary key (``?after=<pk>``), which reads one index
+  range per page however deep the page is;
+* column trimming with ``list_only`` on top of ``list_select_related``;
+* prefix search with ``prefix_search_fields``, which is a range scan of the
+  index instead of LIKE '%term%' over the table. The term is lowercased, so
+  the fields must be indexed and hold lowercased values (models lowercase
+  them on save).
+
+Changelists sorted by a column fall back to numbered pages with the
+estimated count.
+"""
+from django.conf import settings
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
+
+CURSOR_VAR = 'after'
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that counts rows exactly only up to ADMIN_EXACT_COUNT_LIMIT.
+
+    Above the limit unfiltered tables are estimated from the database
+    statistics (PostgreSQL) or from the highest primary key, filtered ones
+    report the limit.
+
+    Attributes:
+        estimated: Whether the count is estimated.
+    """
+    estimated = False
+
+    @cached_property
+    def count(self) -> int:
+        limit = settings.ADMIN_EXACT_COUNT_LIMIT
+        queryset = self.object_list
+        exact = queryset.order_by().values('pk')[:limit + 1].count()
+        if exact <= limit:
+            return exact
+        self.estimated = True
+        if queryset.query.has_filters():
+            return limit
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] > 0:
+                return row[0]
+        return max(queryset.order_by().aggregate(last_pk=Max('pk'))['last_pk'] or 0, limit)
+
+
+class KeysetChangeList(ChangeList):
+    """
+    Changelist paged by primary key instead of OFFSET.
+
+    Attributes:
+        cursor: Primary key the current page starts after.
+        next_cursor: Primary key the next page starts after.
+        keyset: Whether the page is keyset paged.
+    """
+    def __init__(self, request, *args, **kwargs):
+        try:
+            self.cursor = int(request.GET.get(CURSOR_VAR, 0)) or None
+        except ValueError:
+            self.cursor = None
+        self.next_cursor = None
+        self.keyset = ORDER_VAR not in request.GET
+        super().__init__(request, *args, **kwargs)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        new_params = {CURSOR_VAR: None, **(new_params or {})}
+        return super().get_query_string(new_params, remove)
+
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        if self.model_admin.list_only:
+            queryset = queryset.only(*self.model_admin.list_only)
+        return queryset
+
+    def get_results(self, request):
+        if not self.keyset or self.show_all:
+            return super().get_results(request)
+
+        queryset = self.queryset.order_by('-pk')
+        paginator = self.model_admin.get_paginator(request, queryset, self.list_per_page)
+        if self.cursor:
+            queryset = queryset.filter(pk__lt=self.cursor)
+        edge = list(queryset.values_list('pk', flat=True)[self.list_per_page - 1:self.list_per_page + 1])
+        if edge:
+            queryset = queryset.filter(pk__gte=edge[0])
+            if len(edge) > 1:
+                self.next_cursor = edge[0]
+
+        self.result_count = paginator.count
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = queryset
+        self.can_show_all = False
+        self.multi_page = bool(self.cursor or self.next_cursor)
+        self.paginator = paginator
+
+
+class ScalableAdminMixin:
+    """
+    ModelAdmin mixin with estimated counts, keyset paging and column trimming.
+
+    Attributes:
+        list_only: Fields loaded for the changelist rows (all fields if empty).
+        prefix_search_fields: Indexed fields with lowercased values searched by prefix (search_fields are used if empty).
+        paginator: Paginator with estimated counts.
+        show_full_result_count: Disabled to avoid counting the whole table.
+        change_list_template: Changelist template with keyset pagination links.
+
+    Methods:
+        get_changelist: Get keyset paged changelist class.
+        get_search_results: Search by primary key and by prefix of the indexed fields.
+    """
+    list_only = ()
+    prefix_search_fields = ()
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    change_list_template = 'admin/keyset_change_list.html'
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not self.prefix_search_fields or not term:
+            return super().get_search_results(request, queryset, search_term)
+        condition = Q(pk=int(term)) if term.isdigit() else Q()
+        key = term.lower()
+        for field in self.prefix_search_fields:
+            condition |= Q(**{f'{field}__gte': key, f'{field}__lt': key + '\U0010ffff'})
+        return queryset.filter(condition), False
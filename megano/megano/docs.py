@@ -0,0 +1,44 @@
+"""
+Lazily built API documentation.
+
+drf_yasg and the OpenAPI schema view are imported on the first request to
+``docs/`` instead of the worker startup. With API_DOCS = 'off' the page is
+not mounted and drf_yasg is not installed at all.
+"""
+from functools import cache
+
+from django.http import HttpRequest, HttpResponse
+
+
+@cache
+def get_docs_view():
+    """
+    Build swagger view of the API schema once per process.
+
+    Returns:
+        Callable: Swagger UI view.
+    """
+    from drf_yasg import openapi
+    from drf_yasg.views import get_schema_view
+    from rest_framework import permissions
+
+    schema_view = get_schema_view(
+        openapi.Info(
+            title="Snippets API",
+            default_version='v1',
+            description="Test description",
+            terms_of_service="https://www.google.com/policies/terms/",
+            contact=openapi.Contact(email="contact@snippets.local"),
+            license=openapi.License(name="BSD License"),
+        ),
+        public=True,
+        permission_classes=[permissions.IsAdminUser,],
+    )
+    return schema_view.with_ui('swagger', cache_timeout=0)
+
+
+def docs_view(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+    """
+    Swagger UI of the API, the schema view is built on the first call.
+    """
+    return get_docs_view()(request, *args, **kwargs)
@@ -0,0 +1,508 @@
+"""
+Process metrics shared by the worker processes.
+
+Every process keeps its metric values in its own memory-mapped file in
+METRICS_DIR, so recording needs no locks between the processes. The
+metrics view sums the files of all processes and renders them in the
+Prometheus text format. The counters must not go down, so the files of the
+finished processes are not dropped: the collection merges them into one
+file and removes them, and the directory doesn't grow with every restarted
+worker. The directory should be emptied when the server is restarted.
+
+A file is a sequence of records: the series key (JSON of the sample name
+and the label values) padded to 8 bytes and the float64 value. Series are
+appended once per label set, afterwards recording adds to the value in
+place through a float64 view of the mapping: it does not build keys,
+label strings or records and holds the process lock only for the addition.
+
+Usage:
+    MIDDLEWARE = ['megano.timing.ServerTimingMiddleware', 'megano.metrics.MetricsMiddleware', ...]
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse, HttpResponseForbidden
+
+from .timing import get_request_timings
+
+_HEADER = struct.Struct('<Q')
+_KEY_LENGTH = struct.Struct('<I')
+_INITIAL_SIZE = 1 << 16
+
+# Values of the finished processes.
+_MERGED_FILE = 'merged.db'
+_COLLECT_LOCK_FILE = 'collect.lock'
+# A lock older than this is left by a crashed process.
+_COLLECT_LOCK_TIMEOUT = 30
+
+UNMATCHED_ROUTE = '<unmatched>'
+# Any other method, including made up ones, is recorded as OTHER_METHOD.
+KNOWN_METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS', 'TRACE', 'CONNECT'))
+OTHER_METHOD = 'other'
+
+
+class MetricsFile:
+    """
+    Memory-mapped file with the metric values of one process.
+
+    Methods:
+        slot: Get index of the series value, appending the series if needed.
+        add: Add amount to the value.
+        close: Close the file.
+        read: Read series of a metrics file.
+    """
+    def __init__(self, path: Path):
+        self._file = open(path, 'a+b')
+        if os.fstat(self._file.fileno()).st_size < _INITIAL_SIZE:
+            self._file.truncate(_INITIAL_SIZE)
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        self._values = memoryview(self._map).cast('d')
+        self._used = _HEADER.unpack_from(self._map)[0] or _HEADER.size
+        self._slots = {key: offset // 8 for key, offset in self._records(self._map, self._used)}
+
+    @staticmethod
+    def _records(data, used: int):
+        offset = _HEADER.size
+        while offset < used:
+            length = _KEY_LENGTH.unpack_from(data, offset)[0]
+            key = bytes(data[offset + _KEY_LENGTH.size:offset + _KEY_LENGTH.size + length]).decode()
+            offset += (_KEY_LENGTH.size + length + 7) // 8 * 8
+            yield key, offset
+            offset += 8
+
+    def slot(self, key: str) -> int:
+        """
+        Get index of the series value, appending the series if needed.
+
+        Must be called with the registry lock held.
+
+        Args:
+            key: Series key.
+
+        Returns:
+            int: Index of the value in the float64 view.
+        """
+        slot = self._slots.get(key)
+        if slot is not None:
+            return slot
+        encoded = key.encode()
+        value_offset = self._used + (_KEY_LENGTH.size + len(encoded) + 7) // 8 * 8
+        if value_offset + 8 > len(self._map):
+            self._values.release()
+            self._map.resize(max(len(self._map) * 2, value_offset + 8))
+            self._values = memoryview(self._map).cast('d')
+        _KEY_LENGTH.pack_into(self._map, self._used, len(encoded))
+        self._map[self._used + _KEY_LENGTH.size:self._used + _KEY_LENGTH.size + len(encoded)] = encoded
+        self._values[value_offset // 8] = 0.0
+        self._used = value_offset + 8
+        # The record becomes visible to the readers after it is complete.
+        _HEADER.pack_into(self._map, 0, self._used)
+        self._slots[key] = slot = value_offset // 8
+        return slot
+
+    def add(self, slot: int, amount: float) -> None:
+        self._values[slot] += amount
+
+    def close(self) -> None:
+        self._values.release()
+        self._map.close()
+        self._file.close()
+
+    @classmethod
+    def read(cls, path: Path) -> list[tuple[str, float]]:
+        """
+        Read series of a metrics file.
+
+        Args:
+            path: File path.
+
+        Returns:
+            list: Series keys with their values.
+        """
+        data = path.read_bytes()
+        if len(data) < _HEADER.size:
+            return []
+        used = _HEADER.unpack_from(data)[0]
+        return [(key, struct.unpack_from('<d', data, offset)[0]) for key, offset in cls._records(data, used)]
+
+
+class MetricsRegistry:
+    """
+    Registry of the process metrics.
+
+    The file of the process is opened on the first recording. Forked
+    processes (e.g. preloading server workers) open their own files.
+
+    Attributes:
+        metrics: Registered metrics by name.
+
+    Methods:
+        counter: Register counter.
+        histogram: Register histogram.
+        slot: Get index of the series value.
+        add: Add amount to the series value.
+        collect: Sum series of all processes.
+    """
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self._file = None
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self) -> None:
+        self.lock = threading.Lock()
+        self._file = None
+        for metric in self.metrics.values():
+            metric.children.clear()
+
+    def counter(self, name: str, documentation: str, labelnames: tuple[str, ...]) -> 'Counter':
+        self.metrics[name] = metric = Counter(self, name, documentation, labelnames)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple[str, ...],
+                  buckets: tuple[float, ...]) -> 'Histogram':
+        self.metrics[name] = metric = Histogram(self, name, documentation, labelnames, buckets)
+        return metric
+
+    def slot(self, key: str) -> int:
+        """
+        Get index of the series value, opening the process file if needed.
+
+        Must be called with the lock held.
+
+        Args:
+            key: Series key.
+
+        Returns:
+            int: Index of the value.
+        """
+        if self._file is None:
+            directory = Path(settings.METRICS_DIR)
+            directory.mkdir(parents=True, exist_ok=True)
+            self._file = MetricsFile(directory / f'{os.getpid()}.db')
+        return self._file.slot(key)
+
+    def add(self, slot: int, amount: float) -> None:
+        self._file.add(slot, amount)
+
+    def collect(self) -> dict[str, float]:
+        """
+        Sum series of all processes.
+
+        Files of the finished processes are merged first. Collections run
+        one at a time, so they don't see the values merged twice or not at all.
+
+        Returns:
+            dict: Series values by key.
+        """
+        directory = Path(settings.METRICS_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        with _collect_lock(directory) as locked:
+            if locked:
+                _merge_finished(directory)
+            totals = {}
+            for path in sorted(directory.glob('*.db')):
+                for key, value in MetricsFile.read(path):
+                    totals[key] = totals.get(key, 0.0) + value
+        return totals
+
+
+@contextmanager
+def _collect_lock(directory: Path):
+    """
+    Hold the collection lock of the metrics directory.
+
+    Yields:
+        bool: True if the lock is held, False if it wasn't released in time.
+    """
+    path = directory / _COLLECT_LOCK_FILE
+    deadline = time.monotonic() + _COLLECT_LOCK_TIMEOUT
+    while True:
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            try:
+                if time.time() - path.stat().st_mtime > _COLLECT_LOCK_TIMEOUT:
+                    path.unlink(missing_ok=True)
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.monotonic() > deadline:
+                yield False
+                return
+            time.sleep(0.01)
+    try:
+        yield True
+    finally:
+        path.unlink(missing_ok=True)
+
+
+def _merge_finished(directory: Path) -> None:
+    """
+    Move values of the finished processes into the merged file.
+
+    Must be called with the collection lock held.
+
+    Args:
+        directory: Metrics directory.
+    """
+    finished = [
+        path for path in directory.glob('*.db')
+        if path.stem.isdigit() and not _is_process_alive(int(path.stem))
+    ]
+    if not finished:
+        return
+    merged = MetricsFile(directory / _MERGED_FILE)
+    try:
+        for path in finished:
+            for key, value in MetricsFile.read(path):
+                merged.add(merged.slot(key), value)
+            path.unlink()
+    finally:
+        merged.close()
+
+
+def _is_process_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    if os.name == 'nt':
+        # os.kill terminates the process on Windows, the files are kept.
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Counter:
+    """
+    Monotonic counter with labels.
+
+    Attributes:
+        name: Metric name.
+        documentation: Metric help text.
+        labelnames: Names of the labels.
+        children: Label values series by label values.
+
+    Methods:
+        labels: Get series of the label values.
+    """
+    type = 'counter'
+
+    def __init__(self, registry: MetricsRegistry, name: str, documentation: str, labelnames: tuple[str, ...]):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.children = {}
+
+    def labels(self, *values: str) -> 'CounterChild':
+        child = self.children.get(values)
+        if child is None:
+            with self.registry.lock:
+                slot = self.registry.slot(json.dumps([self.name, values]))
+            child = self.children.setdefault(values, CounterChild(self.registry, slot))
+        return child
+
+    def samples(self, totals: dict[str, float]):
+        for key, value in totals.items():
+            name, values = json.loads(key)
+            if name == self.name:
+                yield self.name, dict(zip(self.labelnames, values)), value
+
+
+class CounterChild:
+    """
+    Counter series of one label set.
+
+    Methods:
+        inc: Increase the counter.
+    """
+    __slots__ = ('registry', 'slot')
+
+    def __init__(self, registry: MetricsRegistry, slot: int):
+        self.registry = registry
+        self.slot = slot
+
+    def inc(self, amount: float = 1) -> None:
+        with self.registry.lock:
+            self.registry.add(self.slot, amount)
+
+
+class Histogram(Counter):
+    """
+    Histogram with labels.
+
+    Bucket counts are stored per bucket and made cumulative on export.
+
+    Attributes:
+        buckets: Upper bounds of the buckets (the +Inf bucket is added).
+    """
+    type = 'histogram'
+
+    def __init__(self, registry: MetricsRegistry, name: str, documentation: str, labelnames: tuple[str, ...],
+                 buckets: tuple[float, ...]):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def labels(self, *values: str) -> 'HistogramChild':
+        child = self.children.get(values)
+        if child is None:
+            with self.registry.lock:
+                slots = tuple(
+                    self.registry.slot(json.dumps([f'{self.name}_bucket', [*values, bound]]))
+                    for bound in (*map(_format_value, self.buckets), '+Inf')
+                )
+                sum_slot = self.registry.slot(json.dumps([f'{self.name}_sum', values]))
+            child = self.children.setdefault(values, HistogramChild(self.registry, self.buckets, slots, sum_slot))
+        return child
+
+    def samples(self, totals: dict[str, float]):
+        series = {}
+        for key, value in totals.items():
+            name, values = json.loads(key)
+            if name == f'{self.name}_bucket':
+                series.setdefault(tuple(values[:-1]), {})[values[-1]] = value
+            elif name == f'{self.name}_sum':
+                series.setdefault(tuple(values), {})['sum'] = value
+        for values, data in series.items():
+            labels = dict(zip(self.labelnames, values))
+            count = 0.0
+            for bound in (*map(_format_value, self.buckets), '+Inf'):
+                count += data.get(bound, 0.0)
+                yield f'{self.name}_bucket', {**labels, 'le': bound}, count
+            yield f'{self.name}_sum', labels, data.get('sum', 0.0)
+            yield f'{self.name}_count', labels, count
+
+
+class HistogramChild:
+    """
+    Histogram series of one label set.
+
+    Methods:
+        observe: Record observed value.
+    """
+    __slots__ = ('registry', 'buckets', 'slots', 'sum_slot')
+
+    def __init__(self, registry: MetricsRegistry, buckets: tuple[float, ...], slots: tuple[int, ...],
+                 sum_slot: int):
+        self.registry = registry
+        self.buckets = buckets
+        self.slots = slots
+        self.sum_slot = sum_slot
+
+    def observe(self, value: float) -> None:
+        slot = self.slots[bisect_left(self.buckets, value)]
+        with self.registry.lock:
+            self.registry.add(slot, 1)
+            self.registry.add(self.sum_slot, value)
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else f'{value:.1f}'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+registry = MetricsRegistry()
+
+_SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+REQUEST_DURATION = registry.histogram(
+    'http_request_duration_seconds', 'Request latency.', ('route', 'method'),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+RESPONSE_SIZE = registry.histogram(
+    'http_response_size_bytes', 'Response body size.', ('route', 'method'), buckets=_SIZE_BUCKETS,
+)
+RESPONSES = registry.counter('http_responses_total', 'Responses by status code.', ('route', 'method', 'status'))
+REQUEST_QUERIES = registry.histogram(
+    'http_request_sql_queries', 'SQL queries per request.', ('route', 'method'),
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200),
+)
+CACHE_LOOKUPS = registry.counter('cache_lookups_total', 'Cache lookups by result (hit or miss).', ('cache', 'result'))
+SESSION_SIZE = registry.histogram(
+    'session_size_bytes', 'Size of the saved session payloads.', (), buckets=_SIZE_BUCKETS,
+)
+BASKET_SIZE = registry.histogram(
+    'basket_size_products', 'Number of products in the served baskets.', (), buckets=(0, 1, 2, 3, 5, 10, 20, 50),
+)
+
+
+def render_metrics() -> str:
+    """
+    Render metrics of all processes in the Prometheus text format.
+
+    Returns:
+        str: Exposition text.
+    """
+    totals = registry.collect()
+    lines = []
+    for metric in registry.metrics.values():
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        for name, labels, value in metric.samples(totals):
+            label_text = ','.join(f'{key}="{_escape(str(label))}"' for key, label in labels.items())
+            lines.append(f'{name}{{{label_text}}} {_format_value(value)}' if label_text
+                         else f'{name} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """
+    Prometheus metrics endpoint.
+
+    Available to the addresses of METRICS_ALLOWED_IPS and to the staff.
+
+    Args:
+        request: Current HTTP request.
+
+    Returns:
+        HttpResponse: Metrics of all processes or 403 status code.
+    """
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS and not request.user.is_staff:
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class MetricsMiddleware:
+    """
+    Middleware that records request metrics.
+
+    Must follow ServerTimingMiddleware, whose timings provide the request
+    SQL query counts.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        started = time.perf_counter()
+        response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = request.resolver_match
+        route = match.route if match is not None else UNMATCHED_ROUTE
+        method = request.method if request.method in KNOWN_METHODS else OTHER_METHOD
+        REQUEST_DURATION.labels(route, method).observe(elapsed)
+        RESPONSES.labels(route, method, response.status_code).inc()
+        if not response.streaming:
+            RESPONSE_SIZE.labels(route, method).observe(len(response.content))
+        timings = get_request_timings()
+        if timings is not None:
+            REQUEST_QUERIES.labels(route, method).observe(timings.counts['sql'])
+        return response
@@ -0,0 +1,292 @@
+"""
+Cache-backed session engine with asynchronous write-through to the database.
+
+Sessions are read from and written to the cache. Database rows are written by
+a background thread that coalesces all changes of a session made during the
+flush interval into one row update. Writes are skipped when the session
+payload did not change, and payloads above SESSION_COMPRESS_MIN_SIZE bytes
+are stored compressed in the cache.
+
+Usage:
+    SESSION_ENGINE = 'megano.sessions'
+"""
+import atexit
+import hashlib
+import json
+import logging
+import threading
+import zlib
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.sessions.backends.base import CreateError
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.core.cache import caches
+from django.db import DatabaseError, close_old_connections
+from django.utils import timezone
+
+from .metrics import CACHE_LOOKUPS, SESSION_SIZE
+from .timing import timed
+
+KEY_PREFIX = 'megano.sessions.'
+
+logger = logging.getLogger('django.contrib.sessions')
+
+_RAW = b'r'
+_COMPRESSED = b'z'
+
+
+def pack_session(session_dict: dict) -> bytes:
+    """
+    Serialize session data for the cache, compressing large payloads.
+
+    Args:
+        session_dict: Session data.
+
+    Returns:
+        bytes: Packed payload.
+    """
+    payload = json.dumps(session_dict, separators=(',', ':')).encode()
+    if len(payload) >= settings.SESSION_COMPRESS_MIN_SIZE:
+        return _COMPRESSED + zlib.compress(payload)
+    return _RAW + payload
+
+
+def unpack_session(packed: bytes) -> dict:
+    """
+    Restore session data packed by pack_session.
+
+    Args:
+        packed: Packed payload.
+
+    Returns:
+        dict: Session data.
+    """
+    payload = packed[1:]
+    if packed[:1] == _COMPRESSED:
+        payload = zlib.decompress(payload)
+    return json.loads(payload)
+
+
+class SessionWriter:
+    """
+    Background writer that flushes changed sessions to the database.
+
+    Pending changes are kept per session key, so repeated changes of one
+    session are written as a single row. Rows are written and deleted under
+    one lock, so a session deleted on logout is not written back by a flush
+    that was already running.
+
+    Methods:
+        schedule: Schedule session row write.
+        pending: Get pending session data.
+        delete: Drop pending write of the session and delete its row.
+        flush: Write all pending sessions to the database.
+        flush_at_exit: Write pending sessions when the process exits.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pending: dict[str, tuple[str, datetime]] = {}
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def schedule(self, session_key: str, session_data: str, expire_date: datetime) -> None:
+        """
+        Schedule session row write.
+
+        Args:
+            session_key: Session key.
+            session_data: Encoded session data as it's stored in the database.
+            expire_date: Session expiration date.
+        """
+        with self._lock:
+            self._pending[session_key] = (session_data, expire_date)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='session-writer', daemon=True)
+                self._thread.start()
+
+    def pending(self, session_key: str) -> tuple[str, datetime] | None:
+        """
+        Get session data that is not written to the database yet.
+
+        Args:
+            session_key: Session key.
+
+        Returns:
+            tuple | None: Encoded session data and expiration date.
+        """
+        return self._pending.get(session_key)
+
+    def delete(self, session_key: str) -> None:
+        """
+        Drop pending write of the session and delete its row.
+
+        Waits for the running flush, so the row is not written back after it
+        is deleted.
+
+        Args:
+            session_key: Session key.
+        """
+        with self._write_lock:
+            with self._lock:
+                self._pending.pop(session_key, None)
+            DBStore.get_model_class().objects.filter(session_key=session_key).delete()
+
+    def flush(self) -> int:
+        """
+        Write all pending sessions to the database.
+
+        Returns:
+            int: Number of written sessions.
+        """
+        with self._write_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            model = DBStore.get_model_class()
+            objects = [
+                model(session_key=key, session_data=data, expire_date=expire_date)
+                for key, (data, expire_date) in pending.items()
+            ]
+            model.objects.bulk_create(
+                objects,
+                batch_size=settings.SESSION_BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=['session_key'],
+                update_fields=['session_data', 'expire_date'],
+            )
+            return len(objects)
+
+    def flush_at_exit(self) -> None:
+        """
+        Write pending sessions when the process exits, the database may be unavailable by then.
+        """
+        try:
+            self.flush()
+        except DatabaseError as error:
+            logger.warning('Failed to write sessions to the database: %s', error)
+
+    def _run(self) -> None:
+        while not self._wakeup.wait(settings.SESSION_WRITE_BEHIND_INTERVAL):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Failed to write sessions to the database')
+            finally:
+                close_old_connections()
+
+
+writer = SessionWriter()
+atexit.register(writer.flush_at_exit)
+
+
+class SessionStore(DBStore):
+    """
+    Session store that keeps sessions in the cache and writes them to the database asynchronously.
+
+    Attributes:
+        cache_key_prefix: Prefix of the session cache keys.
+
+    Methods:
+        load: Load session data from the cache or from the database.
+        exists: Check whether session key exists.
+        save: Save session to the cache and schedule database write.
+        delete: Delete session.
+        clear_expired: Delete expired sessions and the anonymous baskets left by them in batches.
+    """
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        self._cache = caches[settings.SESSION_CACHE_ALIAS]
+        self._loaded_digest = None
+        super().__init__(session_key)
+
+    @property
+    def cache_key(self):
+        return self.cache_key_prefix + self._get_or_create_session_key()
+
+    def load(self):
+        try:
+            with timed('cache'):
+                packed = self._cache.get(self.cache_key)
+        except Exception:
+            # Some backends (e.g. memcache) raise an exception on invalid
+            # cache keys. If this happens, reset the session.
+            packed = None
+        CACHE_LOOKUPS.labels('sessions', 'miss' if packed is None else 'hit').inc()
+
+        if packed is not None:
+            self._loaded_digest = hashlib.md5(packed).digest()
+            return unpack_session(packed)
+
+        pending = writer.pending(self.session_key)
+        if pending is not None:
+            session_data, expire_date = pending
+        else:
+            s = self._get_session_from_db()
+            if not s:
+                return {}
+            session_data, expire_date = s.session_data, s.expire_date
+        data = self.decode(session_data)
+        packed = pack_session(data)
+        self._cache.set(self.cache_key, packed, self.get_expiry_age(expiry=expire_date))
+        self._loaded_digest = hashlib.md5(packed).digest()
+        return data
+
+    def exists(self, session_key):
+        return bool(session_key) and (
+            (self.cache_key_prefix + session_key) in self._cache
+            or writer.pending(session_key) is not None
+            or super().exists(session_key)
+        )
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        packed = pack_session(data)
+        digest = hashlib.md5(packed).digest()
+        if not must_create and digest == self._loaded_digest:
+            return
+        SESSION_SIZE.labels().observe(len(packed))
+
+        timeout = self.get_expiry_age()
+        if must_create:
+            if not self._cache.add(self.cache_key, packed, timeout) or super().exists(self.session_key):
+                raise CreateError
+        else:
+            self._cache.set(self.cache_key, packed, timeout)
+        self._loaded_digest = digest
+        writer.schedule(self.session_key, self.encode(data), self.get_expiry_date())
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        self._cache.delete(self.cache_key_prefix + session_key)
+        writer.delete(session_key)
+
+    def flush(self):
+        self.clear()
+        self.delete(self.session_key)
+        self._session_key = None
+
+    @classmethod
+    def clear_expired(cls):
+        model = cls.get_model_class()
+        batch_size = settings.SESSION_BATCH_SIZE
+        now = timezone.now()
+        while True:
+            keys = list(
+                model.objects.filter(expire_date__lt=now).values_list('session_key', flat=True)[:batch_size]
+            )
+            if not keys:
+                break
+            model.objects.filter(session_key__in=keys).delete()
+
+        from basket.misc import clear_expired_baskets
+
+        clear_expired_baskets(batch_size)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -28,6 +29,11 @@ DEBUG = True
 ALLOWED_HOSTS = [
 ]
 
+# API documentation at docs/: 'lazy' builds the schema view on the first
+# request (see megano.docs), 'off' doesn't mount it or install drf_yasg,
+# which speeds up the worker startup in production.
+API_DOCS = 'lazy'
+
 
 # Application definition
 
@@ -38,17 +44,23 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'drf_yasg',
+    *(['drf_yasg'] if API_DOCS != 'off' else []),
     'frontend',
     'rest_framework',
     'basket.apps.BasketConfig',
     'orders.apps.OrdersConfig',
     'products.apps.ProductsConfig',
     'users.apps.UsersConfig',
+    'jobs.apps.JobsConfig',
+    'analytics.apps.AnalyticsConfig',
+    'monitoring.apps.MonitoringConfig',
     'django_cleanup.apps.CleanupConfig',
 ]
 
 MIDDLEWARE = [
+    'megano.timing.ServerTimingMiddleware',
+    'megano.metrics.MetricsMiddleware',
+    'monitoring.sqlstats.SQLStatsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,6 +68,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'monitoring.profiler.ProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'megano.urls'
@@ -63,7 +76,7 @@ ROOT_URLCONF = 'megano.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
+        'DIRS': [BASE_DIR / 'megano' / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -98,8 +111,22 @@ CACHES = {
 
 CACHE_MIDDLEWARE_SECONDS = 200
 
+# Page cache stampede protection (see megano.cache.coalesced_cache_page)
+PAGE_CACHE_EARLY_EXPIRATION_BETA = 1.0
+PAGE_CACHE_STALE_SECONDS = 60
+PAGE_CACHE_LOCK_TIMEOUT = 10
+PAGE_CACHE_LOCK_POLL_INTERVAL = 0.05
+
+# How often (in seconds) a worker checks whether site settings were changed
+SITE_SETTINGS_CHECK_INTERVAL = 1
 
+SESSION_ENGINE = 'megano.sessions'
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
+# Session engine tuning (see megano.sessions)
+SESSION_WRITE_BEHIND_INTERVAL = 2
+SESSION_COMPRESS_MIN_SIZE = 1024
+SESSION_BATCH_SIZE = 1000
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -144,7 +171,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'megano.timing.TimedJSONRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
@@ -158,3 +185,104 @@ REST_FRAMEWORK = {
 ORDERING_PARAM = 'ordering'
 
 BASKET_SESSION_ID = 'basket'
+BASKET_TOKEN_SESSION_ID = 'basket_token'
+# Orders placed by an anonymous visitor are available only to their session
+GUEST_ORDERS_SESSION_ID = 'guest_orders'
+GUEST_ORDERS_LIMIT = 20
+
+# How long (in seconds) products are held in stock for an unpaid order
+STOCK_RESERVATION_TTL = 15 * 60
+STOCK_RESERVATION_BATCH_SIZE = 500
+
+# Background payment processing (see orders.payments)
+# Number of payment worker threads in every web process, 0 leaves
+# payments to the process_payments management command.
+PAYMENT_WORKERS = 4
+PAYMENT_PROVIDER_LATENCY = 1.0
+PAYMENT_PROVIDER_FAILURE_RATE = 0.0
+PAYMENT_PROCESSING_TIMEOUT = 60
+PAYMENT_STATUS_MAX_WAIT = 20
+PAYMENT_STATUS_POLL_INTERVAL = 0.25
+PAYMENT_METRICS_WINDOW = 60
+
+# Background jobs (see jobs.queue). Queue concurrency limits the number of
+# jobs of the queue run at the same time by all workers. Workers queue the
+# purge of the jobs finished JOB_RETENTION seconds ago every JOB_PURGE_INTERVAL.
+JOB_QUEUES = {
+    'default': {'concurrency': 4},
+}
+JOB_DEFAULT_MAX_ATTEMPTS = 5
+JOB_RETRY_BASE_DELAY = 5
+JOB_RETRY_MAX_DELAY = 60 * 60
+JOB_LOCK_TIMEOUT = 10 * 60
+JOB_POLL_INTERVAL = 1
+JOB_RETENTION = 7 * 24 * 60 * 60
+JOB_PURGE_INTERVAL = 60 * 60
+
+# Order events outbox (see orders.outbox)
+ORDER_EVENT_HANDLERS = [
+    'orders.outbox.CallbackHandler',
+    # 'orders.outbox.WebhookHandler',
+    # 'orders.outbox.FileHandler',
+]
+ORDER_EVENT_BATCH_SIZE = 100
+# Extended before every event, must exceed the delivery time of one event.
+ORDER_EVENT_LOCK_TIMEOUT = 60
+ORDER_EVENT_RETRY_DELAY = 5
+ORDER_EVENT_WEBHOOK_URL = ''
+ORDER_EVENT_WEBHOOK_TIMEOUT = 5
+ORDER_EVENT_FILE = BASE_DIR / 'order_events.jsonl'
+
+# Sales rollups (see analytics.rollups)
+ANALYTICS_ROLLUP_BATCH_SIZE = 1000
+ANALYTICS_ROLLUP_DELAY = 60
+ANALYTICS_ROLLUP_SETTLE_SECONDS = 5
+
+# Admin changelists count rows exactly up to this number and estimate above it
+ADMIN_EXACT_COUNT_LIMIT = 10000
+
+# Rows per insert of the bulk product operations (see products.misc)
+PRODUCT_BULK_BATCH_SIZE = 1000
+
+# Request timing breakdown (see megano.timing). A share of the requests and
+# every request slower than REQUEST_TIMING_SLOW_MS are logged. The
+# Server-Timing header is sent only to staff users and in DEBUG unless it's
+# turned on for everyone. Serialization is measured by patching the DRF
+# serializers, so it's opt-in.
+REQUEST_TIMING_HEADER = False
+REQUEST_TIMING_SERIALIZERS = False
+REQUEST_TIMING_LOG_SAMPLE_RATE = 0.01
+REQUEST_TIMING_SLOW_MS = 500
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'timing': {'class': 'logging.StreamHandler', 'formatter': 'message'},
+    },
+    'loggers': {
+        'megano.timing': {'handlers': ['timing'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+# Prometheus metrics (see megano.metrics). Every process writes its values
+# to a file in METRICS_DIR, files of the finished processes are merged on
+# collection. Empty the directory when the server restarts.
+METRICS_DIR = Path(tempfile.gettempdir()) / 'megano-metrics'
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+# SQL statistics (see monitoring.sqlstats). Query plans are captured for the
+# statements slower than SQL_STATS_SLOW_MS.
+SQL_STATS_SLOW_MS = 100
+SQL_STATS_FLUSH_INTERVAL = 60
+SQL_STATS_MAX_FINGERPRINTS = 2000
+
+# On-demand request profiling (see monitoring.profiler). Profiles are stored
+# in PROFILER_DIR, outside of the published media files.
+PROFILER_DIR = BASE_DIR / 'profiles'
+PROFILER_CHECK_INTERVAL = 1
+PROFILER_SAMPLE_INTERVAL = 0.005
+PROFILER_TRACEMALLOC_FRAMES = 25
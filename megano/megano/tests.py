@@ -0,0 +1,238 @@
+"""
+Project infrastructure tests.
+"""
+import subprocess
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from unittest import mock
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import clear_url_caches, get_resolver
+from rest_framework.serializers import BaseSerializer
+
+from orders.models import Order
+
+from . import metrics, sessions, timing
+from .changelists import CURSOR_VAR
+from .sessions import SessionStore, pack_session, unpack_session
+from .warmup import warm_up
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class PackSessionTests(SimpleTestCase):
+    """
+    Tests of the session payload packing.
+    """
+    def test_small_payload_is_stored_raw(self):
+        packed = pack_session({'basket': {'1': 2}})
+        self.assertEqual(packed[:1], b'r')
+        self.assertEqual(unpack_session(packed), {'basket': {'1': 2}})
+
+    @override_settings(SESSION_COMPRESS_MIN_SIZE=16)
+    def test_large_payload_is_compressed(self):
+        data = {'history': list(range(100))}
+        packed = pack_session(data)
+        self.assertEqual(packed[:1], b'z')
+        self.assertEqual(unpack_session(packed), data)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SessionStoreTests(TestCase):
+    """
+    Tests of the cache-backed session store.
+    """
+    def setUp(self):
+        sessions.writer.flush()
+
+    def test_session_is_written_behind(self):
+        session = SessionStore()
+        session['basket_token'] = 'token'
+        session.save()
+        self.assertEqual(SessionStore(session.session_key)['basket_token'], 'token')
+        self.assertIsNotNone(sessions.writer.pending(session.session_key))
+        sessions.writer.flush()
+        self.assertEqual(Session.objects.get(pk=session.session_key).get_decoded(), {'basket_token': 'token'})
+
+    def test_unchanged_session_is_not_written(self):
+        session = SessionStore()
+        session['basket_token'] = 'token'
+        session.save()
+        sessions.writer.flush()
+        loaded = SessionStore(session.session_key)
+        loaded['basket_token']
+        loaded.save()
+        self.assertIsNone(sessions.writer.pending(session.session_key))
+
+    def test_delete_drops_pending_write(self):
+        session = SessionStore()
+        session['basket_token'] = 'token'
+        session.save()
+        session.delete()
+        self.assertEqual(sessions.writer.flush(), 0)
+        self.assertFalse(Session.objects.filter(pk=session.session_key).exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SessionWriterRaceTests(TransactionTestCase):
+    """
+    Tests of a logout that happens while the writer flushes sessions.
+    """
+    def test_deleted_session_is_not_written_back(self):
+        session = SessionStore()
+        session['_auth_user_id'] = '1'
+        session.save()
+        bulk_create = Session.objects.bulk_create
+        logout = threading.Thread(target=self.logout, args=(session.session_key,))
+
+        def slow_bulk_create(*args, **kwargs):
+            logout.start()
+            logout.join(0.2)
+            # The logout waits for the running flush.
+            self.assertTrue(logout.is_alive())
+            return bulk_create(*args, **kwargs)
+
+        with mock.patch.object(Session.objects, 'bulk_create', slow_bulk_create):
+            sessions.writer.flush()
+        logout.join()
+        self.assertFalse(Session.objects.filter(pk=session.session_key).exists())
+
+    @staticmethod
+    def logout(session_key: str) -> None:
+        try:
+            SessionStore(session_key).delete()
+        finally:
+            connection.close()
+
+
+class WarmUpTests(SimpleTestCase):
+    """
+    Tests of the worker warm-up.
+    """
+    def test_compiles_url_resolvers(self):
+        clear_url_caches()
+        warm_up()
+        resolver = get_resolver()
+        self.assertTrue(resolver._populated)
+        self.assertTrue(all('regex' in vars(pattern.pattern) for pattern in resolver.url_patterns))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ServerTimingHeaderTests(TestCase):
+    """
+    Tests of the Server-Timing header visibility.
+    """
+    url = '/api/tags/'
+
+    def test_header_is_hidden_from_visitors(self):
+        self.assertNotIn('Server-Timing', self.client.get(self.url))
+
+    def test_header_is_sent_to_staff(self):
+        self.client.force_login(User.objects.create_user('admin', is_staff=True))
+        self.assertIn('total;dur=', self.client.get(self.url)['Server-Timing'])
+
+    @override_settings(REQUEST_TIMING_HEADER=True)
+    def test_header_is_sent_when_on(self):
+        self.assertIn('Server-Timing', self.client.get(self.url))
+
+
+class InstrumentSerializersTests(SimpleTestCase):
+    """
+    Tests of the serializers instrumentation.
+    """
+    def test_instrumentation_is_reversible(self):
+        original = BaseSerializer.data
+        timing.instrument_serializers()
+        self.addCleanup(timing.uninstrument_serializers)
+        instrumented = BaseSerializer.data
+        self.assertIsNot(instrumented, original)
+        timing.instrument_serializers()
+        self.assertIs(BaseSerializer.data, instrumented)
+        timing.uninstrument_serializers()
+        self.assertIs(BaseSerializer.data, original)
+
+
+class MetricsCollectionTests(SimpleTestCase):
+    """
+    Tests of the metrics collection of the finished processes.
+    """
+    def setUp(self):
+        self.directory = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.enterContext(override_settings(METRICS_DIR=self.directory))
+
+    def write_finished_process(self, values: dict) -> Path:
+        process = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                                 capture_output=True, text=True, check=True)
+        path = self.directory / f'{process.stdout.strip()}.db'
+        file = metrics.MetricsFile(path)
+        for key, value in values.items():
+            file.add(file.slot(key), value)
+        file.close()
+        return path
+
+    def test_finished_processes_are_merged(self):
+        first = self.write_finished_process({'a': 1, 'b': 2})
+        second = self.write_finished_process({'a': 3})
+        registry = metrics.MetricsRegistry()
+        self.assertEqual(registry.collect(), {'a': 4, 'b': 2})
+        self.assertFalse(first.exists())
+        self.assertFalse(second.exists())
+        self.write_finished_process({'b': 1})
+        self.assertEqual(registry.collect(), {'a': 4, 'b': 3})
+        self.assertEqual([path.name for path in self.directory.iterdir()], ['merged.db'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MetricsMiddlewareTests(TestCase):
+    """
+    Tests of the request metrics.
+    """
+    def test_unknown_method_is_recorded_as_other(self):
+        self.client.generic('BREW', '/api/tags/')
+        text = metrics.render_metrics()
+        self.assertIn('method="other"', text)
+        self.assertNotIn('BREW', text)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, ADMIN_EXACT_COUNT_LIMIT=3)
+class ScalableChangeListTests(TestCase):
+    """
+    Tests of the keyset paged admin changelists.
+    """
+    url = '/admin/orders/order/'
+
+    def setUp(self):
+        emails = ('Ivan@example.com', 'ivanov@example.com', 'anna@example.com', 'boris@example.com', 'vera@mail.ru')
+        self.order_ids = [Order.objects.create(email=email).pk for email in emails]
+        self.client.force_login(User.objects.create_superuser('admin'))
+        self.enterContext(mock.patch.object(admin.site._registry[Order], 'list_per_page', 2))
+
+    def get_changelist(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.context['cl']
+
+    def test_pages_follow_cursor(self):
+        changelist = self.get_changelist()
+        pages = [[order.pk for order in changelist.result_list]]
+        while changelist.next_cursor:
+            changelist = self.get_changelist(**{CURSOR_VAR: changelist.next_cursor})
+            pages.append([order.pk for order in changelist.result_list])
+        ids = self.order_ids[::-1]
+        self.assertEqual(pages, [ids[:2], ids[2:4], ids[4:]])
+
+    def test_count_above_limit_is_estimated(self):
+        changelist = self.get_changelist()
+        self.assertTrue(changelist.paginator.estimated)
+        self.assertEqual(changelist.result_count, max(self.order_ids))
+
+    def test_search_by_email_prefix(self):
+        changelist = self.get_changelist(q='IVAN')
+        self.assertEqual({order.pk for order in changelist.result_list}, set(self.order_ids[:2]))
+        self.assertFalse(changelist.paginator.estimated)
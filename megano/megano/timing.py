@@ -0,0 +1,247 @@
+"""
+Per-request timing breakdown.
+
+``ServerTimingMiddleware`` measures every request and splits its time into
+SQL queries, filtering, serialization, rendering and cache lookups. A sample
+of requests (and every slow one) is logged as a JSON line by the
+``megano.timing`` logger. The header reveals the server internals, so the
+breakdown is sent in the ``Server-Timing`` response header (visible in the
+browser developer tools) only to staff users, in DEBUG or when
+REQUEST_TIMING_HEADER is on.
+
+Phases are measured where they run: SQL by a database execute wrapper,
+rendering by ``TimedJSONRenderer`` and filters and cache lookups by ``timed``
+blocks. Serialization is measured by replacing the serializer ``data``
+property, so it is opt-in: the middleware instruments the serializers only
+when REQUEST_TIMING_SERIALIZERS is on, and ``uninstrument_serializers``
+restores the original property.
+Phases may overlap (queries run lazily by serializer fields count both as
+SQL and as serialization), so they do not have to sum up to the total.
+Outside of measured requests the timers do nothing.
+
+Usage:
+    MIDDLEWARE = ['megano.timing.ServerTimingMiddleware', ...]
+"""
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import BaseSerializer
+
+logger = logging.getLogger('megano.timing')
+
+# Phases in the Server-Timing header order.
+PHASES = ('sql', 'filter', 'serialize', 'render', 'cache')
+
+_current = ContextVar('request_timings', default=None)
+
+# Original data property of the serializers while they are instrumented.
+_original_data = None
+
+
+class RequestTimings:
+    """
+    Time and number of calls of the request phases.
+
+    Attributes:
+        durations: Time spent in the phases in seconds.
+        counts: Number of measured calls of the phases.
+
+    Methods:
+        add: Add measured call of the phase.
+        header: Build Server-Timing header value.
+        as_dict: Get breakdown in milliseconds for the log.
+    """
+    __slots__ = ('durations', 'counts')
+
+    def __init__(self):
+        self.durations = dict.fromkeys(PHASES, 0.0)
+        self.counts = dict.fromkeys(PHASES, 0)
+
+    def add(self, phase: str, seconds: float) -> None:
+        """
+        Add measured call of the phase.
+
+        Args:
+            phase: One of PHASES.
+            seconds: Call duration.
+        """
+        self.durations[phase] += seconds
+        self.counts[phase] += 1
+
+    def header(self, total: float) -> str:
+        """
+        Build Server-Timing header value.
+
+        Args:
+            total: Request duration in seconds.
+
+        Returns:
+            str: Header value with the called phases and the total.
+        """
+        metrics = [
+            f'{phase};dur={self.durations[phase] * 1000:.2f};desc="{self.counts[phase]}"'
+            for phase in PHASES if self.counts[phase]
+        ]
+        metrics.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(metrics)
+
+    def as_dict(self) -> dict:
+        """
+        Get breakdown in milliseconds for the log.
+
+        Returns:
+            dict: Durations and counts of the phases.
+        """
+        result = {}
+        for phase in PHASES:
+            result[f'{phase}_ms'] = round(self.durations[phase] * 1000, 2)
+            result[f'{phase}_count'] = self.counts[phase]
+        return result
+
+
+def get_request_timings() -> RequestTimings | None:
+    """
+    Get timings of the current request.
+
+    Returns:
+        RequestTimings | None: Timings or None outside of measured requests.
+    """
+    return _current.get()
+
+
+@contextmanager
+def timed(phase: str):
+    """
+    Measure the block as a call of the request phase.
+
+    Args:
+        phase: One of PHASES.
+    """
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(phase, time.perf_counter() - started)
+
+
+def sql_timer(execute, sql, params, many, context):
+    """
+    Database execute wrapper that measures queries of the current request.
+    """
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add('sql', time.perf_counter() - started)
+
+
+def instrument_serializers() -> None:
+    """
+    Measure the data property of the serializers as the serialize phase.
+
+    The outermost serializer is measured only, nested serializers do not
+    use the property. Instrumenting twice has no effect.
+    """
+    global _original_data
+    if _original_data is not None:
+        return
+    original = _original_data = BaseSerializer.data
+
+    def data(serializer):
+        with timed('serialize'):
+            return original.fget(serializer)
+
+    BaseSerializer.data = property(data)
+
+
+def uninstrument_serializers() -> None:
+    """
+    Restore the original data property of the serializers.
+    """
+    global _original_data
+    if _original_data is None:
+        return
+    BaseSerializer.data = _original_data
+    _original_data = None
+
+
+def is_timing_header_allowed(request: HttpRequest) -> bool:
+    """
+    Check if the Server-Timing header may be sent in response to the request.
+
+    Args:
+        request: Request.
+
+    Returns:
+        bool: True if the header is on, in DEBUG or for staff users.
+    """
+    if settings.REQUEST_TIMING_HEADER or settings.DEBUG:
+        return True
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_staff
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """
+    JSON renderer that measures rendering as the render phase.
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed('render'):
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class ServerTimingMiddleware:
+    """
+    Middleware that breaks down request time into phases.
+
+    Must be the first middleware, so the total covers the others.
+    The breakdown is added to the response as the Server-Timing header when
+    it's allowed (see is_timing_header_allowed). REQUEST_TIMING_LOG_SAMPLE_RATE
+    of the requests and every request slower than REQUEST_TIMING_SLOW_MS are
+    logged. Serialization is measured when REQUEST_TIMING_SERIALIZERS is on.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if settings.REQUEST_TIMING_SERIALIZERS:
+            instrument_serializers()
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(sql_timer))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - started
+
+        if is_timing_header_allowed(request):
+            response['Server-Timing'] = timings.header(total)
+        if (total * 1000 >= settings.REQUEST_TIMING_SLOW_MS
+                or random.random() < settings.REQUEST_TIMING_LOG_SAMPLE_RATE):
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'total_ms': round(total * 1000, 2),
+                **timings.as_dict(),
+            }))
+        return response
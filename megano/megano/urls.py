@@ -18,22 +18,10 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
-from drf_yasg.views import get_schema_view
-from rest_framework import permissions
-from drf_yasg import openapi
 
-schema_view = get_schema_view(
-   openapi.Info(
-      title="Snippets API",
-      default_version='v1',
-      description="Test description",
-      terms_of_service="https://www.google.com/policies/terms/",
-      contact=openapi.Contact(email="contact@snippets.local"),
-      license=openapi.License(name="BSD License"),
-   ),
-   public=True,
-   permission_classes=[permissions.IsAdminUser,],
-)
+from .docs import docs_view
+from .metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path("", include("frontend.urls")),
@@ -43,9 +31,13 @@ urlpatterns = [
         path('', include('orders.urls')),
         path('', include('products.urls')),
         path('', include('users.urls')),
+        path('', include('analytics.urls')),
     ])),
-    path('docs/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-redoc'),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
+if settings.API_DOCS != 'off':
+    urlpatterns.append(path('docs/', docs_view, name='schema-redoc'))
+
 if settings.DEBUG:
     urlpatterns.extend(static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT))
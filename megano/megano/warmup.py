@@ -0,0 +1,61 @@
+"""
+Worker warm-up before it accepts traffic.
+
+Django imports the URLconf with the view modules, compiles the URL patterns
+and fills the model meta caches on the first requests. ``warm_up`` does it at
+the worker startup instead. Only the per-process caches are warmed: the
+serializer fields are built again for every serializer instance, so building
+them here wouldn't save anything on the requests. It doesn't touch the
+database, so it's safe before the workers are forked.
+
+Usage:
+    application = get_wsgi_application()
+    warm_up()
+"""
+import logging
+import time
+
+from django.apps import apps
+from django.urls import URLResolver, get_resolver
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up_urls(resolver: URLResolver) -> None:
+    """
+    Compile patterns of the resolver and its included resolvers.
+
+    Args:
+        resolver: URL resolver.
+    """
+    resolver.reverse_dict
+    for pattern in resolver.url_patterns:
+        pattern.pattern.regex
+        if isinstance(pattern, URLResolver):
+            warm_up_urls(pattern)
+
+
+def warm_up_models() -> None:
+    """
+    Fill meta caches of all models.
+    """
+    for model in apps.get_models():
+        opts = model._meta
+        opts.fields_map
+        opts.related_objects
+        opts.get_fields()
+
+
+def warm_up() -> float:
+    """
+    Prepare the worker for the first requests.
+
+    Returns:
+        float: Warm-up duration in seconds.
+    """
+    started = time.perf_counter()
+    warm_up_urls(get_resolver())
+    warm_up_models()
+    duration = time.perf_counter() - started
+    logger.info('Worker warmed up in %.0f ms', duration * 1000)
+    return duration
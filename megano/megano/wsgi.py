@@ -2,6 +2,7 @@
 WSGI config for megano project.
 
 It exposes the WSGI callable as a module-level variable named ``application``.
+The worker is warmed up (see megano.warmup) before it serves requests.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/wsgi/
@@ -14,3 +15,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megano.settings')
 
 application = get_wsgi_application()
+
+from megano.warmup import warm_up  # noqa: E402
+
+warm_up()
@@ -0,0 +1,135 @@
+"""
+Monitoring app admin control panel module.
+"""
+import os
+
+from django.contrib import admin
+from django.db.models import F
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html_join
+from django.utils.text import Truncator
+
+from .models import ProfileCapture, ProfileTrigger, QueryStat
+from .sqlstats import collector
+
+
+@admin.register(QueryStat)
+class QueryStatAdmin(admin.ModelAdmin):
+    """
+    Read-only admin of the SQL statistics.
+
+    Attributes:
+        list_display: Array of fields that displays at the admin panel.
+        list_filter: Array of fields used to filter statistics.
+        search_fields: Array of fields used to search statistics.
+        fields: Fields of the statistics page.
+        actions: Array of admin actions.
+
+    Methods:
+        statement: Get shortened fingerprint for the list.
+        mean_ms: Get mean execution time.
+        reset_stats: Delete selected statistics.
+    """
+    list_display = 'statement', 'view', 'calls', 'total_ms', 'mean_ms', 'max_ms', 'rows', 'slow_calls'
+    list_filter = 'updated',
+    search_fields = 'fingerprint', 'view'
+    fields = 'fingerprint', 'view', 'calls', 'total_ms', 'max_ms', 'rows', 'slow_calls', 'plan', 'updated'
+    actions = 'reset_stats',
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    @admin.display(description='Запрос', ordering='fingerprint')
+    def statement(self, obj: QueryStat) -> str:
+        return Truncator(obj.fingerprint).chars(120)
+
+    @admin.display(description='Среднее, мс', ordering=F('total_ms') / F('calls'))
+    def mean_ms(self, obj: QueryStat) -> float:
+        return round(obj.total_ms / obj.calls, 3) if obj.calls else 0
+
+    @admin.action(description='Сбросить выбранную статистику', permissions=['delete'])
+    def reset_stats(self, request, queryset):
+        collector.reset()
+        deleted, _ = queryset.delete()
+        self.message_user(request, f'Сброшено запросов: {deleted}')
+
+
+@admin.register(ProfileTrigger)
+class ProfileTriggerAdmin(admin.ModelAdmin):
+    """
+    Admin form of the profile triggers.
+
+    Attributes:
+        list_display: Array of fields that displays at the admin panel.
+        fields: Fields of the trigger form.
+    """
+    list_display = 'view', 'header', 'mode', 'memory', 'remaining', 'created'
+    fields = 'view', 'header', 'mode', 'memory', 'remaining'
+
+
+@admin.register(ProfileCapture)
+class ProfileCaptureAdmin(admin.ModelAdmin):
+    """
+    Read-only admin of the request profiles with their downloads.
+
+    Attributes:
+        list_display: Array of fields that displays at the admin panel.
+        list_filter: Array of fields used to filter profiles.
+        search_fields: Array of fields used to search profiles.
+        fields: Fields of the profile page.
+        readonly_fields: Download links.
+
+    Methods:
+        downloads: Get links to the profile files.
+        get_urls: Add download url.
+        download_view: Send profile or memory snapshot file.
+    """
+    list_display = 'created', 'method', 'path', 'view', 'status', 'duration_ms', 'mode', 'downloads'
+    list_filter = 'mode', 'view'
+    search_fields = 'path', 'view'
+    fields = (
+        'trigger', 'created', 'method', 'path', 'view', 'status', 'duration_ms', 'mode',
+        'downloads', 'summary', 'memory_summary',
+    )
+    readonly_fields = 'downloads',
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description='Файлы')
+    def downloads(self, obj: ProfileCapture) -> str:
+        return format_html_join(', ', '<a href="{}">{}</a>', (
+            (reverse('admin:monitoring_profilecapture_download', args=[obj.pk, field]), label)
+            for field, label in (('profile', 'профиль'), ('memory', 'память'))
+            if getattr(obj, field)
+        ))
+
+    def get_urls(self):
+        return [
+            path(
+                '<int:pk>/download/<str:field>/',
+                self.admin_site.admin_view(self.download_view),
+                name='monitoring_profilecapture_download',
+            ),
+        ] + super().get_urls()
+
+    def download_view(self, request, pk: int, field: str):
+        if field not in ('profile', 'memory') or not self.has_view_permission(request):
+            raise Http404
+        file = getattr(get_object_or_404(ProfileCapture, pk=pk), field)
+        if not file:
+            raise Http404
+        return FileResponse(file.open('rb'), as_attachment=True, filename=os.path.basename(file.name))
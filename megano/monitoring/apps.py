@@ -0,0 +1,28 @@
+"""
+Monitoring app config module
+"""
+from django.apps import AppConfig
+
+
+class MonitoringConfig(AppConfig):
+    """
+    Config of the monitoring app.
+
+    Attributes:
+        default_auto_field: A field that automatically increases when an object is added.
+        name: Name of the app.
+        verbose_name: Representing name of the app.
+
+    Methods:
+        ready: Collect SQL statistics of every new database connection and connect app signal receivers.
+    """
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'monitoring'
+    verbose_name = 'Мониторинг'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from . import signals  # noqa: F401
+        from .sqlstats import install
+
+        connection_created.connect(install, dispatch_uid='monitoring_sqlstats')
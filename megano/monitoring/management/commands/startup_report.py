@@ -0,0 +1,128 @@
+"""
+Worker startup profile.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Script started in a fresh interpreter with -X importtime. It goes through the
+# worker startup step by step and prints the step durations as JSON.
+PROBE = '''
+import json, time
+started = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+application = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+urls = time.perf_counter()
+from megano.warmup import warm_up
+warm_up()
+ready = time.perf_counter()
+print(json.dumps({
+    'setup': setup - started,
+    'application': application - setup,
+    'urls': urls - application,
+    'warm_up': ready - urls,
+    'ready': ready - started,
+}))
+'''
+
+# Startup steps in the report order.
+STEPS = (
+    ('setup', 'settings and apps (django.setup)'),
+    ('application', 'WSGI handler and middleware'),
+    ('urls', 'URLconf and views'),
+    ('warm_up', 'warm-up'),
+    ('ready', 'ready to serve'),
+    ('process', 'process start to exit'),
+)
+
+
+def parse_importtime(output: str) -> list[tuple[str, int, int]]:
+    """
+    Parse -X importtime output.
+
+    Args:
+        output: Standard error of the interpreter.
+
+    Returns:
+        list: Module name, self and cumulative import time in microseconds.
+    """
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, cumulative, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(self_time), int(cumulative)))
+    return modules
+
+
+class Command(BaseCommand):
+    """
+    Measure the worker startup in fresh interpreters.
+
+    Every run starts the interpreter with -X importtime and goes through the
+    startup steps of a worker: django.setup, the WSGI handler, the URLconf
+    and the warm-up. The report shows the median duration of the steps, the
+    packages that take the most time to import and the slowest modules of
+    the project. Run it with --settings to compare settings modules.
+    """
+    help = 'Report worker startup time by step and by imported package.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Number of measured interpreter starts.')
+        parser.add_argument('--top', type=int, default=15, help='Number of reported packages and modules.')
+
+    def handle(self, *args, **options):
+        if options['runs'] < 1:
+            raise CommandError('--runs must be positive')
+        base_dir = Path(settings.BASE_DIR)
+        project_packages = {path.name for path in base_dir.iterdir() if (path / '__init__.py').exists()}
+        environment = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE}
+
+        steps = {name: [] for name, _ in STEPS}
+        package_times = Counter()
+        project_times = Counter()
+        for _ in range(options['runs']):
+            started = time.perf_counter()
+            result = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', PROBE],
+                cwd=base_dir,
+                env=environment,
+                capture_output=True,
+                text=True,
+            )
+            elapsed = time.perf_counter() - started
+            if result.returncode:
+                raise CommandError(f'Startup failed:\n{result.stderr[-2000:]}')
+            for name, seconds in json.loads(result.stdout.splitlines()[-1]).items():
+                steps[name].append(seconds)
+            steps['process'].append(elapsed)
+            for name, self_time, cumulative in parse_importtime(result.stderr):
+                package = name.split('.')[0]
+                package_times[package] += self_time
+                if package in project_packages:
+                    project_times[name] += cumulative
+
+        runs = options['runs']
+        self.stdout.write(f'Startup steps, median of {runs} runs (settings {settings.SETTINGS_MODULE}):')
+        for name, description in STEPS:
+            self.stdout.write(f'  {description:<36} {statistics.median(steps[name]) * 1000:8.1f} ms')
+        self.stdout.write('Packages by import time (self time of their modules, mean):')
+        for package, self_time in package_times.most_common(options['top']):
+            self.stdout.write(f'  {package:<36} {self_time / runs / 1000:8.1f} ms')
+        self.stdout.write('Project modules by import time (with their imports, mean):')
+        for module, cumulative in project_times.most_common(options['top']):
+            self.stdout.write(f'  {module:<36} {cumulative / runs / 1000:8.1f} ms')
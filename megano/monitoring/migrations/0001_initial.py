@@ -0,0 +1,36 @@
+# Generated by Django 5.1.4 on 2026-10-18 22:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueryStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.TextField(verbose_name='Запрос')),
+                ('fingerprint_hash', models.CharField(max_length=32, verbose_name='Хеш запроса')),
+                ('view', models.CharField(blank=True, max_length=200, verbose_name='Представление')),
+                ('calls', models.PositiveBigIntegerField(default=0, verbose_name='Вызовы')),
+                ('total_ms', models.FloatField(default=0, verbose_name='Всего, мс')),
+                ('max_ms', models.FloatField(default=0, verbose_name='Максимум, мс')),
+                ('rows', models.PositiveBigIntegerField(default=0, verbose_name='Строки')),
+                ('slow_calls', models.PositiveBigIntegerField(default=0, verbose_name='Медленные вызовы')),
+                ('plan', models.TextField(blank=True, verbose_name='План запроса')),
+                ('updated', models.DateTimeField(verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Статистика запроса',
+                'verbose_name_plural': 'Статистика SQL-запросов',
+                'ordering': ('-total_ms',),
+                'constraints': [models.UniqueConstraint(fields=('fingerprint_hash', 'view'), name='unique_query_stat')],
+            },
+        ),
+    ]
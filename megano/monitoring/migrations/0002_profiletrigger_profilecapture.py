@@ -0,0 +1,54 @@
+# Generated by Django 5.1.4 on 2026-10-18 22:54
+
+import django.db.models.deletion
+import monitoring.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileTrigger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('view', models.CharField(blank=True, max_length=200, verbose_name='Представление')),
+                ('header', models.CharField(blank=True, max_length=200, verbose_name='Заголовок')),
+                ('mode', models.CharField(choices=[('sampling', 'Сэмплирование стеков'), ('cprofile', 'cProfile')], default='sampling', max_length=10, verbose_name='Профилировщик')),
+                ('memory', models.BooleanField(default=False, verbose_name='Снимки памяти')),
+                ('remaining', models.PositiveIntegerField(default=10, verbose_name='Осталось запросов')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+            ],
+            options={
+                'verbose_name': 'Профилирование',
+                'verbose_name_plural': 'Профилирование запросов',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProfileCapture',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(max_length=10, verbose_name='Метод')),
+                ('path', models.CharField(max_length=500, verbose_name='Путь')),
+                ('view', models.CharField(max_length=200, verbose_name='Представление')),
+                ('status', models.PositiveSmallIntegerField(verbose_name='Код ответа')),
+                ('duration_ms', models.FloatField(verbose_name='Длительность, мс')),
+                ('mode', models.CharField(choices=[('sampling', 'Сэмплирование стеков'), ('cprofile', 'cProfile')], max_length=10, verbose_name='Профилировщик')),
+                ('profile', models.FileField(storage=monitoring.models.profile_storage, upload_to='profiles/', verbose_name='Профиль')),
+                ('summary', models.TextField(blank=True, verbose_name='Сводка')),
+                ('memory', models.FileField(blank=True, storage=monitoring.models.profile_storage, upload_to='memory/', verbose_name='Снимок памяти')),
+                ('memory_summary', models.TextField(blank=True, verbose_name='Сводка по памяти')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('trigger', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='captures', to='monitoring.profiletrigger', verbose_name='Профилирование')),
+            ],
+            options={
+                'verbose_name': 'Профиль запроса',
+                'verbose_name_plural': 'Профили запросов',
+                'ordering': ('-created',),
+            },
+        ),
+    ]
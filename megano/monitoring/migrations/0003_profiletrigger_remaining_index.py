@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 23:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0002_profiletrigger_profilecapture'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profiletrigger',
+            name='remaining',
+            field=models.PositiveIntegerField(db_index=True, default=10, verbose_name='Осталось запросов'),
+        ),
+    ]
@@ -0,0 +1,180 @@
+"""
+Monitoring app models.
+"""
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.storage import FileSystemStorage
+from django.db import models
+
+
+def profile_storage() -> FileSystemStorage:
+    """
+    Get storage of the profiles, they are not published with the media files.
+
+    Returns:
+        FileSystemStorage: Storage in PROFILER_DIR.
+    """
+    return FileSystemStorage(location=settings.PROFILER_DIR)
+
+
+class QueryStat(models.Model):
+    """
+    Represents execution statistics of one SQL fingerprint issued by one view.
+
+    Rows are written by monitoring.sqlstats, which adds up the calls of
+    all processes.
+
+    Meta:
+        verbose_name: representing name of the model.
+        verbose_name_plural: plural form of the verbose_name.
+        ordering: The most time consuming statements first.
+        constraints: One row per fingerprint and view.
+
+    Attributes:
+        fingerprint: Statement with the literals and parameters replaced by placeholders.
+        fingerprint_hash: MD5 of the fingerprint.
+        view: Name of the view that issued the statement (empty outside of requests).
+        calls: Number of executions.
+        total_ms: Total execution time in milliseconds.
+        max_ms: Longest execution time in milliseconds.
+        rows: Number of returned or changed rows.
+        slow_calls: Number of executions longer than SQL_STATS_SLOW_MS.
+        plan: Query plan of the last slow execution.
+        updated: When the statistics were written.
+    """
+    class Meta:
+        verbose_name = 'Статистика запроса'
+        verbose_name_plural = 'Статистика SQL-запросов'
+        ordering = '-total_ms',
+        constraints = [
+            models.UniqueConstraint(fields=['fingerprint_hash', 'view'], name='unique_query_stat'),
+        ]
+
+    fingerprint = models.TextField(verbose_name='Запрос')
+    fingerprint_hash = models.CharField(max_length=32, verbose_name='Хеш запроса')
+    view = models.CharField(max_length=200, blank=True, verbose_name='Представление')
+    calls = models.PositiveBigIntegerField(default=0, verbose_name='Вызовы')
+    total_ms = models.FloatField(default=0, verbose_name='Всего, мс')
+    max_ms = models.FloatField(default=0, verbose_name='Максимум, мс')
+    rows = models.PositiveBigIntegerField(default=0, verbose_name='Строки')
+    slow_calls = models.PositiveBigIntegerField(default=0, verbose_name='Медленные вызовы')
+    plan = models.TextField(blank=True, verbose_name='План запроса')
+    updated = models.DateTimeField(verbose_name='Обновлено')
+
+
+class ProfileTrigger(models.Model):
+    """
+    Represents request to profile the next requests that match a view or a header.
+
+    Meta:
+        verbose_name: representing name of the model.
+        verbose_name_plural: plural form of the verbose_name.
+
+    Attributes:
+        Mode: Profilers.
+        view: Name of the view to profile (any view if empty).
+        header: Header the requests must send, e.g. ``X-Profile: 1`` (not checked if empty).
+        mode: Profiler.
+        memory: Whether tracemalloc snapshots are taken.
+        remaining: Number of requests left to profile.
+        created: When the trigger was created.
+
+    Methods:
+        clean: Check that the trigger matches a view or a header.
+        match: Check whether the request should be profiled.
+    """
+    class Mode(models.TextChoices):
+        SAMPLING = 'sampling', 'Сэмплирование стеков'
+        CPROFILE = 'cprofile', 'cProfile'
+
+    class Meta:
+        verbose_name = 'Профилирование'
+        verbose_name_plural = 'Профилирование запросов'
+
+    view = models.CharField(max_length=200, blank=True, verbose_name='Представление')
+    header = models.CharField(max_length=200, blank=True, verbose_name='Заголовок')
+    mode = models.CharField(
+        max_length=10,
+        choices=Mode.choices,
+        default=Mode.SAMPLING,
+        verbose_name='Профилировщик',
+    )
+    memory = models.BooleanField(default=False, verbose_name='Снимки памяти')
+    remaining = models.PositiveIntegerField(default=10, db_index=True, verbose_name='Осталось запросов')
+    created = models.DateTimeField(auto_now_add=True, verbose_name='Создано')
+
+    def __str__(self) -> str:
+        return self.view or self.header
+
+    def clean(self) -> None:
+        if not self.view and not self.header:
+            raise ValidationError('Укажите представление или заголовок')
+        if self.header and ':' not in self.header:
+            raise ValidationError({'header': 'Заголовок указывается как "Имя: значение"'})
+
+    def match(self, request) -> bool:
+        """
+        Check whether the request should be profiled.
+
+        Args:
+            request: Request with the resolved URL.
+
+        Returns:
+            bool: True if the request matches the view and the header.
+        """
+        if self.view and self.view != request.resolver_match.view_name:
+            return False
+        if self.header:
+            name, value = self.header.split(':', 1)
+            if request.headers.get(name.strip()) != value.strip():
+                return False
+        return True
+
+
+class ProfileCapture(models.Model):
+    """
+    Represents profile of one request.
+
+    Meta:
+        verbose_name: representing name of the model.
+        verbose_name_plural: plural form of the verbose_name.
+        ordering: The latest captures first.
+
+    Attributes:
+        trigger: Trigger that requested the profile.
+        method: Request method.
+        path: Request path.
+        view: Name of the view.
+        status: Response status code.
+        duration_ms: Request duration in milliseconds.
+        mode: Profiler.
+        profile: Folded stacks (sampling) or pstats dump (cProfile).
+        summary: The hottest stacks or functions.
+        memory: Pickled tracemalloc snapshot taken after the request.
+        memory_summary: Peak traced memory and the top allocations made by the request.
+        created: When the request was profiled.
+    """
+    class Meta:
+        verbose_name = 'Профиль запроса'
+        verbose_name_plural = 'Профили запросов'
+        ordering = '-created',
+
+    trigger = models.ForeignKey(
+        ProfileTrigger,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='captures',
+        verbose_name='Профилирование',
+    )
+    method = models.CharField(max_length=10, verbose_name='Метод')
+    path = models.CharField(max_length=500, verbose_name='Путь')
+    view = models.CharField(max_length=200, verbose_name='Представление')
+    status = models.PositiveSmallIntegerField(verbose_name='Код ответа')
+    duration_ms = models.FloatField(verbose_name='Длительность, мс')
+    mode = models.CharField(max_length=10, choices=ProfileTrigger.Mode.choices, verbose_name='Профилировщик')
+    profile = models.FileField(storage=profile_storage, upload_to='profiles/', verbose_name='Профиль')
+    summary = models.TextField(blank=True, verbose_name='Сводка')
+    memory = models.FileField(storage=profile_storage, upload_to='memory/', blank=True, verbose_name='Снимок памяти')
+    memory_summary = models.TextField(blank=True, verbose_name='Сводка по памяти')
+    created = models.DateTimeField(auto_now_add=True, verbose_name='Создано')
@@ -0,0 +1,315 @@
+"""
+On-demand profiling of live requests.
+
+Staff create a ProfileTrigger in the admin to profile the next N requests
+of a view and/or with a header. ``ProfilerMiddleware`` profiles a matching
+request from the view call to the rendered response with one of:
+
+* the stack sampler, which records the stack of the request thread every
+  PROFILER_SAMPLE_INTERVAL seconds from a separate thread and stores the
+  folded stacks (``frame;frame;frame count`` lines) that flamegraph.pl,
+  speedscope and inferno read;
+* cProfile, which stores a pstats dump for snakeviz or flameprof.
+
+With the memory option tracemalloc is started for the request, the snapshot
+taken after it is stored pickled (``tracemalloc.Snapshot.load``) along with
+the top allocations made by the request. tracemalloc traces the whole
+process, so allocations of concurrent requests are included.
+
+Triggers are kept in every process and reloaded when the shared version in
+the cache changes, checked every PROFILER_CHECK_INTERVAL seconds, so
+requests that are not profiled don't query the database.
+
+cProfile and pstats are imported when a request is profiled with them,
+so they don't slow down the worker startup.
+
+Usage:
+    MIDDLEWARE = [..., 'monitoring.profiler.ProfilerMiddleware']
+"""
+import io
+import pickle
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db.models import F
+from django.http import HttpRequest, HttpResponse
+
+from megano.cache import bump_version
+
+# Lines of the profile and memory summaries.
+SUMMARY_LINES = 25
+
+# Allocations of the profiler and tracemalloc are left out of the snapshots.
+_OWN_TRACES = (
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, tracemalloc.__file__),
+)
+
+
+class TriggerRegistry:
+    """
+    In-process list of the active profile triggers.
+
+    Attributes:
+        version_key: Cache key of the triggers version shared by all workers.
+
+    Methods:
+        get: Get active triggers.
+        invalidate: Bump shared triggers version.
+    """
+    version_key = 'profile_triggers_version'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._triggers = None
+        self._version = None
+        self._checked_at = 0.0
+
+    def get(self) -> list:
+        """
+        Get active triggers.
+
+        Returns:
+            list[ProfileTrigger]: Triggers with requests left to profile.
+        """
+        now = time.monotonic()
+        if self._triggers is not None and now - self._checked_at < settings.PROFILER_CHECK_INTERVAL:
+            return self._triggers
+        with self._lock:
+            version = cache.get(self.version_key)
+            if self._triggers is None or version != self._version:
+                from .models import ProfileTrigger
+
+                self._triggers = list(ProfileTrigger.objects.filter(remaining__gt=0))
+                self._version = version
+            self._checked_at = now
+            return self._triggers
+
+    def invalidate(self) -> None:
+        """
+        Bump shared triggers version so every worker reloads triggers.
+        """
+        bump_version(cache, self.version_key)
+        self._checked_at = 0.0
+
+
+triggers = TriggerRegistry()
+
+
+def claim(trigger) -> bool:
+    """
+    Take one of the requests left to profile by the trigger.
+
+    Args:
+        trigger: Matched trigger.
+
+    Returns:
+        bool: False if another request took the last one.
+    """
+    from .models import ProfileTrigger
+
+    claimed = ProfileTrigger.objects.filter(pk=trigger.pk, remaining__gt=0).update(remaining=F('remaining') - 1)
+    if not claimed or trigger.remaining <= 1:
+        triggers.invalidate()
+    return bool(claimed)
+
+
+class StackSampler:
+    """
+    Sampling profiler of one thread.
+
+    Attributes:
+        stacks: Number of samples per folded stack.
+
+    Methods:
+        start: Start sampling.
+        stop: Stop sampling.
+        folded: Get stacks in the folded format.
+    """
+    def __init__(self, thread_id: int, interval: float):
+        self.stacks = Counter()
+        self._thread_id = thread_id
+        self._interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self) -> None:
+        """
+        Start sampling.
+        """
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop sampling.
+        """
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self._interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(f'{frame.f_globals.get("__name__", "?")}:{frame.f_code.co_qualname}')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        """
+        Get stacks in the folded format.
+
+        Returns:
+            str: ``frame;frame;frame count`` line per stack, the root frame first.
+        """
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class MemoryTracer:
+    """
+    Process-wide tracemalloc that stays on while any request is traced.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = 0
+        self._started = False
+
+    def start(self) -> tracemalloc.Snapshot:
+        """
+        Start tracing for a request.
+
+        Returns:
+            Snapshot: Allocations before the request.
+        """
+        with self._lock:
+            if not self._users and not tracemalloc.is_tracing():
+                tracemalloc.start(settings.PROFILER_TRACEMALLOC_FRAMES)
+                self._started = True
+            self._users += 1
+            tracemalloc.reset_peak()
+        return tracemalloc.take_snapshot().filter_traces(_OWN_TRACES)
+
+    def stop(self) -> tuple[tracemalloc.Snapshot, int]:
+        """
+        Stop tracing for a request.
+
+        Returns:
+            tuple: Allocations after the request and the peak traced memory in bytes.
+        """
+        snapshot = tracemalloc.take_snapshot().filter_traces(_OWN_TRACES)
+        peak = tracemalloc.get_traced_memory()[1]
+        with self._lock:
+            self._users -= 1
+            if not self._users and self._started:
+                tracemalloc.stop()
+                self._started = False
+        return snapshot, peak
+
+
+memory_tracer = MemoryTracer()
+
+
+class RequestProfile:
+    """
+    Profile of one request.
+
+    Methods:
+        stop: Stop profiling and store the capture.
+    """
+    def __init__(self, trigger):
+        self.trigger = trigger
+        self._sampler = None
+        self._profiler = None
+        self._memory_before = None
+        if trigger.memory:
+            self._memory_before = memory_tracer.start()
+        if trigger.mode == trigger.Mode.CPROFILE:
+            import cProfile
+
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._sampler = StackSampler(threading.get_ident(), settings.PROFILER_SAMPLE_INTERVAL)
+            self._sampler.start()
+        self._started = time.perf_counter()
+
+    def stop(self, request: HttpRequest, response: HttpResponse) -> None:
+        """
+        Stop profiling and store the capture.
+
+        Args:
+            request: Profiled request.
+            response: Its response.
+        """
+        from .models import ProfileCapture
+
+        duration = time.perf_counter() - self._started
+        if self._profiler is not None:
+            self._profiler.disable()
+        else:
+            self._sampler.stop()
+        if self._memory_before is not None:
+            memory, peak = memory_tracer.stop()
+
+        if self._profiler is not None:
+            import marshal
+            import pstats
+
+            output = io.StringIO()
+            stats = pstats.Stats(self._profiler, stream=output)
+            profile = ContentFile(marshal.dumps(stats.stats), name=f'{uuid4().hex}.prof')
+            stats.sort_stats('cumulative').print_stats(SUMMARY_LINES)
+            summary = output.getvalue()
+        else:
+            folded = self._sampler.folded()
+            profile = ContentFile(folded.encode(), name=f'{uuid4().hex}.folded')
+            summary = ''.join(folded.splitlines(keepends=True)[:SUMMARY_LINES])
+
+        capture = ProfileCapture(
+            trigger=self.trigger,
+            method=request.method,
+            path=request.path[:500],
+            view=request.resolver_match.view_name,
+            status=response.status_code,
+            duration_ms=duration * 1000,
+            mode=self.trigger.mode,
+            profile=profile,
+            summary=summary,
+        )
+        if self._memory_before is not None:
+            top = memory.compare_to(self._memory_before, 'lineno')[:SUMMARY_LINES]
+            capture.memory = ContentFile(pickle.dumps(memory, pickle.HIGHEST_PROTOCOL), name=f'{uuid4().hex}.pickle')
+            capture.memory_summary = f'Peak: {peak / 1024:.1f} KiB\n' + ''.join(f'{stat}\n' for stat in top)
+        capture.save()
+
+
+class ProfilerMiddleware:
+    """
+    Middleware that profiles the requests matching the profile triggers.
+
+    Should be the last middleware, profiling starts when the view is called
+    and stops when the response is rendered.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        response = self.get_response(request)
+        profile = getattr(request, '_profile', None)
+        if profile is not None:
+            profile.stop(request, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        for trigger in triggers.get():
+            if trigger.match(request) and claim(trigger):
+                request._profile = RequestProfile(trigger)
+                return
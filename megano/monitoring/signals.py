@@ -0,0 +1,17 @@
+"""
+Signal receivers for monitoring app models.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import ProfileTrigger
+from .profiler import triggers
+
+
+@receiver([post_save, post_delete], sender=ProfileTrigger)
+def invalidate_profile_triggers(sender, **kwargs) -> None:
+    """
+    Make every worker reload profile triggers after one of them was changed.
+    """
+    transaction.on_commit(triggers.invalidate)
@@ -0,0 +1,390 @@
+"""
+Always-on SQL statistics in the spirit of pg_stat_statements.
+
+Every database connection gets an execute wrapper that normalizes the
+statement into a fingerprint (literals, parameters and IN lists replaced by
+placeholders) and adds its duration and rows to the in-memory statistics of
+the fingerprint and the view that issued it. Statements slower than
+SQL_STATS_SLOW_MS get their query plan captured with the backend EXPLAIN
+(``EXPLAIN QUERY PLAN`` on SQLite).
+
+A background thread adds the collected statistics to the QueryStat rows
+every SQL_STATS_FLUSH_INTERVAL seconds with one upsert, so the rows hold the
+totals of all processes. They are listed and reset in the admin.
+
+Usage:
+    MIDDLEWARE = [..., 'monitoring.sqlstats.SQLStatsMiddleware', ...]
+"""
+import atexit
+import hashlib
+import logging
+import re
+import threading
+import time
+from contextvars import ContextVar
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connections
+from django.http import HttpRequest, HttpResponse
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# View placeholders of the statements issued before the URL is resolved
+# and of the statements issued outside of requests.
+UNRESOLVED_VIEW = '<request>'
+NO_VIEW = ''
+
+# Fingerprint of the statements over SQL_STATS_MAX_FINGERPRINTS.
+OVERFLOW_FINGERPRINT = '<other>'
+
+# Statements that can be explained.
+EXPLAINED_STATEMENTS = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w".])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b')
+_PARAMETER = re.compile(r'%s|\?|%\(\w+\)s')
+_IN_LIST = re.compile(r'\bIN \((?:\?, )*\?\)', re.IGNORECASE)
+_VALUES_LIST = re.compile(r'\bVALUES \((?:\?, )*\?\)(?:, \((?:\?, )*\?\))*', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+_view = ContextVar('sql_stats_view', default=NO_VIEW)
+_recording = ContextVar('sql_stats_recording', default=True)
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(sql: str) -> str:
+    """
+    Normalize statement, so all executions of one query share it.
+
+    Args:
+        sql: Statement as it's passed to the cursor.
+
+    Returns:
+        str: Statement with the literals and parameters replaced by ``?``
+            and the IN and VALUES lists collapsed.
+    """
+    sql = _WHITESPACE.sub(' ', sql.strip())
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PARAMETER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _VALUES_LIST.sub('VALUES (...)', sql)
+
+
+class StatementStats:
+    """
+    Statistics of one fingerprint and view collected since the last flush.
+
+    Attributes:
+        calls: Number of executions.
+        total_ms: Total execution time in milliseconds.
+        max_ms: Longest execution time in milliseconds.
+        rows: Number of returned or changed rows.
+        slow_calls: Number of executions longer than SQL_STATS_SLOW_MS.
+        plan: Query plan of the last slow execution.
+    """
+    __slots__ = ('calls', 'total_ms', 'max_ms', 'rows', 'slow_calls', 'plan')
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.slow_calls = 0
+        self.plan = ''
+
+
+class RowCounter:
+    """
+    Database cursor proxy that adds the fetched rows to the statement statistics.
+
+    Attributes:
+        cursor: Database cursor.
+        key: Fingerprint and view of the executed statement.
+    """
+    __slots__ = ('cursor', 'key')
+
+    def __init__(self, cursor, key: tuple[str, str]):
+        self.cursor = cursor
+        self.key = key
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+    def __iter__(self):
+        for row in self.cursor:
+            collector.add_rows(self.key, 1)
+            yield row
+
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        if row is not None:
+            collector.add_rows(self.key, 1)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self.cursor.fetchmany(*args, **kwargs)
+        collector.add_rows(self.key, len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self.cursor.fetchall()
+        collector.add_rows(self.key, len(rows))
+        return rows
+
+
+class SQLStatsCollector:
+    """
+    Process statistics of the executed statements.
+
+    Statistics are kept per fingerprint and view until the next flush.
+    At most SQL_STATS_MAX_FINGERPRINTS of them are kept, statements of the
+    other fingerprints are counted as OVERFLOW_FINGERPRINT.
+
+    Methods:
+        record: Add statement execution.
+        add_rows: Add fetched rows of the statement.
+        flush: Add collected statistics to the database.
+        reset: Drop collected statistics.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: dict[tuple[str, str], StatementStats] = {}
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._table_exists = False
+
+    def _get(self, key: tuple[str, str]) -> StatementStats:
+        stats = self._pending.get(key)
+        if stats is None:
+            if len(self._pending) >= settings.SQL_STATS_MAX_FINGERPRINTS:
+                key = (OVERFLOW_FINGERPRINT, key[1])
+                stats = self._pending.get(key)
+            if stats is None:
+                stats = self._pending[key] = StatementStats()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='sql-stats-writer', daemon=True)
+                self._thread.start()
+        return stats
+
+    def record(self, key: tuple[str, str], duration_ms: float, rows: int, plan: str = '') -> None:
+        """
+        Add statement execution.
+
+        Args:
+            key: Fingerprint and view of the statement.
+            duration_ms: Execution time in milliseconds.
+            rows: Number of changed rows.
+            plan: Query plan of the slow execution.
+        """
+        with self._lock:
+            stats = self._get(key)
+            stats.calls += 1
+            stats.total_ms += duration_ms
+            if duration_ms > stats.max_ms:
+                stats.max_ms = duration_ms
+            stats.rows += rows
+            if duration_ms >= settings.SQL_STATS_SLOW_MS:
+                stats.slow_calls += 1
+            if plan:
+                stats.plan = plan
+
+    def add_rows(self, key: tuple[str, str], rows: int) -> None:
+        """
+        Add fetched rows of the statement.
+
+        Args:
+            key: Fingerprint and view of the statement.
+            rows: Number of fetched rows.
+        """
+        if rows:
+            with self._lock:
+                self._get(key).rows += rows
+
+    def has_plan(self, key: tuple[str, str]) -> bool:
+        """
+        Check whether the plan of the statement is captured since the last flush.
+
+        Args:
+            key: Fingerprint and view of the statement.
+
+        Returns:
+            bool: True if the plan is captured.
+        """
+        stats = self._pending.get(key)
+        return stats is not None and bool(stats.plan)
+
+    def reset(self) -> None:
+        """
+        Drop collected statistics.
+        """
+        with self._lock:
+            self._pending = {}
+
+    def flush(self) -> int:
+        """
+        Add collected statistics to the database.
+
+        Statistics are dropped while the QueryStat table doesn't exist, e.g.
+        in the management commands run before the migrations.
+
+        Returns:
+            int: Number of written fingerprints.
+        """
+        from .models import QueryStat
+
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        connection = connections['default']
+        quote = connection.ops.quote_name
+        table = quote(QueryStat._meta.db_table)
+        columns = (
+            'fingerprint', 'fingerprint_hash', 'view', 'calls', 'total_ms',
+            'max_ms', 'rows', 'slow_calls', 'plan', 'updated',
+        )
+        added = ', '.join(
+            f'{quote(column)} = {table}.{quote(column)} + excluded.{quote(column)}'
+            for column in ('calls', 'total_ms', 'rows', 'slow_calls')
+        )
+        # CASE instead of MAX()/GREATEST() works on both SQLite and PostgreSQL.
+        sql = (
+            f'INSERT INTO {table} ({", ".join(quote(column) for column in columns)}) '
+            f'VALUES ({", ".join(["%s"] * len(columns))}) '
+            f'ON CONFLICT ({quote("fingerprint_hash")}, {quote("view")}) DO UPDATE SET {added}, '
+            f'{quote("max_ms")} = CASE WHEN excluded.{quote("max_ms")} > {table}.{quote("max_ms")} '
+            f'THEN excluded.{quote("max_ms")} ELSE {table}.{quote("max_ms")} END, '
+            f'{quote("plan")} = CASE WHEN excluded.{quote("plan")} = \'\' '
+            f'THEN {table}.{quote("plan")} ELSE excluded.{quote("plan")} END, '
+            f'{quote("updated")} = excluded.{quote("updated")}'
+        )
+        updated = connection.ops.adapt_datetimefield_value(timezone.now())
+        rows = [
+            (
+                text, hashlib.md5(text.encode()).hexdigest(), view, stats.calls, stats.total_ms,
+                stats.max_ms, stats.rows, stats.slow_calls, stats.plan, updated,
+            )
+            for (text, view), stats in pending.items()
+        ]
+        token = _recording.set(False)
+        try:
+            if not self._table_exists:
+                self._table_exists = QueryStat._meta.db_table in connection.introspection.table_names()
+                if not self._table_exists:
+                    return 0
+            with connection.cursor() as cursor:
+                cursor.executemany(sql, rows)
+        finally:
+            _recording.reset(token)
+        return len(rows)
+
+    def flush_at_exit(self) -> None:
+        """
+        Flush statistics when the process exits, the database may be unavailable by then.
+        """
+        try:
+            self.flush()
+        except DatabaseError as error:
+            logger.warning('Failed to write SQL statistics: %s', error)
+
+    def _run(self) -> None:
+        while not self._wakeup.wait(settings.SQL_STATS_FLUSH_INTERVAL):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Failed to write SQL statistics')
+            finally:
+                close_old_connections()
+
+
+collector = SQLStatsCollector()
+atexit.register(collector.flush_at_exit)
+
+
+def explain(connection, sql: str, params) -> str:
+    """
+    Get query plan of the statement.
+
+    The plan is read with a separate backend cursor, so it's not recorded
+    as a query and the results of the explained statement are kept.
+
+    Args:
+        connection: Database connection wrapper.
+        sql: Statement.
+        params: Statement parameters.
+
+    Returns:
+        str: Plan lines or an empty string if the statement can't be explained.
+    """
+    if not sql.lstrip()[:6].upper().startswith(EXPLAINED_STATEMENTS):
+        return ''
+    cursor = connection.create_cursor()
+    try:
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+        return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+    except DatabaseError:
+        return ''
+    finally:
+        cursor.close()
+
+
+def sql_stats(execute, sql, params, many, context):
+    """
+    Database execute wrapper that collects statistics of the statements.
+    """
+    if not _recording.get():
+        return execute(sql, params, many, context)
+    wrapper = context['cursor']
+    if isinstance(wrapper.cursor, RowCounter):
+        wrapper.cursor = wrapper.cursor.cursor
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration_ms = (time.perf_counter() - started) * 1000
+
+    key = (fingerprint(sql), _view.get())
+    rows = 0
+    if wrapper.cursor.description is not None and not many:
+        wrapper.cursor = RowCounter(wrapper.cursor, key)
+    elif wrapper.cursor.rowcount > 0:
+        rows = wrapper.cursor.rowcount
+    plan = ''
+    if duration_ms >= settings.SQL_STATS_SLOW_MS and not many and not collector.has_plan(key):
+        plan = explain(context['connection'], sql, params)
+    collector.record(key, duration_ms, rows, plan)
+    return result
+
+
+def install(sender, connection, **kwargs) -> None:
+    """
+    Collect statistics of the connection statements.
+
+    Connected to the connection_created signal. The wrapper goes first, so
+    the wrappers of the requests are still removed in their order.
+    """
+    if sql_stats not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, sql_stats)
+
+
+class SQLStatsMiddleware:
+    """
+    Middleware that attributes the statements to the view of the request.
+
+    Statements issued before the URL is resolved are attributed to
+    UNRESOLVED_VIEW.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        token = _view.set(UNRESOLVED_VIEW)
+        try:
+            return self.get_response(request)
+        finally:
+            _view.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _view.set(request.resolver_match.view_name)
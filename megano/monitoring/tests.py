@@ -0,0 +1,136 @@
+"""
+Monitoring app tests.
+"""
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .models import ProfileCapture, ProfileTrigger, QueryStat
+from .profiler import TriggerRegistry, claim
+from .sqlstats import OVERFLOW_FINGERPRINT, collector, fingerprint
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class FingerprintTests(SimpleTestCase):
+    """
+    Tests of the statement normalization.
+    """
+    def test_literals_and_parameters_are_replaced(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t\n  WHERE a = 'it''s' AND b = -1.5 AND c = %s AND \"t2\".\"x1\" = 3"),
+            'SELECT * FROM t WHERE a = ? AND b = ? AND c = ? AND "t2"."x1" = ?',
+        )
+
+    def test_lists_are_collapsed(self):
+        self.assertEqual(fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s)'), 'SELECT * FROM t WHERE id IN (...)')
+        self.assertEqual(fingerprint('INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)'),
+                         'INSERT INTO t (a, b) VALUES (...)')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SQLStatsCollectorTests(TestCase):
+    """
+    Tests of the collected SQL statistics.
+    """
+    def setUp(self):
+        collector.reset()
+        self.addCleanup(collector.reset)
+        # The test database is gone when the statistics are flushed at exit.
+        self.enterContext(mock.patch.object(collector, '_table_exists', False))
+
+    def run_query(self, sql: str = 'SELECT 1', params=()) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            cursor.fetchall()
+
+    def test_flushes_add_up(self):
+        for _ in range(2):
+            self.run_query('SELECT %s', [1])
+            self.run_query('SELECT %s', [2])
+            collector.flush()
+        stat = QueryStat.objects.get(fingerprint='SELECT ?', view='')
+        self.assertEqual((stat.calls, stat.rows), (4, 4))
+
+    def test_statements_are_attributed_to_view(self):
+        cache.clear()
+        self.client.get('/api/tags/')
+        collector.flush()
+        self.assertTrue(QueryStat.objects.filter(view='tags_list', fingerprint__contains='products_tag').exists())
+
+    @override_settings(SQL_STATS_SLOW_MS=0)
+    def test_plan_of_slow_statement_is_captured(self):
+        self.run_query('SELECT * FROM django_content_type WHERE id = %s', [1])
+        collector.flush()
+        self.assertIn('django_content_type', QueryStat.objects.get(view='').plan)
+
+    @override_settings(SQL_STATS_MAX_FINGERPRINTS=1)
+    def test_fingerprints_over_limit_are_merged(self):
+        self.run_query('SELECT 1')
+        self.run_query('SELECT 1, 2')
+        self.run_query('SELECT 1, 2, 3')
+        collector.flush()
+        self.assertEqual(QueryStat.objects.get(fingerprint=OVERFLOW_FINGERPRINT).calls, 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, PROFILER_CHECK_INTERVAL=0)
+class ProfilerTests(TestCase):
+    """
+    Tests of the on-demand request profiling.
+    """
+    def setUp(self):
+        # Triggers of the rolled back tests must not stay in the registry.
+        self.enterContext(mock.patch('monitoring.profiler.triggers', TriggerRegistry()))
+        self.addCleanup(collector.reset)
+
+    def create_trigger(self, **kwargs) -> ProfileTrigger:
+        with self.captureOnCommitCallbacks(execute=True):
+            return ProfileTrigger.objects.create(**kwargs)
+
+    def get_basket(self, headers=None):
+        return self.client.get('/api/basket', headers=headers)
+
+    def captures(self) -> list[ProfileCapture]:
+        captures = list(ProfileCapture.objects.all())
+        for capture in captures:
+            self.addCleanup(capture.profile.delete, save=False)
+            if capture.memory:
+                self.addCleanup(capture.memory.delete, save=False)
+        return captures
+
+    def test_claim_stops_at_zero(self):
+        trigger = self.create_trigger(view='basket', remaining=2)
+        self.assertTrue(claim(trigger))
+        self.assertTrue(claim(trigger))
+        self.assertFalse(claim(trigger))
+        trigger.refresh_from_db()
+        self.assertEqual(trigger.remaining, 0)
+
+    def test_change_is_seen_by_other_workers(self):
+        worker = TriggerRegistry()
+        self.assertEqual(worker.get(), [])
+        with self.assertNumQueries(0):
+            worker.get()
+        trigger = self.create_trigger(header='X-Profile: 1')
+        self.assertEqual(worker.get(), [trigger])
+
+    def test_matching_requests_are_profiled(self):
+        trigger = self.create_trigger(view='basket', remaining=1)
+        self.get_basket()
+        self.get_basket()
+        capture, = self.captures()
+        self.assertEqual((capture.view, capture.status, capture.mode), ('basket', 200, ProfileTrigger.Mode.SAMPLING))
+        self.assertTrue(capture.profile.name.endswith('.folded'))
+        trigger.refresh_from_db()
+        self.assertEqual(trigger.remaining, 0)
+
+    def test_header_trigger_with_cprofile_and_memory(self):
+        self.create_trigger(header='X-Profile: 1', mode=ProfileTrigger.Mode.CPROFILE, memory=True)
+        self.get_basket()
+        self.get_basket({'X-Profile': '1'})
+        capture, = self.captures()
+        self.assertIn('cumulative', capture.summary)
+        self.assertTrue(capture.memory_summary.startswith('Peak: '))
+        self.assertTrue(capture.profile.name.endswith('.prof'))
@@ -1,6 +1,8 @@
 from django.contrib import admin
 
-from .models import Order
+from megano.changelists import ScalableAdminMixin
+from .misc import update_order_totals
+from .models import Order, OrderEvent, OrderItem
 
 class OrderProductsInline(admin.TabularInline):
     """
@@ -8,12 +10,17 @@ class OrderProductsInline(admin.TabularInline):
 
     Attributes:
         model: The model which the inline is using.
+        fields: Form fields.
+        autocomplete_fields: Foreign keys edited with a searchable autocomplete widget.
     """
-    model = Order.products.through
+    model = OrderItem
+    fields = 'product', 'count', 'price'
+    autocomplete_fields = 'product',
+
 
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(ScalableAdminMixin, admin.ModelAdmin):
     """
     Admin form for an Order model.
 
@@ -21,16 +28,33 @@ class OrderAdmin(admin.ModelAdmin):
         inlines: Array of inlines forms.
         list_display: Array of fields that displays at the admin panel.
         list_display_links: Array of fields that redirects to update instance form.
+        list_select_related: Related objects loaded with the changelist rows.
+        list_only: Fields loaded for the changelist rows.
+        date_hierarchy: Field used to drill down the orders by date.
+        search_fields: Array of fields used in the search.
+        prefix_search_fields: Indexed fields searched by prefix.
+        raw_id_fields: Foreign keys edited with a raw id widget.
+        readonly_fields: Fields computed from the order lines.
         fieldsets: Array of field sets that define the presentation of form fields.
+
+    Methods:
+        save_related: Save order lines and recompute order totals.
     """
     inlines = [
         OrderProductsInline,
     ]
-    list_display = 'fullName', 'address', 'status'
-    list_display_links = 'address',
+    list_display = 'id', 'date', 'fullName', 'address', 'status', 'totalCost', 'user'
+    list_display_links = 'id', 'address'
+    list_select_related = 'user',
+    list_only = 'date', 'fullName', 'address', 'status', 'totalCost', 'user__username'
+    date_hierarchy = 'date'
+    search_fields = 'email',
+    prefix_search_fields = 'email',
+    raw_id_fields = 'user',
+    readonly_fields = 'subtotal', 'deliveryCost', 'totalCost'
     fieldsets = [
         ('Customer', {
-            "fields": ("fullName", 'email', 'phone'),
+            "fields": ('user', "fullName", 'email', 'phone'),
         }),
         ('Order options', {
             'fields': ('deliveryType', 'paymentType'),
@@ -38,4 +62,28 @@ class OrderAdmin(admin.ModelAdmin):
         ('Destination', {
             'fields': ('city', 'address')
         }),
+        ('Totals', {
+            'fields': ('subtotal', 'deliveryCost', 'totalCost'),
+        }),
     ]
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        update_order_totals(Order.objects.filter(pk=form.instance.pk))
+
+
+@admin.register(OrderEvent)
+class OrderEventAdmin(admin.ModelAdmin):
+    """
+    Admin form for an OrderEvent model.
+
+    Attributes:
+        list_display: Array of fields that displays at the admin panel.
+        list_filter: Array of fields used to filter events.
+        raw_id_fields: Foreign keys edited with a raw id widget.
+        readonly_fields: Fields filled by the dispatcher.
+    """
+    list_display = 'id', 'type', 'order', 'created', 'dispatched', 'attempts'
+    list_filter = 'type',
+    raw_id_fields = 'order',
+    readonly_fields = 'created', 'dispatched', 'attempts', 'retry_at', 'error'
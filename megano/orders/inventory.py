@@ -0,0 +1,158 @@
+"""
+Inventory management for orders.
+
+Stock is taken with conditional atomic updates (UPDATE ... WHERE stock >= n),
+so concurrent checkouts of the same product can't oversell it. Checkout holds
+the taken items in StockReservation rows until the order is paid. Holds of
+unpaid orders expire and are returned to the stock in batches by the
+release_reservations management command.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, When
+from django.utils import timezone
+
+from products.models import Product
+from .models import Order, StockReservation
+
+
+class OutOfStock(Exception):
+    """
+    Raised when there are not enough products in stock.
+
+    Attributes:
+        product_ids: Primary keys of the products that are out of stock.
+    """
+    def __init__(self, product_ids):
+        self.product_ids = sorted(product_ids)
+        super().__init__(f'Products {self.product_ids} are out of stock')
+
+
+def take_stock(product_id: int, count: int) -> bool:
+    """
+    Atomically take items from the product stock.
+
+    Args:
+        product_id: Product primary key.
+        count: Number of items to take.
+
+    Returns:
+        bool: Whether the stock had enough items.
+    """
+    return bool(Product.objects.filter(pk=product_id, stock__gte=count).update(
+        stock=F('stock') - count,
+        available=Case(When(stock__gt=count, then=True), default=False),
+    ))
+
+
+def return_stock(product_id: int, count: int) -> None:
+    """
+    Atomically return items to the product stock.
+
+    Args:
+        product_id: Product primary key.
+        count: Number of items to return.
+    """
+    Product.objects.filter(pk=product_id, stock__isnull=False).update(stock=F('stock') + count, available=True)
+
+
+def reserve_stock(order: Order, counts: dict[int, int], tracked_ids) -> None:
+    """
+    Take ordered products from the stock and hold them for the order.
+
+    Must be called inside a transaction, so the stock taken before a failure
+    is returned by the rollback.
+
+    Args:
+        order: Order that holds the products.
+        counts: Map of product primary keys to ordered counts.
+        tracked_ids: Primary keys of the ordered products with tracked stock.
+
+    Raises:
+        OutOfStock: If some of the products do not have enough items in stock.
+    """
+    missing_ids = [product_id for product_id in tracked_ids if not take_stock(product_id, counts[product_id])]
+    if missing_ids:
+        raise OutOfStock(missing_ids)
+    expires = timezone.now() + timedelta(seconds=settings.STOCK_RESERVATION_TTL)
+    StockReservation.objects.bulk_create(
+        StockReservation(order=order, product_id=product_id, count=counts[product_id], expires=expires)
+        for product_id in tracked_ids
+    )
+
+
+def confirm_reservations(order: Order) -> None:
+    """
+    Turn order holds into the final stock decrease.
+
+    If some holds have already expired and were released, the products are
+    taken from the stock again.
+
+    Args:
+        order: Paid order.
+
+    Raises:
+        OutOfStock: If expired holds can't be taken from the stock again.
+    """
+    with transaction.atomic():
+        reservations = list(StockReservation.objects.select_for_update().filter(order=order))
+        reserved = {}
+        for reservation in reservations:
+            reserved[reservation.product_id] = reserved.get(reservation.product_id, 0) + reservation.count
+        StockReservation.objects.filter(pk__in=[reservation.pk for reservation in reservations]).delete()
+
+        items = order.items.filter(product__stock__isnull=False).values_list('product_id', 'count')
+        missing_ids = [
+            product_id for product_id, count in items
+            if count > reserved.get(product_id, 0)
+            and not take_stock(product_id, count - reserved.get(product_id, 0))
+        ]
+        if missing_ids:
+            raise OutOfStock(missing_ids)
+
+
+def _release(reservations: list[StockReservation]) -> int:
+    counts = {}
+    for reservation in reservations:
+        counts[reservation.product_id] = counts.get(reservation.product_id, 0) + reservation.count
+    for product_id, count in counts.items():
+        return_stock(product_id, count)
+    StockReservation.objects.filter(pk__in=[reservation.pk for reservation in reservations]).delete()
+    return len(reservations)
+
+
+def release_reservations(order: Order) -> int:
+    """
+    Return products held for the order to the stock.
+
+    Args:
+        order: Declined order.
+
+    Returns:
+        int: Number of released holds.
+    """
+    with transaction.atomic():
+        return _release(list(StockReservation.objects.select_for_update().filter(order=order)))
+
+
+def release_expired_reservations(batch_size: int = None) -> int:
+    """
+    Return products of one batch of expired holds to the stock.
+
+    Args:
+        batch_size: Maximum number of released holds. Defaults to STOCK_RESERVATION_BATCH_SIZE.
+
+    Returns:
+        int: Number of released holds.
+    """
+    batch_size = batch_size or settings.STOCK_RESERVATION_BATCH_SIZE
+    with transaction.atomic():
+        reservations = list(
+            StockReservation.objects
+            .select_for_update(skip_locked=True)
+            .filter(expires__lt=timezone.now())
+            .order_by('expires')[:batch_size]
+        )
+        return _release(reservations)
@@ -0,0 +1,22 @@
+"""
+Background jobs of the orders app.
+"""
+from jobs.queue import job
+from .outbox import dispatch_events
+
+
+@job
+def dispatch_order_events() -> int:
+    """
+    Deliver all pending order events.
+
+    Returns:
+        int: Number of delivered events.
+    """
+    dispatched = 0
+    while True:
+        batch = dispatch_events()
+        dispatched += batch
+        if not batch:
+            return dispatched
+
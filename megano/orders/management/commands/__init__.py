@@ -0,0 +1 @@
+"""Orders app management commands"""
@@ -0,0 +1,35 @@
+"""
+Backfill of the stored order totals.
+"""
+from django.core.management.base import BaseCommand
+
+from orders.misc import update_order_totals
+from orders.models import Order
+
+
+class Command(BaseCommand):
+    """
+    Compute stored totals of the orders created before they were stored.
+
+    Orders are walked in primary key order in batches, so every batch is
+    a short transaction and the command can be restarted at any time.
+    """
+    help = 'Compute subtotal, delivery cost and total of orders without stored totals.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of orders updated per batch.')
+        parser.add_argument('--all', action='store_true', help='Recompute totals of all orders.')
+
+    def handle(self, *args, **options):
+        orders = Order.objects.all() if options['all'] else Order.objects.filter(totalCost__isnull=True)
+        last_pk = 0
+        updated = 0
+        while True:
+            pks = list(
+                orders.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:options['batch_size']]
+            )
+            if not pks:
+                break
+            updated += update_order_totals(Order.objects.filter(pk__in=pks))
+            last_pk = pks[-1]
+        self.stdout.write(f'Updated totals of {updated} orders')
@@ -0,0 +1,77 @@
+"""
+Concurrent checkout benchmark for a single limited product.
+"""
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from django.db.models import Sum
+
+from orders.inventory import OutOfStock
+from orders.misc import checkout
+from orders.models import Order, OrderItem
+from products.models import Category, Product
+
+
+class Command(BaseCommand):
+    """
+    Hammer one SKU with checkouts from many threads and verify there is no oversell.
+    """
+    help = 'Run concurrent checkouts of one limited product and check it is not oversold.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stock', type=int, default=100, help='Initial product stock.')
+        parser.add_argument('--threads', type=int, default=16, help='Number of concurrent buyers.')
+        parser.add_argument('--count', type=int, default=1, help='Items bought by one checkout.')
+
+    def handle(self, *args, **options):
+        category = Category.objects.create(title='checkout benchmark')
+        product = Product.objects.create(
+            title='checkout benchmark', description='', fullDescription='',
+            price=1, category=category, limited=True, stock=options['stock'],
+        )
+        results = {'orders': 0, 'sold_out': 0, 'retries': 0}
+        lock = threading.Lock()
+
+        def buyer() -> None:
+            try:
+                while True:
+                    try:
+                        checkout([{'id': product.pk, 'count': options['count']}])
+                    except OutOfStock:
+                        with lock:
+                            results['sold_out'] += 1
+                        return
+                    except OperationalError:
+                        # SQLite reports lock contention instead of waiting.
+                        with lock:
+                            results['retries'] += 1
+                        continue
+                    with lock:
+                        results['orders'] += 1
+            finally:
+                connection.close()
+
+        try:
+            started = time.perf_counter()
+            threads = [threading.Thread(target=buyer) for _ in range(options['threads'])]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+
+            product.refresh_from_db()
+            sold = OrderItem.objects.filter(product=product).aggregate(total=Sum('count'))['total'] or 0
+            oversold = max(sold - options['stock'], 0)
+            self.stdout.write(f"checkouts: {results['orders']} in {elapsed:.2f}s "
+                              f"({results['orders'] / elapsed:.1f}/s), lock retries: {results['retries']}")
+            self.stdout.write(f'sold: {sold}, stock left: {product.stock}, available: {product.available}')
+            if oversold or sold + product.stock != options['stock']:
+                self.stderr.write(self.style.ERROR(f'Inventory mismatch, oversold by {oversold}'))
+            else:
+                self.stdout.write(self.style.SUCCESS('No oversell'))
+        finally:
+            Order.objects.filter(items__product=product).delete()
+            category.delete()
@@ -0,0 +1,44 @@
+"""
+Dispatcher of the order events outbox.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.outbox import dispatch_events, get_outbox_metrics
+
+
+class Command(BaseCommand):
+    """
+    Deliver pending order events to the handlers.
+
+    Events are normally delivered by the run_jobs workers right after they
+    are written. The command drains the outbox once, or keeps sweeping with
+    --interval to deliver events whose delivery was retried or not queued.
+    """
+    help = 'Deliver pending order events from the outbox.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Number of events delivered per batch.')
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Keep sweeping with this pause (in seconds) between runs.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            dispatched = 0
+            while True:
+                batch = dispatch_events(options['batch_size'])
+                dispatched += batch
+                if not batch:
+                    break
+            metrics = get_outbox_metrics()
+            self.stdout.write(
+                f"Dispatched {dispatched} events, pending: {metrics['pending']}, lag: {metrics['lag']:.1f}s"
+            )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
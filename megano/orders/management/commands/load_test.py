@@ -0,0 +1,566 @@
+"""
+Concurrent load test of the shopper flow.
+"""
+import asyncio
+import contextvars
+import io
+import json
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlsplit
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import OperationalError, connection
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+
+from basket.models import Basket
+from orders.models import Order
+from orders.payments import payment_queue
+from products.management.commands.api_benchmark import percentile
+from products.models import Product
+
+STEPS = ('browse', 'filter', 'product', 'basket', 'checkout', 'confirm', 'payment')
+
+# Statements of the background threads (payment workers, session writer).
+BACKGROUND = 'background'
+
+current_step = contextvars.ContextVar('load_test_step', default=BACKGROUND)
+
+
+class StepStats:
+    """
+    Measurements of one flow step during one load stage.
+
+    Attributes:
+        latencies: Request latencies in milliseconds.
+        errors: Number of failed requests.
+        lock_waits: Number of write statements that waited for a database lock.
+        lock_wait_ms: Time spent in the waiting statements in milliseconds.
+        lock_errors: Number of statements that failed with a locked database.
+    """
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.lock_waits = 0
+        self.lock_wait_ms = 0.0
+        self.lock_errors = 0
+
+
+class LockWaitMonitor:
+    """
+    Database execute wrapper that attributes lock waits to the flow steps.
+
+    SQLite waits for a locked database inside the statement (in its busy
+    handler), so write statements that take longer than the threshold are
+    counted as lock waits. Statements failing with a locked database are
+    counted separately.
+
+    Attributes:
+        threshold: Minimum wait in seconds.
+        stats: Stats of the current stage by step name.
+    """
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.lstrip()[:6].upper() in ('SELECT', 'PRAGMA'):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError as error:
+            if 'locked' in str(error):
+                with self._lock:
+                    self.step_stats().lock_errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            if elapsed >= self.threshold:
+                with self._lock:
+                    stats = self.step_stats()
+                    stats.lock_waits += 1
+                    stats.lock_wait_ms += elapsed * 1000
+
+    def step_stats(self) -> StepStats:
+        return self.stats.setdefault(current_step.get(), StepStats())
+
+    def install(self, sender=None, connection=None, **kwargs) -> None:
+        """
+        Install monitor into the database connection.
+
+        Args:
+            sender: Signal sender.
+            connection: Database connection.
+        """
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+
+class WSGITarget:
+    """
+    Project WSGI application called in-process by a pool of threads.
+
+    Attributes:
+        application: WSGI application.
+    """
+    in_process = True
+
+    def __init__(self, threads: int):
+        self.application = get_wsgi_application()
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='wsgi')
+
+    async def request(self, method: str, path: str, headers: list[tuple[str, str]], body: bytes):
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, context.run, self._call, method, path, headers, body,
+        )
+
+    def _call(self, method, path, headers, body):
+        path, _, query = path.partition('?')
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REMOTE_ADDR': '127.0.0.1',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+            'HTTP_HOST': 'localhost',
+        }
+        for name, value in headers:
+            key = name.upper().replace('-', '_')
+            environ[key if key == 'CONTENT_TYPE' else f'HTTP_{key}'] = value
+        started = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            started['status'] = int(status.split()[0])
+            started['headers'] = [(name.lower(), value) for name, value in response_headers]
+
+        result = self.application(environ, start_response)
+        try:
+            content = b''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return started['status'], started['headers'], content
+
+    def close(self) -> None:
+        self._executor.shutdown()
+
+
+class ASGITarget:
+    """
+    Project ASGI application called in-process from the event loop.
+
+    Attributes:
+        application: ASGI application.
+    """
+    in_process = True
+
+    def __init__(self):
+        self.application = get_asgi_application()
+
+    async def request(self, method: str, path: str, headers: list[tuple[str, str]], body: bytes):
+        path, _, query = path.partition('?')
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': method,
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': query.encode(),
+            'root_path': '',
+            'headers': [(b'host', b'localhost'), (b'content-length', str(len(body)).encode())] + [
+                (name.lower().encode(), value.encode()) for name, value in headers
+            ],
+            'client': ('127.0.0.1', 0),
+            'server': ('localhost', 80),
+        }
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        disconnected = asyncio.Event()
+        response = {'body': []}
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+                response['headers'] = [
+                    (name.decode().lower(), value.decode()) for name, value in message['headers']
+                ]
+            elif message['type'] == 'http.response.body':
+                response['body'].append(message.get('body', b''))
+
+        try:
+            await self.application(scope, receive, send)
+        finally:
+            disconnected.set()
+        return response['status'], response['headers'], b''.join(response['body'])
+
+    def close(self) -> None:
+        pass
+
+
+class HTTPTarget:
+    """
+    Server listening on a local address, requested over HTTP/1.1.
+
+    Every request opens a new connection, so the results do not depend on
+    the keep-alive support of the server.
+
+    Attributes:
+        host: Server host.
+        port: Server port.
+    """
+    in_process = False
+
+    def __init__(self, url: str):
+        parts = urlsplit(url)
+        if parts.scheme != 'http' or not parts.hostname:
+            raise CommandError(f'Unsupported target {url!r}, use wsgi, asgi or http://host:port')
+        self.host = parts.hostname
+        self.port = parts.port or 80
+
+    async def request(self, method: str, path: str, headers: list[tuple[str, str]], body: bytes):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            head = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}', 'Connection: close',
+                    f'Content-Length: {len(body)}']
+            head.extend(f'{name}: {value}' for name, value in headers)
+            writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+            await writer.drain()
+            data = await reader.read()
+        finally:
+            writer.close()
+        head, _, content = data.partition(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        response_headers = []
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            response_headers.append((name.strip().lower(), value.strip()))
+        if ('transfer-encoding', 'chunked') in response_headers:
+            content = self._dechunk(content)
+        return int(lines[0].split()[1]), response_headers, content
+
+    @staticmethod
+    def _dechunk(content: bytes) -> bytes:
+        chunks = []
+        while content:
+            size, _, content = content.partition(b'\r\n')
+            size = int(size.split(b';')[0], 16)
+            if not size:
+                break
+            chunks.append(content[:size])
+            content = content[size + 2:]
+        return b''.join(chunks)
+
+    def close(self) -> None:
+        pass
+
+
+class Shopper:
+    """
+    Anonymous visitor walking through the shopper flow.
+
+    Products with a tracked stock are not bought, so the test does not
+    change stock levels.
+
+    Attributes:
+        target: Requested application.
+        rng: Random generator of the visitor choices.
+        stats: Stats of the current stage by step name.
+        tracked_ids: Primary keys of the products with a tracked stock.
+        think_time: Mean pause between requests in seconds.
+        order_ids: Primary keys of the created orders.
+    """
+    def __init__(self, target, rng: random.Random, stats: dict, tracked_ids: set[int], think_time: float,
+                 order_ids: list[int]):
+        self.target = target
+        self.rng = rng
+        self.stats = stats
+        self.tracked_ids = tracked_ids
+        self.think_time = think_time
+        self.order_ids = order_ids
+        self.cookies = {}
+
+    async def request(self, step: str, method: str, path: str, data=None, expected: int = 200):
+        """
+        Send request of the flow step and record its latency.
+
+        Args:
+            step: Flow step name.
+            method: HTTP method.
+            path: Request path with the query string.
+            data: JSON request body.
+            expected: Expected response status.
+
+        Returns:
+            Decoded JSON response or None if the request failed.
+        """
+        if self.think_time:
+            await asyncio.sleep(self.rng.expovariate(1 / self.think_time))
+        headers = [('Accept', 'application/json')]
+        if self.cookies:
+            headers.append(('Cookie', '; '.join(f'{name}={value}' for name, value in self.cookies.items())))
+        body = b''
+        if data is not None:
+            body = json.dumps(data).encode()
+            headers.append(('Content-Type', 'application/json'))
+        stats = self.stats.setdefault(step, StepStats())
+        token = current_step.set(step)
+        started = time.perf_counter()
+        try:
+            status, response_headers, content = await self.target.request(method, path, headers, body)
+        except Exception:
+            stats.errors += 1
+            return None
+        finally:
+            current_step.reset(token)
+        stats.latencies.append((time.perf_counter() - started) * 1000)
+        for name, value in response_headers:
+            if name == 'set-cookie':
+                cookie_name, _, cookie_value = value.split(';')[0].partition('=')
+                self.cookies[cookie_name.strip()] = cookie_value.strip()
+        if status != expected:
+            stats.errors += 1
+            return None
+        return json.loads(content) if content else {}
+
+    async def run(self) -> None:
+        """
+        Walk through the flow once: browse the catalog, filter it, open a
+        product, put products into the basket, check out, confirm the
+        order and pay for it.
+        """
+        page = await self.request('browse', 'GET', '/api/catalog/?' + urlencode({
+            'currentPage': self.rng.randint(1, 3),
+        }))
+        if not page or not page['items']:
+            return
+        item = self.rng.choice(page['items'])
+        price = float(item['price'])
+        page = await self.request('filter', 'GET', '/api/catalog/?' + urlencode({
+            'category': item['category'],
+            'filter[available]': 'true',
+            'filter[minPrice]': int(price / 2),
+            'filter[maxPrice]': int(price * 2) + 1,
+            'sort': self.rng.choice(['price', 'rating', 'reviews', 'date']),
+            'sortType': self.rng.choice(['inc', 'dec']),
+        }))
+        if not page:
+            return
+        candidates = [product['id'] for product in page['items'] if product['id'] not in self.tracked_ids]
+        if not candidates:
+            return
+        product_id = self.rng.choice(candidates)
+        if await self.request('product', 'GET', f'/api/product/{product_id}/') is None:
+            return
+        basket = await self.request('basket', 'POST', '/api/basket', {
+            'id': product_id, 'count': self.rng.randint(1, 3),
+        }, expected=201)
+        if not basket:
+            return
+        order = await self.request('checkout', 'POST', '/api/orders', [
+            {'id': product['id'], 'count': product['count']} for product in basket
+        ])
+        if not order:
+            return
+        order_id = order['orderId']
+        self.order_ids.append(order_id)
+        confirmed = await self.request('confirm', 'POST', f'/api/order/{order_id}', {
+            'fullName': 'Нагрузочный Тест', 'email': 'load-test@example.com', 'phone': '+70000000000',
+            'deliveryType': 'ordinary', 'paymentType': 'online', 'status': 'In process',
+            'city': 'Москва', 'address': 'ул. Ленина, д. 1',
+        })
+        if confirmed is None:
+            return
+        await self.request('payment', 'POST', f'/api/payment/{order_id}', {
+            'number': 12345678, 'name': 'LOAD TEST', 'month': '12', 'year': '2030', 'code': '123',
+        }, expected=202)
+
+
+class Command(BaseCommand):
+    """
+    Run concurrent shopper sessions against the project and report per step metrics.
+
+    The load runs in stages of growing concurrency (the ramp), each stage
+    keeps the given number of shoppers walking through the flow for the
+    stage duration. Every shopper session is a new anonymous visitor.
+
+    The wsgi and asgi targets call the project applications in-process
+    with the configured database, which makes lock waits of the database
+    statements measurable. Other targets are servers on a local address,
+    for them only the client side metrics are reported. Orders created by
+    the in-process targets are deleted after the test.
+    """
+    help = 'Run browse-filter-product-basket-checkout-payment sessions with a concurrency ramp.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target', default='wsgi', help='wsgi, asgi (in-process) or server URL like http://127.0.0.1:8000.',
+        )
+        parser.add_argument(
+            '--ramp', type=int, nargs='+', default=[1, 5, 10, 20], help='Concurrent shoppers of the stages.',
+        )
+        parser.add_argument('--stage-duration', type=float, default=15, help='Stage duration in seconds.')
+        parser.add_argument('--think-time', type=float, default=0, help='Mean pause between requests in seconds.')
+        parser.add_argument(
+            '--lock-wait-ms', type=float, default=20,
+            help='Write statements slower than this (in milliseconds) are counted as lock waits.',
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Random seed of the shopper choices.')
+        parser.add_argument('--output', help='Save the results to this JSON file.')
+        parser.add_argument('--keep-data', action='store_true', help='Do not delete the created orders.')
+
+    def handle(self, *args, **options):
+        if min(options['ramp']) < 1:
+            raise CommandError('--ramp values must be positive')
+        if options['target'] == 'wsgi':
+            target = WSGITarget(max(options['ramp']))
+        elif options['target'] == 'asgi':
+            target = ASGITarget()
+        else:
+            target = HTTPTarget(options['target'])
+        if not Product.objects.exists():
+            raise CommandError('There are no products, fill the database with the seed command first')
+        tracked_ids = set(Product.objects.filter(stock__isnull=False).values_list('pk', flat=True))
+        connection.close()
+
+        monitor = LockWaitMonitor(options['lock_wait_ms'] / 1000)
+        if target.in_process:
+            connection_created.connect(monitor.install)
+        started = timezone.now()
+        order_ids = []
+        results = []
+        try:
+            for concurrency in options['ramp']:
+                result = asyncio.run(self.run_stage(target, monitor, concurrency, tracked_ids, order_ids, options))
+                results.append(result)
+                self.report(result, target.in_process)
+        finally:
+            connection_created.disconnect(monitor.install)
+            target.close()
+            if target.in_process and not options['keep_data']:
+                self.cleanup(order_ids, started)
+
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump({'target': options['target'], 'stages': results}, file, indent=2)
+            self.stdout.write(f'Results saved to {options["output"]}')
+
+    async def run_stage(self, target, monitor: LockWaitMonitor, concurrency: int, tracked_ids: set[int],
+                        order_ids: list[int], options: dict) -> dict:
+        """
+        Keep concurrent shoppers walking through the flow for the stage duration.
+
+        Args:
+            target: Requested application.
+            monitor: Installed lock wait monitor.
+            concurrency: Number of concurrent shoppers.
+            tracked_ids: Primary keys of the products with a tracked stock.
+            order_ids: List the created order primary keys are added to.
+            options: Command options.
+
+        Returns:
+            dict: Stage metrics.
+        """
+        stats = {}
+        monitor.stats = stats
+        sessions = 0
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + options['stage_duration']
+
+        async def shopper(number: int) -> None:
+            nonlocal sessions
+            rng = random.Random(f'{options["seed"]}-{concurrency}-{number}')
+            while loop.time() < deadline:
+                await Shopper(target, rng, stats, tracked_ids, options['think_time'], order_ids).run()
+                sessions += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(shopper(number) for number in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+        steps = {}
+        for step in (*STEPS, BACKGROUND):
+            step_stats = stats.get(step)
+            if step_stats is None:
+                continue
+            requests = len(step_stats.latencies) + step_stats.errors
+            steps[step] = {
+                'requests': requests,
+                'throughput': round(requests / elapsed, 2),
+                'p50_ms': round(percentile(step_stats.latencies, 50), 2) if step_stats.latencies else None,
+                'p95_ms': round(percentile(step_stats.latencies, 95), 2) if step_stats.latencies else None,
+                'p99_ms': round(percentile(step_stats.latencies, 99), 2) if step_stats.latencies else None,
+                'error_rate': round(step_stats.errors / requests, 4) if requests else 0,
+                'lock_waits': step_stats.lock_waits,
+                'lock_wait_ms': round(step_stats.lock_wait_ms, 2),
+                'lock_errors': step_stats.lock_errors,
+            }
+        return {
+            'concurrency': concurrency,
+            'duration': round(elapsed, 2),
+            'sessions': sessions,
+            'throughput': round(sessions / elapsed, 2),
+            'steps': steps,
+        }
+
+    def report(self, result: dict, lock_waits: bool) -> None:
+        self.stdout.write(
+            f'{result["concurrency"]} shoppers, {result["duration"]:.1f}s: '
+            f'{result["sessions"]} sessions ({result["throughput"]:.1f}/s)'
+        )
+        self.stdout.write(f'  {"step":<11}{"requests":>9}{"req/s":>8}{"p50":>9}{"p95":>9}{"p99":>9}{"errors":>8}'
+                          + (f'{"lock waits":>12}{"lock ms":>10}{"locked":>8}' if lock_waits else ''))
+        for step, metrics in result['steps'].items():
+            line = f'  {step:<11}'
+            if metrics['requests']:
+                latencies = (metrics['p50_ms'], metrics['p95_ms'], metrics['p99_ms'])
+                line += f'{metrics["requests"]:>9}{metrics["throughput"]:>8.1f}'
+                line += ''.join(f'{value:>9.1f}' if value is not None else f'{"-":>9}' for value in latencies)
+                line += f'{metrics["error_rate"]:>8.1%}'
+            else:
+                line += ' ' * 52
+            if lock_waits:
+                line += f'{metrics["lock_waits"]:>12}{metrics["lock_wait_ms"]:>10.0f}{metrics["lock_errors"]:>8}'
+            self.stdout.write(line)
+
+    def cleanup(self, order_ids: list[int], started) -> None:
+        """
+        Delete orders and anonymous baskets created by the test.
+
+        Args:
+            order_ids: Primary keys of the created orders.
+            started: Time the test was started.
+        """
+        payment_queue.drain()
+        deleted = 0
+        for start in range(0, len(order_ids), 500):
+            deleted += Order.objects.filter(pk__in=order_ids[start:start + 500]).delete()[1].get(
+                Order._meta.label, 0,
+            )
+        Basket.objects.filter(user=None, updated__gte=started).delete()
+        self.stdout.write(f'Deleted {deleted} test orders')
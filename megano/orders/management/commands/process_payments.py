@@ -0,0 +1,51 @@
+"""
+Worker that processes submitted payments.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.payments import PaymentQueue, get_pending_payment_ids, requeue_stalled_payments
+
+
+class Command(BaseCommand):
+    """
+    Process pending payments with a pool of worker threads.
+
+    Picks up payments that were not processed by the web processes (e.g.
+    with PAYMENT_WORKERS = 0 or after a restart). Runs once by default, or
+    keeps polling with --interval.
+    """
+    help = 'Authorize pending payments and accept or decline their orders.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Number of worker threads.')
+        parser.add_argument('--batch-size', type=int, default=100, help='Number of payments claimed per batch.')
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Keep polling with this pause (in seconds) between runs.',
+        )
+
+    def handle(self, *args, **options):
+        queue = PaymentQueue(workers=options['workers'])
+        while True:
+            requeued = requeue_stalled_payments()
+            if requeued:
+                self.stdout.write(f'Requeued {requeued} stalled payments')
+            while True:
+                payment_ids = get_pending_payment_ids(options['batch_size'])
+                if not payment_ids:
+                    break
+                for payment_id in payment_ids:
+                    queue.submit(payment_id)
+                queue.drain()
+            metrics = queue.metrics()
+            self.stdout.write(
+                f"Succeeded: {metrics['succeeded']}, failed: {metrics['failed']}, "
+                f"throughput: {metrics['throughput']:.2f}/s"
+            )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,39 @@
+"""
+Sweeper that returns expired stock holds to the stock.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.inventory import release_expired_reservations
+
+
+class Command(BaseCommand):
+    """
+    Release expired stock holds in batches.
+
+    Runs once by default, or keeps sweeping with --interval.
+    """
+    help = 'Return products held by expired unpaid orders to the stock.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Number of holds released per batch.')
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Keep sweeping with this pause (in seconds) between runs.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            released = 0
+            while True:
+                batch = release_expired_reservations(options['batch_size'])
+                released += batch
+                if not batch:
+                    break
+            self.stdout.write(f'Released {released} expired holds')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
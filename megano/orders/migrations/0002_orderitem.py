@@ -0,0 +1,58 @@
+# Generated by Django 5.1.4 on 2026-10-18 22:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_order_products(apps, schema_editor):
+    """
+    Move ordered products into order lines.
+
+    Before this migration the ordered quantity was kept in Product.count,
+    so it is used together with the current price as the best known values.
+    """
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    links = Order.products.through.objects.select_related('product')
+    OrderItem.objects.bulk_create(
+        (
+            OrderItem(
+                order_id=link.order_id,
+                product_id=link.product_id,
+                count=max(link.product.count, 1),
+                price=link.product.price,
+            )
+            for link in links.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0001_initial'),
+        ('products', '0007_sale'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(verbose_name='Количество')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Цена')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='orders.order', verbose_name='Заказ')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='order_items', to='products.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Товар в заказе',
+                'verbose_name_plural': 'Товары в заказе',
+            },
+        ),
+        migrations.RunPython(copy_order_products, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='order',
+            name='products',
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.4 on 2026-10-18 22:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_orderitem'),
+        ('products', '0008_product_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(verbose_name='Количество')),
+                ('expires', models.DateTimeField(db_index=True, verbose_name='Действует до')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='orders.order', verbose_name='Заказ')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='products.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Резерв товара',
+                'verbose_name_plural': 'Резервы товаров',
+            },
+        ),
+    ]
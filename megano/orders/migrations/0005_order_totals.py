@@ -0,0 +1,28 @@
+# Generated by Django 5.1.4 on 2026-10-18 22:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_order_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='deliveryCost',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Стоимость доставки'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='subtotal',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True, verbose_name='Стоимость товаров'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='totalCost',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True, verbose_name='Общая стоимость'),
+        ),
+    ]
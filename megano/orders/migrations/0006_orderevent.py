@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-18 22:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_order_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(max_length=50, verbose_name='Тип')),
+                ('payload', models.JSONField(default=dict, verbose_name='Данные')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('dispatched', models.DateTimeField(blank=True, null=True, verbose_name='Доставлено')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Попытки')),
+                ('retry_at', models.DateTimeField(blank=True, null=True, verbose_name='Повтор')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Ошибка')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='orders.order', verbose_name='Заказ')),
+            ],
+            options={
+                'verbose_name': 'Событие заказа',
+                'verbose_name_plural': 'События заказов',
+                'indexes': [models.Index(condition=models.Q(('dispatched__isnull', True)), fields=['id'], name='order_event_pending_idx')],
+            },
+        ),
+    ]
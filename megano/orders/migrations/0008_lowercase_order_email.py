@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-18 23:16
+
+from django.db import migrations
+from django.db.models.functions import Lower
+
+
+def lowercase_emails(apps, schema_editor):
+    """
+    Lowercase e-mails of the existing orders for the admin prefix search.
+    """
+    Order = apps.get_model('orders', 'Order')
+    Order.objects.exclude(email=None).update(email=Lower('email'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_order_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(lowercase_emails, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.4 on 2026-10-18 23:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_lowercase_order_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Название')),
+                ('owner', models.CharField(blank=True, default='', max_length=32, verbose_name='Владелец')),
+                ('expires', models.DateTimeField(blank=True, null=True, verbose_name='Действует до')),
+            ],
+            options={
+                'verbose_name': 'Блокировка рассылки событий',
+                'verbose_name_plural': 'Блокировки рассылки событий',
+            },
+        ),
+    ]
@@ -0,0 +1,161 @@
+"""
+Misc functions for orders app.
+
+Order totals are stored in the order row. They are computed by set-based
+UPDATE statements, so the totals of one order and of a batch of orders cost
+the same number of queries.
+
+Attributes:
+    ORDER_ITEMS_PREFETCH: Lookups that prefetch order lines with product data needed by OrderSerializer.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, OuterRef, Prefetch, QuerySet, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.http import Http404
+
+from products.models import Product
+from users.models import Profile
+from users.site_settings import site_settings
+from .inventory import reserve_stock
+from .models import Order, OrderItem
+from .outbox import ORDER_CREATED, record_order_event
+
+ORDER_ITEMS_PREFETCH = (
+    Prefetch('items__product', queryset=Product.objects.annotate(review_count=Count('reviews'))),
+    'items__product__images',
+    'items__product__tags',
+    'items__product__specifications',
+)
+
+
+def update_order_totals(orders: QuerySet) -> int:
+    """
+    Compute and store subtotal, delivery cost and total of the orders.
+
+    Subtotals are aggregated from the order lines in the database. Express
+    delivery has a fixed price, ordinary delivery is free for orders that
+    cost more than free_delivery_min_price.
+
+    Args:
+        orders: Orders to update.
+
+    Returns:
+        int: Number of updated orders.
+    """
+    subtotal = (OrderItem.objects
+                .filter(order=OuterRef('pk'))
+                .values('order')
+                .annotate(subtotal=Sum(F('price') * F('count')))
+                .values('subtotal'))
+    money = DecimalField(max_digits=12, decimal_places=2)
+    delivery_cost = Case(
+        When(deliveryType=1, then=Value(site_settings.get('express_delivery_price'))),
+        When(subtotal__gt=Value(site_settings.get('free_delivery_min_price')), then=Value(Decimal('0'))),
+        default=Value(site_settings.get('default_delivery_price')),
+        output_field=money,
+    )
+    with transaction.atomic():
+        updated = orders.update(subtotal=Coalesce(Subquery(subtotal, output_field=money), Value(Decimal('0'))))
+        orders.update(deliveryCost=delivery_cost, totalCost=F('subtotal') + delivery_cost)
+    return updated
+
+
+def checkout(items: list[dict], profile: Profile | None = None) -> Order:
+    """
+    Create order with its lines in one transaction.
+
+    All products are fetched with a single query and order lines are
+    inserted with one bulk insert. Prices are copied into the lines, so
+    later product price changes do not affect the order. Products with
+    tracked stock are held for the order until it is paid. Order totals are
+    stored in the database, the returned instance does not hold them.
+
+    Args:
+        items: List of dicts with product primary key (id) and ordered count.
+        profile: Profile of the customer if the customer is authenticated.
+
+    Returns:
+        Order: Created order.
+
+    Raises:
+        Product.DoesNotExist: If some of the ordered products do not exist.
+        OutOfStock: If some of the products do not have enough items in stock.
+    """
+    counts = {}
+    for item in items:
+        counts[item['id']] = counts.get(item['id'], 0) + item['count']
+
+    with transaction.atomic():
+        # The order is written first, so the transaction takes the write lock
+        # before reading and concurrent checkouts wait for it instead of failing.
+        order = Order(status=0)
+        if profile is not None:
+            order.user_id = profile.user_id
+            order.fullName = profile.fullName
+            order.phone = profile.phone
+            order.email = profile.email
+        order.save()
+
+        products = Product.objects.only('pk', 'price', 'stock').in_bulk(list(counts))
+        missing_ids = set(counts) - set(products)
+        if missing_ids:
+            raise Product.DoesNotExist(f'Products {sorted(missing_ids)} do not exist')
+
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, product_id=product_id, count=count, price=products[product_id].price)
+            for product_id, count in counts.items()
+        )
+        tracked_ids = [product_id for product_id, product in products.items() if product.stock is not None]
+        reserve_stock(order, counts, tracked_ids)
+        update_order_totals(Order.objects.filter(pk=order.pk))
+        record_order_event(order, ORDER_CREATED, items=[
+            {'id': product_id, 'count': count} for product_id, count in counts.items()
+        ])
+    return order
+
+
+def remember_guest_order(request, order: Order) -> None:
+    """
+    Bind order placed by an anonymous visitor to the visitor session.
+
+    Only the last GUEST_ORDERS_LIMIT orders are kept.
+
+    Args:
+        request: Current HTTP request.
+        order: Placed order.
+    """
+    order_ids = request.session.get(settings.GUEST_ORDERS_SESSION_ID, [])
+    request.session[settings.GUEST_ORDERS_SESSION_ID] = [*order_ids, order.pk][-settings.GUEST_ORDERS_LIMIT:]
+
+
+def get_customer_order(request, queryset: QuerySet, pk: int) -> Order:
+    """
+    Get order available to the current user.
+
+    Orders of users are available to their owners, anonymous orders are
+    available to the session that placed them. The session is kept on login,
+    so a visitor who logs in before confirming the order still gets it.
+
+    Args:
+        request: Current HTTP request.
+        queryset: Orders queryset.
+        pk: Order primary key.
+
+    Returns:
+        Order: Found order.
+
+    Raises:
+        Http404: If the order does not exist or belongs to another customer.
+    """
+    order = queryset.filter(pk=pk).first()
+    if order is None:
+        raise Http404
+    if order.user_id is None:
+        if order.pk not in request.session.get(settings.GUEST_ORDERS_SESSION_ID, []):
+            raise Http404
+    elif order.user_id != request.user.id:
+        raise Http404
+    return order
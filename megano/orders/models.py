@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import models
 
 class Order(models.Model):
@@ -7,25 +8,41 @@ class Order(models.Model):
     Meta:
         verbose_name: representing name of the model.
         verbose_name_plural: plural form of the verbose_name.
+        indexes: Indexes of the user order history and of the admin date drill-down and e-mail search.
 
     Attributes:
+        user: Customer who placed the order (empty for anonymous orders).
         date: When order was created.
-        products: What products does this order contains.
         fullName: Customer full name.
-        email: Customer e-mail.
+        email: Customer e-mail, stored lowercased for the indexed prefix search.
         phone: Customer phone number.
         city: Customer living city.
         address: Address of the delivery.
         deliveryType: Type of the delivery (free or not)
         paymentType: Type of the payment.
         status: Current order status.
+        subtotal: Cost of the ordered products.
+        deliveryCost: Cost of the delivery.
+        totalCost: Cost of the products with the delivery.
     """
     class Meta:
         verbose_name = 'Заказ'
         verbose_name_plural = 'Заказы'
+        indexes = [
+            models.Index(fields=['user', '-date'], name='order_user_date_idx'),
+            models.Index(fields=['-date'], name='order_date_idx'),
+            models.Index(fields=['email'], name='order_email_idx'),
+        ]
 
+    user = models.ForeignKey(
+        to=settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='orders',
+        verbose_name='Покупатель',
+    )
     date = models.DateTimeField(auto_now_add=True, verbose_name='Дата')
-    products = models.ManyToManyField('products.Product', related_name='orders', verbose_name='Товары')
     fullName = models.CharField(max_length=100, null=True, verbose_name='Полное имя')
     email = models.EmailField(null=True)
     phone = models.CharField(max_length=20, null=True, verbose_name='Номер телефона')
@@ -34,3 +51,151 @@ class Order(models.Model):
     deliveryType = models.IntegerField(null=True, default=0, verbose_name='Тип доставки')
     paymentType = models.IntegerField(null=True, default=0, verbose_name='Тип платежа')
     status = models.IntegerField(null=True, default=0, verbose_name='Статус')
+    subtotal = models.DecimalField(
+        decimal_places=2,
+        max_digits=12,
+        null=True,
+        blank=True,
+        verbose_name='Стоимость товаров',
+    )
+    deliveryCost = models.DecimalField(
+        decimal_places=2,
+        max_digits=10,
+        null=True,
+        blank=True,
+        verbose_name='Стоимость доставки',
+    )
+    totalCost = models.DecimalField(
+        decimal_places=2,
+        max_digits=12,
+        null=True,
+        blank=True,
+        verbose_name='Общая стоимость',
+    )
+
+    def save(self, *args, **kwargs):
+        if self.email:
+            self.email = self.email.lower()
+        super().save(*args, **kwargs)
+
+
+class OrderItem(models.Model):
+    """
+    Represents product line of an order.
+
+    Meta:
+        verbose_name: representing name of the model.
+        verbose_name_plural: plural form of the verbose_name.
+
+    Attributes:
+        order: Which order the line belongs to.
+        product: Ordered product.
+        count: Number of ordered items.
+        price: Product price at the moment of the checkout.
+    """
+    class Meta:
+        verbose_name = 'Товар в заказе'
+        verbose_name_plural = 'Товары в заказе'
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items', verbose_name='Заказ')
+    product = models.ForeignKey(
+        to='products.Product',
+        on_delete=models.PROTECT,
+        related_name='order_items',
+        verbose_name='Товар',
+    )
+    count = models.PositiveIntegerField(verbose_name='Количество')
+    price = models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Цена')
+
+
+class StockReservation(models.Model):
+    """
+    Represents products held in stock for an order that is still in process.
+
+    Meta:
+        verbose_name: representing name of the model.
+        verbose_name_plural: plural form of the verbose_name.
+
+    Attributes:
+        order: Which order holds the products.
+        product: Held product.
+        count: Number of held items.
+        expires: When the hold is released if the order is not paid.
+    """
+    class Meta:
+        verbose_name = 'Резерв товара'
+        verbose_name_plural = 'Резервы товаров'
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='reservations', verbose_name='Заказ')
+    product = models.ForeignKey(
+        to='products.Product',
+        on_delete=models.CASCADE,
+        related_name='reservations',
+        verbose_name='Товар',
+    )
+    count = models.PositiveIntegerField(verbose_name='Количество')
+    expires = models.DateTimeField(db_index=True, verbose_name='Действует до')
+
+
+class OrderEvent(models.Model):
+    """
+    Represents order lifecycle event in the outbox.
+
+    Events are written in the same transaction as the order change and are
+    delivered to the handlers by the outbox dispatcher.
+
+    Meta:
+        verbose_name: representing name of the model.
+        verbose_name_plural: plural form of the verbose_name.
+        indexes: Index of the events that are not dispatched yet.
+
+    Attributes:
+        order: Which order the event is about.
+        type: Event type.
+        payload: Event data.
+        created: When the event happened.
+        dispatched: When the event was delivered to all handlers.
+        attempts: Number of failed deliveries.
+        retry_at: When the failed delivery is retried.
+        error: Last delivery error.
+    """
+    class Meta:
+        verbose_name = 'Событие заказа'
+        verbose_name_plural = 'События заказов'
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(dispatched__isnull=True), name='order_event_pending_idx'),
+        ]
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='events', verbose_name='Заказ')
+    type = models.CharField(max_length=50, verbose_name='Тип')
+    payload = models.JSONField(default=dict, verbose_name='Данные')
+    created = models.DateTimeField(auto_now_add=True, verbose_name='Создано')
+    dispatched = models.DateTimeField(null=True, blank=True, verbose_name='Доставлено')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Попытки')
+    retry_at = models.DateTimeField(null=True, blank=True, verbose_name='Повтор')
+    error = models.TextField(blank=True, default='', verbose_name='Ошибка')
+
+
+class OutboxLock(models.Model):
+    """
+    Represents lock of the order events dispatcher.
+
+    The lock is taken and extended with conditional updates of the row, so
+    it holds across processes on any database.
+
+    Meta:
+        verbose_name: representing name of the model.
+        verbose_name_plural: plural form of the verbose_name.
+
+    Attributes:
+        name: Lock name.
+        owner: Token of the dispatcher that holds the lock (empty if the lock is free).
+        expires: When the lock of a stopped dispatcher may be taken over.
+    """
+    class Meta:
+        verbose_name = 'Блокировка рассылки событий'
+        verbose_name_plural = 'Блокировки рассылки событий'
+
+    name = models.CharField(max_length=50, unique=True, verbose_name='Название')
+    owner = models.CharField(max_length=32, blank=True, default='', verbose_name='Владелец')
+    expires = models.DateTimeField(null=True, blank=True, verbose_name='Действует до')
@@ -0,0 +1,303 @@
+"""
+Transactional outbox of order lifecycle events.
+
+Order changes write OrderEvent rows in the same transaction, so an event
+exists if and only if the change was committed. The dispatcher delivers the
+events to the handlers from ORDER_EVENT_HANDLERS in batches and in the order
+they were written. Delivery is at least once: an event is marked as
+dispatched only after every handler has accepted it, and a failed event
+blocks the following ones until it is delivered, so handlers must tolerate
+repeated events. A delayed dispatch job retries the failed event.
+
+Only one dispatcher runs at a time. It holds the OutboxLock row, which is
+extended before every event, and the batch stops if the lock was lost, so
+slow handlers don't let two dispatchers run at once. A dispatcher that finds
+the lock taken queues a delayed dispatch, so its events are not left for
+the next sweep.
+
+Attributes:
+    dispatcher_metrics: Counters of the dispatcher of the current process.
+"""
+import json
+import logging
+import threading
+from datetime import timedelta
+from typing import Callable
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Order, OrderEvent, OutboxLock
+
+logger = logging.getLogger(__name__)
+
+ORDER_CREATED = 'order.created'
+ORDER_CONFIRMED = 'order.confirmed'
+ORDER_PAID = 'order.paid'
+ORDER_DECLINED = 'order.declined'
+
+_LOCK_NAME = 'orders.outbox.dispatcher'
+
+dispatcher_metrics = {
+    'dispatched': 0,
+    'failed': 0,
+    'lastBatchSize': 0,
+    'lastLag': 0.0,
+}
+
+
+def record_order_event(order: Order, event_type: str, **data) -> OrderEvent:
+    """
+    Write order event to the outbox.
+
+    Must be called in the transaction that changes the order. The dispatch
+    job is queued when the transaction is committed.
+
+    Args:
+        order: Changed order.
+        event_type: Event type.
+        data: Additional event data.
+
+    Returns:
+        OrderEvent: Written event.
+    """
+    payload = {'orderId': order.pk, 'status': order.status, **data}
+    event = OrderEvent.objects.create(order=order, type=event_type, payload=payload)
+    transaction.on_commit(_schedule_dispatch)
+    return event
+
+
+def _schedule_dispatch() -> None:
+    from jobs.queue import enqueue
+    from .jobs import dispatch_order_events
+
+    try:
+        enqueue(dispatch_order_events, dedup_key='orders.dispatch_order_events')
+    except Exception:
+        # The sweeper of the dispatch_order_events command delivers the event.
+        logger.exception('Failed to queue order events dispatch')
+
+
+def _schedule_retry(run_at) -> None:
+    from jobs.models import Job
+    from jobs.queue import enqueue
+    from .jobs import dispatch_order_events
+
+    try:
+        retry = enqueue(dispatch_order_events, run_at=run_at, dedup_key='orders.dispatch_order_events.retry')
+        Job.objects.filter(pk=retry.pk, status=Job.Status.PENDING, run_at__gt=run_at).update(run_at=run_at)
+    except Exception:
+        # The sweeper of the dispatch_order_events command delivers the event.
+        logger.exception('Failed to queue order events dispatch retry')
+
+
+class CallbackHandler:
+    """
+    Handler that calls in-process callbacks.
+
+    Methods:
+        subscribe: Register callback.
+        handle: Call callbacks subscribed to the event type.
+    """
+    callbacks: list[tuple[Callable, tuple | None]] = []
+
+    @classmethod
+    def subscribe(cls, callback: Callable, event_types: tuple = None) -> Callable:
+        """
+        Register callback.
+
+        Args:
+            callback: Callable that takes the event.
+            event_types: Event types of the callback. All events are passed if not given.
+
+        Returns:
+            Callable: The callback, so the method can be used as a decorator.
+        """
+        cls.callbacks.append((callback, event_types))
+        return callback
+
+    def handle(self, event: OrderEvent) -> None:
+        for callback, event_types in self.callbacks:
+            if event_types is None or event.type in event_types:
+                callback(event)
+
+
+class WebhookHandler:
+    """
+    Handler that posts events as JSON to ORDER_EVENT_WEBHOOK_URL.
+
+    Without the URL the handler only logs the events, which is useful as
+    a stub of an external consumer.
+
+    Methods:
+        handle: Post event to the webhook.
+    """
+    def handle(self, event: OrderEvent) -> None:
+        url = settings.ORDER_EVENT_WEBHOOK_URL
+        body = serialize_event(event)
+        if not url:
+            logger.info('Order event webhook stub: %s', body)
+            return
+        import urllib.request
+
+        request = urllib.request.Request(
+            url,
+            data=body.encode(),
+            headers={'Content-Type': 'application/json', 'Idempotency-Key': str(event.pk)},
+        )
+        with urllib.request.urlopen(request, timeout=settings.ORDER_EVENT_WEBHOOK_TIMEOUT) as response:
+            if response.status >= 300:
+                raise RuntimeError(f'Webhook returned status {response.status}')
+
+
+class FileHandler:
+    """
+    Handler that appends events as JSON lines to ORDER_EVENT_FILE.
+
+    Methods:
+        handle: Append event to the file.
+    """
+    def handle(self, event: OrderEvent) -> None:
+        with open(settings.ORDER_EVENT_FILE, 'a', encoding='utf-8') as file:
+            file.write(serialize_event(event) + '\n')
+
+
+def serialize_event(event: OrderEvent) -> str:
+    """
+    Serialize event to JSON.
+
+    Args:
+        event: Order event.
+
+    Returns:
+        str: JSON document.
+    """
+    return json.dumps({
+        'id': event.pk,
+        'type': event.type,
+        'created': event.created,
+        'payload': event.payload,
+    }, cls=DjangoJSONEncoder)
+
+
+_handlers = None
+_handlers_lock = threading.Lock()
+
+
+def get_handlers() -> list:
+    """
+    Get handler instances from ORDER_EVENT_HANDLERS.
+
+    Returns:
+        list: Event handlers.
+    """
+    global _handlers
+    with _handlers_lock:
+        if _handlers is None:
+            _handlers = [import_string(path)() for path in settings.ORDER_EVENT_HANDLERS]
+        return _handlers
+
+
+def dispatch_events(batch_size: int = None) -> int:
+    """
+    Deliver one batch of events to the handlers.
+
+    Only one dispatcher delivers events at a time, so the order of delivery
+    is kept across processes. If another dispatcher is running, a delayed
+    dispatch is queued and nothing is delivered.
+
+    Args:
+        batch_size: Maximum number of delivered events. Defaults to ORDER_EVENT_BATCH_SIZE.
+
+    Returns:
+        int: Number of delivered events.
+    """
+    batch_size = batch_size or settings.ORDER_EVENT_BATCH_SIZE
+    token = uuid4().hex
+    if not _acquire_lock(token):
+        # The running dispatcher may have read its batch before the new events.
+        _schedule_retry(timezone.now() + timedelta(seconds=settings.ORDER_EVENT_RETRY_DELAY))
+        return 0
+    try:
+        return _dispatch_batch(batch_size, token)
+    finally:
+        OutboxLock.objects.filter(name=_LOCK_NAME, owner=token).update(owner='', expires=None)
+
+
+def _acquire_lock(token: str) -> bool:
+    now = timezone.now()
+    OutboxLock.objects.get_or_create(name=_LOCK_NAME)
+    return bool(OutboxLock.objects.filter(Q(owner='') | Q(expires__lt=now), name=_LOCK_NAME).update(
+        owner=token,
+        expires=now + timedelta(seconds=settings.ORDER_EVENT_LOCK_TIMEOUT),
+    ))
+
+
+def _extend_lock(token: str) -> bool:
+    return bool(OutboxLock.objects.filter(name=_LOCK_NAME, owner=token).update(
+        expires=timezone.now() + timedelta(seconds=settings.ORDER_EVENT_LOCK_TIMEOUT),
+    ))
+
+
+def _dispatch_batch(batch_size: int, token: str) -> int:
+    now = timezone.now()
+    events = list(OrderEvent.objects.filter(dispatched__isnull=True).order_by('pk')[:batch_size])
+    if events and events[0].retry_at and events[0].retry_at > now:
+        _schedule_retry(events[0].retry_at)
+        events = []
+    if not events:
+        dispatcher_metrics['lastBatchSize'] = 0
+        return 0
+
+    delivered = []
+    handlers = get_handlers()
+    for event in events:
+        if not _extend_lock(token):
+            logger.warning('Order events dispatcher lost the lock after %s events', len(delivered))
+            break
+        try:
+            for handler in handlers:
+                handler.handle(event)
+        except Exception as error:
+            logger.exception('Failed to dispatch order event %s', event.pk)
+            event.attempts += 1
+            delay = min(settings.ORDER_EVENT_RETRY_DELAY * 2 ** (event.attempts - 1), 60 * 60)
+            retry_at = timezone.now() + timedelta(seconds=delay)
+            OrderEvent.objects.filter(pk=event.pk).update(attempts=event.attempts, retry_at=retry_at, error=repr(error))
+            _schedule_retry(retry_at)
+            dispatcher_metrics['failed'] += 1
+            break
+        delivered.append(event)
+
+    if delivered:
+        dispatched = timezone.now()
+        OrderEvent.objects.filter(pk__in=[event.pk for event in delivered]).update(
+            dispatched=dispatched,
+            retry_at=None,
+            error='',
+        )
+        dispatcher_metrics['dispatched'] += len(delivered)
+        dispatcher_metrics['lastLag'] = (dispatched - delivered[0].created).total_seconds()
+    dispatcher_metrics['lastBatchSize'] = len(delivered)
+    return len(delivered)
+
+
+def get_outbox_metrics() -> dict:
+    """
+    Get outbox metrics.
+
+    Returns:
+        dict: Dispatcher counters of the current process, number of pending
+        events and the age of the oldest pending event (dispatch lag) in seconds.
+    """
+    oldest = OrderEvent.objects.filter(dispatched__isnull=True).order_by('pk').values_list('created', flat=True).first()
+    return {
+        **dispatcher_metrics,
+        'pending': OrderEvent.objects.filter(dispatched__isnull=True).count(),
+        'lag': (timezone.now() - oldest).total_seconds() if oldest else 0.0,
+    }
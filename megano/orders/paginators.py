@@ -0,0 +1,39 @@
+"""
+Paginators for orders app views.
+"""
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class OrderHistoryPaginator(CursorPagination):
+    """
+    Cursor paginator for the user order history.
+
+    Pages are read through the (user, -date) index, so the cost of a page
+    does not depend on how deep the customer scrolled.
+
+    Attributes:
+        ordering: Order history ordering.
+        page_size: Default page size.
+        page_size_query_param: Which query param used as page size.
+        max_page_size: Max page size.
+
+    Methods:
+        get_paginated_response: Get response with paginated data and the next page link.
+    """
+    ordering = '-date'
+    page_size = 20
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+    def get_paginated_response(self, data: list):
+        """
+        Get response with paginated data.
+
+        Returns:
+            Response: response with data.
+        """
+        return Response({
+            'items': data,
+            'next': self.get_next_link(),
+        })
@@ -0,0 +1,257 @@
+"""
+Background payment processing.
+
+PaymentView stores the submitted card as a pending Payment and returns at
+once. Payments are authorized off the request path by a pool of worker
+threads that calls the payment provider and then accepts or declines the
+order. The Payment row is the queue entry: a worker claims it with
+a conditional update, so every payment is processed once even when the web
+processes and the process_payments command work at the same time.
+
+Attributes:
+    provider: Payment provider used by the workers.
+    payment_queue: Worker pool of the current process.
+"""
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from users.models import Payment
+from .inventory import OutOfStock, confirm_reservations, release_reservations
+from .outbox import ORDER_DECLINED, ORDER_PAID, record_order_event
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentDeclined(Exception):
+    """
+    Raised by the payment provider when the payment is declined.
+    """
+
+
+class StubPaymentProvider:
+    """
+    Local payment provider used instead of a real payment system.
+
+    Cards with numbers that end with zero are accepted, the others are
+    declined. Every call takes PAYMENT_PROVIDER_LATENCY seconds and fails
+    with PAYMENT_PROVIDER_FAILURE_RATE probability.
+
+    Methods:
+        authorize: Authorize payment.
+    """
+    def authorize(self, payment: Payment) -> None:
+        """
+        Authorize payment.
+
+        Args:
+            payment: Payment with the card data.
+
+        Raises:
+            PaymentDeclined: If the payment is declined.
+        """
+        time.sleep(settings.PAYMENT_PROVIDER_LATENCY)
+        if random.random() < settings.PAYMENT_PROVIDER_FAILURE_RATE:
+            raise PaymentDeclined('provider_unavailable')
+        if not str(payment.number).endswith('0'):
+            raise PaymentDeclined('card_declined')
+
+
+provider = StubPaymentProvider()
+
+
+def process_payment(payment_id: int) -> int | None:
+    """
+    Authorize pending payment and accept or decline its order.
+
+    The result is only applied if the payment is still held by this claim,
+    so a payment requeued while it was being authorized is not applied twice.
+    Payments of orders that are already paid are declined without calling
+    the payment provider.
+
+    Args:
+        payment_id: Payment primary key.
+
+    Returns:
+        int | None: Final payment status or None if the payment was claimed by another worker.
+    """
+    claimed_at = timezone.now()
+    claimed = Payment.objects.filter(pk=payment_id, status=Payment.Status.PENDING).update(
+        status=Payment.Status.PROCESSING,
+        claimed=claimed_at,
+    )
+    if not claimed:
+        return None
+    payment = Payment.objects.select_related('order').get(pk=payment_id)
+    order = payment.order
+    if order.status == 2:
+        payment.error = 'already_paid'
+    else:
+        try:
+            provider.authorize(payment)
+        except PaymentDeclined as error:
+            payment.error = str(error)
+
+    with transaction.atomic():
+        current = Payment.objects.select_for_update().filter(
+            pk=payment_id,
+            status=Payment.Status.PROCESSING,
+            claimed=claimed_at,
+        )
+        if not current.exists():
+            return None
+        order.refresh_from_db(fields=['status'])
+        if order.status == 2:
+            payment.error = payment.error or 'already_paid'
+            payment.status = Payment.Status.FAILED
+            payment.processed = timezone.now()
+            payment.save(update_fields=['status', 'error', 'processed'])
+            return payment.status
+        if not payment.error:
+            try:
+                confirm_reservations(order)
+            except OutOfStock:
+                payment.error = 'out_of_stock'
+        if payment.error:
+            release_reservations(order)
+        order.status = 1 if payment.error else 2
+        order.save(update_fields=['status'])
+        payment.status = Payment.Status.FAILED if payment.error else Payment.Status.SUCCEEDED
+        payment.processed = timezone.now()
+        payment.save(update_fields=['status', 'error', 'processed'])
+        if payment.error:
+            record_order_event(order, ORDER_DECLINED, paymentId=payment.pk, paymentError=payment.error)
+        else:
+            record_order_event(order, ORDER_PAID, paymentId=payment.pk)
+    return payment.status
+
+
+def requeue_stalled_payments() -> int:
+    """
+    Return payments left in processing by a stopped worker to the queue.
+
+    Returns:
+        int: Number of returned payments.
+    """
+    stalled_before = timezone.now() - timedelta(seconds=settings.PAYMENT_PROCESSING_TIMEOUT)
+    return Payment.objects.filter(status=Payment.Status.PROCESSING, claimed__lt=stalled_before).update(
+        status=Payment.Status.PENDING,
+    )
+
+
+def get_pending_payment_ids(limit: int) -> list[int]:
+    """
+    Get the oldest pending payments.
+
+    Args:
+        limit: Maximum number of payments.
+
+    Returns:
+        list: Payment primary keys.
+    """
+    payments = Payment.objects.filter(status=Payment.Status.PENDING, order__isnull=False).order_by('pk')
+    return list(payments.values_list('pk', flat=True)[:limit])
+
+
+class PaymentQueue:
+    """
+    Pool of payment worker threads with throughput and queue depth metrics.
+
+    Methods:
+        submit: Queue payment for processing.
+        drain: Wait until all queued payments are processed.
+        metrics: Get worker metrics.
+    """
+    def __init__(self, workers: int = None):
+        self.workers = settings.PAYMENT_WORKERS if workers is None else workers
+        self._lock = threading.Lock()
+        self._executor = None
+        self._queued = 0
+        self._in_flight = 0
+        self._succeeded = 0
+        self._failed = 0
+        self._finished = deque()
+
+    def submit(self, payment_id: int) -> bool:
+        """
+        Queue payment for processing.
+
+        Args:
+            payment_id: Payment primary key.
+
+        Returns:
+            bool: Whether the payment was queued in this process.
+        """
+        if not self.workers:
+            return False
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='payment-worker')
+            self._queued += 1
+            self._executor.submit(self._run, payment_id)
+        return True
+
+    def drain(self) -> None:
+        """
+        Wait until all queued payments are processed.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _run(self, payment_id: int) -> None:
+        with self._lock:
+            self._queued -= 1
+            self._in_flight += 1
+        payment_status = None
+        try:
+            payment_status = process_payment(payment_id)
+        except Exception:
+            logger.exception('Failed to process payment %s', payment_id)
+        finally:
+            close_old_connections()
+            with self._lock:
+                self._in_flight -= 1
+                if payment_status is not None:
+                    self._finished.append(time.monotonic())
+                    if payment_status == Payment.Status.SUCCEEDED:
+                        self._succeeded += 1
+                    else:
+                        self._failed += 1
+
+    def metrics(self) -> dict:
+        """
+        Get worker metrics.
+
+        Returns:
+            dict: Worker counters, queue depth and throughput over PAYMENT_METRICS_WINDOW seconds.
+        """
+        window = settings.PAYMENT_METRICS_WINDOW
+        with self._lock:
+            while self._finished and self._finished[0] < time.monotonic() - window:
+                self._finished.popleft()
+            metrics = {
+                'workers': self.workers,
+                'queued': self._queued,
+                'inFlight': self._in_flight,
+                'succeeded': self._succeeded,
+                'failed': self._failed,
+                'throughput': len(self._finished) / window,
+            }
+        metrics['pending'] = Payment.objects.filter(
+            status=Payment.Status.PENDING,
+            order__isnull=False,
+        ).count()
+        return metrics
+
+
+payment_queue = PaymentQueue()
@@ -1,62 +1,52 @@
 from rest_framework import serializers
-from rest_framework.fields import empty
 
-from products.serializers import TagSerializer, ProductSerializer
-from products.models import Product
+from products.serializers import ProductSerializer
 from users.views import get_setting
-from .models import Order
+from .models import Order, OrderItem
 
-class OrderProductSerializer(serializers.ModelSerializer):
+class CheckoutItemSerializer(serializers.Serializer):
     """
-    Serializer for products that was added to orders.
+    Serializer for basket products sent to the checkout.
+
+    Other product fields sent by the client are ignored, the current product
+    data is taken from the database.
 
     Attributes:
-        tags: Tags serializer.
-        reviews: Number of product reviews that defined by method.
+        id: Product primary key.
+        count: Number of ordered items.
+    """
+    id = serializers.IntegerField()
+    count = serializers.IntegerField(min_value=1)
+
+
+class OrderItemSerializer(serializers.ModelSerializer):
+    """
+    Serializer for order lines represented as products.
 
     Methods:
-        get_reviews: Get number of reviews on product instance.
-        create: Add product to current order.
+        to_representation: Represent line as a product with ordered count and price.
 
     Meta:
         model: Model of serializer.
         fields: Array of representing fields.
-
     """
-    tags = TagSerializer(many=True)
-    reviews = serializers.SerializerMethodField()
-
     class Meta:
-        model = Product
-        fields = ('id', 'category', 'price', 'count', 'date',
-                  'title', 'description', 'freeDelivery', 'tags',
-                  'reviews', 'rating')
-
-    def __init__(self, create_order=False, instance=None, data=empty, **kwargs):
-        if create_order:
-            self.order = Order.objects.create()
-        super().__init__(instance, data, **kwargs)
-
-    @classmethod
-    def get_reviews(cls, instance):
-        return instance.reviews.count()
+        model = OrderItem
+        fields = 'product', 'count', 'price'
 
-    def create(self, validated_data) -> int:
-        title, description = validated_data.get('title'), validated_data.get('description')
-        product = Product.objects.get(title=title, description=description)
-        product.count = validated_data.get('count')
-        product.save()
-        self.order.products.add(product)
-        self.order.save()
-        return self.order.id
+    def to_representation(self, instance):
+        data = ProductSerializer(instance.product).data
+        data['count'] = instance.count
+        data['price'] = self.fields['price'].to_representation(instance.price)
+        return data
 
-    def delete_order(self):
-        self.order.delete()
 
-
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSummarySerializer(serializers.ModelSerializer):
     """
-    Serializer for Order model.
+    Lightweight serializer for the order history.
+
+    Reads the stored order total and the item_count annotation when it is
+    present, so a page of orders is serialized without loading the order lines.
 
     Attributes:
         createdAt: Order creation date.
@@ -64,7 +54,7 @@ class OrderSerializer(serializers.ModelSerializer):
         paymentType: Payment type.
         totalCost: Total cost of order's items.
         status: Order status.
-        products: Order items.
+        itemCount: Number of ordered items.
 
     Meta:
         model: Model of serializer.
@@ -74,24 +64,20 @@ class OrderSerializer(serializers.ModelSerializer):
         get_created_at: Get creation date as a string.
         get_delivery_type: Get delivery type as a string.
         get_payment_type: Get payment type as a string.
-        get_total_cost: Get cost of order items.
+        get_total_cost: Get stored order total cost.
         get_status: Get product status as a string.
+        get_item_count: Get number of ordered items.
     """
     createdAt = serializers.SerializerMethodField(method_name='get_created_at')
     deliveryType = serializers.SerializerMethodField(method_name='get_delivery_type')
     paymentType = serializers.SerializerMethodField(method_name='get_payment_type')
     totalCost = serializers.SerializerMethodField(method_name='get_total_cost')
     status = serializers.SerializerMethodField()
-    products = ProductSerializer(many=True, read_only=True)
+    itemCount = serializers.SerializerMethodField(method_name='get_item_count')
 
     class Meta:
         model = Order
-        fields = (
-            'id', 'createdAt', 'fullName', 'email',
-            'phone', 'deliveryType', 'paymentType',
-            'totalCost', 'status', 'city', 'address',
-            'products'
-        )
+        fields = 'id', 'createdAt', 'deliveryType', 'paymentType', 'totalCost', 'status', 'itemCount'
 
     @classmethod
     def get_created_at(cls, instance):
@@ -107,16 +93,19 @@ class OrderSerializer(serializers.ModelSerializer):
 
     @classmethod
     def get_total_cost(cls, instance):
+        if instance.totalCost is not None:
+            return float(instance.totalCost)
+        # Totals of the orders created before they were stored.
         total_cost = 0
-        for product in instance.products.all():
-            total_cost += float(product.price * product.count)
+        for item in instance.items.all():
+            total_cost += float(item.price * item.count)
         if instance.deliveryType == 1:
-            total_cost += get_setting('express_delivery_price', default=5)
+            total_cost += float(get_setting('express_delivery_price'))
         else:
 
-            free_delivery_min_price = get_setting('free_delivery_min_price', default=20)
+            free_delivery_min_price = float(get_setting('free_delivery_min_price'))
             if total_cost <= free_delivery_min_price:
-                delivery_price = get_setting('default_delivery_price', default=2)
+                delivery_price = float(get_setting('default_delivery_price'))
                 total_cost += delivery_price
         return total_cost
 
@@ -129,6 +118,35 @@ class OrderSerializer(serializers.ModelSerializer):
         else:
             return 'Accepted'
 
+    @classmethod
+    def get_item_count(cls, instance):
+        if hasattr(instance, 'item_count'):
+            return instance.item_count or 0
+        return sum(item.count for item in instance.items.all())
+
+
+class OrderSerializer(OrderSummarySerializer):
+    """
+    Serializer for Order model with the ordered products.
+
+    Attributes:
+        products: Order lines.
+
+    Meta:
+        model: Model of serializer.
+        fields: Array of representing fields.
+    """
+    products = OrderItemSerializer(source='items', many=True, read_only=True)
+
+    class Meta:
+        model = Order
+        fields = (
+            'id', 'createdAt', 'fullName', 'email',
+            'phone', 'deliveryType', 'paymentType',
+            'totalCost', 'status', 'city', 'address',
+            'products'
+        )
+
     def update(self, instance, validated_data):
         delivery_type = validated_data.get('deliveryType')
         validated_data['deliveryType'] = 0 if delivery_type == 'ordinary' else 1
@@ -0,0 +1,431 @@
+"""
+Orders app tests.
+"""
+import asyncio
+import random
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from jobs.models import Job
+from products.models import Category, Product
+from users.models import Payment, Profile, SiteSetting
+from users.site_settings import site_settings
+from . import outbox, payments
+from .management.commands.load_test import STEPS, Shopper, WSGITarget
+from .inventory import release_expired_reservations
+from .misc import checkout, update_order_totals
+from .models import Order, OrderEvent, OutboxLock, StockReservation
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def create_product(title: str, price: int = 10, **kwargs) -> Product:
+    return Product.objects.create(title=title, description=title, fullDescription=title, price=price, **kwargs)
+
+
+def create_payment(order: Order, **kwargs) -> Payment:
+    return Payment.objects.create(number=1110, name='Ivan', month='01', year='2030', code='123', order=order, **kwargs)
+
+
+def bind_guest_order(client: Client, order: Order) -> None:
+    session = client.session
+    session[settings.GUEST_ORDERS_SESSION_ID] = [order.pk]
+    session.save()
+
+
+class CheckoutTests(TestCase):
+    """
+    Tests of the order checkout.
+    """
+    def setUp(self):
+        self.phone = create_product('Phone', 100)
+        self.case = create_product('Case', 5)
+
+    def place_order(self, items: list[dict]):
+        return self.client.post('/api/orders', items, content_type='application/json')
+
+    def test_order_lines_keep_checkout_prices(self):
+        response = self.place_order([
+            {'id': self.phone.pk, 'count': 1},
+            {'id': self.case.pk, 'count': 2},
+            {'id': self.phone.pk, 'count': 1},
+        ])
+        order = Order.objects.get(pk=response.json()['orderId'])
+        Product.objects.filter(pk=self.phone.pk).update(price=200)
+        lines = {item.product_id: (item.count, item.price) for item in order.items.all()}
+        self.assertEqual(lines, {self.phone.pk: (2, 100), self.case.pk: (2, 5)})
+
+    def test_unknown_product_creates_nothing(self):
+        response = self.place_order([{'id': self.phone.pk, 'count': 1}, {'id': 0, 'count': 1}])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderEvent.objects.exists())
+
+    def test_queries_do_not_grow_with_order_lines(self):
+        products = [create_product(f'Product {number}') for number in range(10)]
+        # The first order loads the site settings and queues the events dispatch.
+        self.place_order([{'id': self.case.pk, 'count': 1}])
+        with CaptureQueriesContext(connection) as one_line:
+            self.place_order([{'id': self.phone.pk, 'count': 1}])
+        with CaptureQueriesContext(connection) as many_lines:
+            self.place_order([{'id': product.pk, 'count': 1} for product in products])
+        self.assertEqual(len(many_lines), len(one_line))
+
+
+class StockReservationTests(TestCase):
+    """
+    Tests of the stock held for unpaid orders.
+    """
+    def setUp(self):
+        self.phone = create_product('Phone', stock=5)
+        self.case = create_product('Case', stock=1)
+        patcher = mock.patch.object(payments.provider, 'authorize')
+        self.authorize = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def place_order(self, **counts) -> Order:
+        products = {'phone': self.phone, 'case': self.case}
+        return checkout([{'id': products[name].pk, 'count': count} for name, count in counts.items()])
+
+    def stock(self, product: Product) -> tuple[int, bool]:
+        product.refresh_from_db()
+        return product.stock, product.available
+
+    def expire_reservations(self) -> None:
+        StockReservation.objects.update(expires=timezone.now() - timedelta(seconds=1))
+
+    def test_checkout_holds_stock(self):
+        order = self.place_order(phone=3, case=1)
+        self.assertEqual(self.stock(self.phone), (2, True))
+        self.assertEqual(self.stock(self.case), (0, False))
+        self.assertEqual(dict(order.reservations.values_list('product_id', 'count')),
+                         {self.phone.pk: 3, self.case.pk: 1})
+
+    def test_out_of_stock_takes_nothing(self):
+        response = self.client.post('/api/orders', [
+            {'id': self.phone.pk, 'count': 3}, {'id': self.case.pk, 'count': 2},
+        ], content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json(), {'outOfStock': [self.case.pk]})
+        self.assertEqual(self.stock(self.phone), (5, True))
+        self.assertFalse(Order.objects.exists())
+
+    def test_expired_holds_are_released(self):
+        self.place_order(phone=2, case=1)
+        self.place_order(phone=1)
+        self.expire_reservations()
+        self.assertEqual(release_expired_reservations(batch_size=2), 2)
+        self.assertEqual(release_expired_reservations(), 1)
+        self.assertEqual(self.stock(self.phone), (5, True))
+        self.assertEqual(self.stock(self.case), (1, True))
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_payment_confirms_hold(self):
+        order = self.place_order(phone=2)
+        payments.process_payment(create_payment(order).pk)
+        self.assertEqual(self.stock(self.phone), (3, True))
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_declined_payment_releases_hold(self):
+        order = self.place_order(phone=2)
+        self.authorize.side_effect = payments.PaymentDeclined('card_declined')
+        payments.process_payment(create_payment(order).pk)
+        self.assertEqual(self.stock(self.phone), (5, True))
+
+    def test_payment_after_expiry_takes_stock_again(self):
+        order = self.place_order(case=1)
+        self.expire_reservations()
+        release_expired_reservations()
+        payments.process_payment(create_payment(order).pk)
+        self.assertEqual(self.stock(self.case), (0, False))
+
+    def test_payment_after_expiry_fails_when_stock_is_gone(self):
+        order = self.place_order(case=1)
+        self.expire_reservations()
+        release_expired_reservations()
+        self.place_order(case=1)
+        payment = create_payment(order)
+        self.assertEqual(payments.process_payment(payment.pk), Payment.Status.FAILED)
+        self.assertEqual(Payment.objects.get(pk=payment.pk).error, 'out_of_stock')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class OrderTotalsTests(TestCase):
+    """
+    Tests of the stored order totals.
+    """
+    def setUp(self):
+        self.product = create_product('Phone', 10)
+
+    def place_order(self, count: int, **fields) -> Order:
+        order = checkout([{'id': self.product.pk, 'count': count}])
+        Order.objects.filter(pk=order.pk).update(**fields)
+        update_order_totals(Order.objects.filter(pk=order.pk))
+        order.refresh_from_db()
+        return order
+
+    def totals(self, order: Order) -> tuple:
+        return order.subtotal, order.deliveryCost, order.totalCost
+
+    def test_ordinary_delivery_is_paid_below_minimum(self):
+        self.assertEqual(self.totals(self.place_order(1)), (10, 2, 12))
+
+    def test_ordinary_delivery_is_free_above_minimum(self):
+        self.assertEqual(self.totals(self.place_order(3)), (30, 0, 30))
+
+    def test_express_delivery_has_fixed_price(self):
+        self.assertEqual(self.totals(self.place_order(3, deliveryType=1)), (30, 5, 35))
+
+    def test_delivery_price_follows_site_settings(self):
+        # The rollback of the test doesn't invalidate the registry.
+        self.addCleanup(site_settings.invalidate)
+        with self.captureOnCommitCallbacks(execute=True):
+            SiteSetting.objects.create(key='default_delivery_price', value='4')
+        self.assertEqual(self.totals(self.place_order(1)), (10, 4, 14))
+
+    def test_backfill_fills_missing_totals(self):
+        order = self.place_order(1)
+        Order.objects.filter(pk=order.pk).update(subtotal=None, deliveryCost=None, totalCost=None)
+        call_command('backfill_order_totals', batch_size=1, stdout=StringIO())
+        order.refresh_from_db()
+        self.assertEqual(self.totals(order), (10, 2, 12))
+
+
+class GuestOrderTests(TestCase):
+    """
+    Tests of the access to the orders of anonymous visitors.
+    """
+    def setUp(self):
+        product = Product.objects.create(title='Phone', description='Phone', fullDescription='Phone', price=10)
+        response = self.client.post('/api/orders', [{'id': product.pk, 'count': 1}], content_type='application/json')
+        self.order = Order.objects.get(pk=response.json()['orderId'])
+        self.url = f'/api/order/{self.order.pk}'
+        self.user = User.objects.create_user('buyer', password='secret')
+
+    def confirm(self, client: Client):
+        return client.post(self.url, {'city': 'Moscow'}, content_type='application/json')
+
+    def test_order_is_available_to_its_session(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_order_is_hidden_from_other_visitors(self):
+        self.assertEqual(Client().get(self.url).status_code, 404)
+
+    def test_other_user_cannot_take_order(self):
+        intruder = Client()
+        intruder.force_login(User.objects.create_user('intruder'))
+        self.assertEqual(self.confirm(intruder).status_code, 404)
+        self.order.refresh_from_db()
+        self.assertIsNone(self.order.user_id)
+
+    def test_visitor_who_logged_in_gets_order(self):
+        self.client.login(username='buyer', password='secret')
+        self.assertEqual(self.confirm(self.client).status_code, 200)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.user, self.user)
+
+
+class OrderHistoryTests(TestCase):
+    """
+    Tests of the cursor-paginated order history.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user('buyer')
+        product = create_product('Phone')
+        now = timezone.now()
+        self.order_ids = []
+        for number in range(5):
+            order = checkout([{'id': product.pk, 'count': number + 1}], Profile(user=self.user))
+            Order.objects.filter(pk=order.pk).update(date=now - timedelta(days=number))
+            self.order_ids.append(order.pk)
+        Order.objects.create(user=User.objects.create_user('other'))
+        self.client.force_login(self.user)
+
+    def test_pages_follow_cursor(self):
+        response = self.client.get('/api/orders', {'limit': 2}).json()
+        items = response['items']
+        while response['next']:
+            response = self.client.get(response['next']).json()
+            items.extend(response['items'])
+        self.assertEqual([item['id'] for item in items], self.order_ids)
+        self.assertEqual([item['itemCount'] for item in items], [1, 2, 3, 4, 5])
+
+    def test_history_is_hidden_from_visitors(self):
+        self.assertEqual(Client().get('/api/orders').status_code, 403)
+
+
+class ProcessPaymentTests(TestCase):
+    """
+    Tests of the background payment processing.
+    """
+    def setUp(self):
+        self.order = Order.objects.create()
+        self.payment = create_payment(self.order)
+        patcher = mock.patch.object(payments.provider, 'authorize')
+        self.authorize = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_accepts_order(self):
+        self.assertEqual(payments.process_payment(self.payment.pk), Payment.Status.SUCCEEDED)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 2)
+        self.assertEqual(list(OrderEvent.objects.values_list('type', flat=True)), ['order.paid'])
+
+    def test_declined_payment_declines_order(self):
+        self.authorize.side_effect = payments.PaymentDeclined('card_declined')
+        self.assertEqual(payments.process_payment(self.payment.pk), Payment.Status.FAILED)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 1)
+        self.assertEqual(Payment.objects.get(pk=self.payment.pk).error, 'card_declined')
+
+    def test_claimed_payment_is_skipped(self):
+        self.assertEqual(payments.process_payment(self.payment.pk), Payment.Status.SUCCEEDED)
+        self.assertIsNone(payments.process_payment(self.payment.pk))
+        self.authorize.assert_called_once()
+
+    def test_payment_being_authorized_is_not_requeued(self):
+        def authorize(payment):
+            self.assertEqual(payments.requeue_stalled_payments(), 0)
+
+        self.authorize.side_effect = authorize
+        self.assertEqual(payments.process_payment(self.payment.pk), Payment.Status.SUCCEEDED)
+
+    def test_requeued_payment_is_applied_once(self):
+        def authorize(payment):
+            # The worker stalls, the payment is requeued and processed by another worker.
+            self.authorize.side_effect = None
+            Payment.objects.filter(pk=payment.pk).update(claimed=timezone.now() - timedelta(hours=1))
+            self.assertEqual(payments.requeue_stalled_payments(), 1)
+            self.assertEqual(payments.process_payment(payment.pk), Payment.Status.SUCCEEDED)
+
+        self.authorize.side_effect = authorize
+        self.assertIsNone(payments.process_payment(self.payment.pk))
+        self.assertEqual(OrderEvent.objects.filter(type='order.paid').count(), 1)
+
+    def test_payment_of_paid_order_is_declined(self):
+        payments.process_payment(self.payment.pk)
+        second = create_payment(self.order)
+        self.assertEqual(payments.process_payment(second.pk), Payment.Status.FAILED)
+        self.assertEqual(Payment.objects.get(pk=second.pk).error, 'already_paid')
+        self.authorize.assert_called_once()
+
+
+@override_settings(PAYMENT_STATUS_POLL_INTERVAL=0.01, PAYMENT_STATUS_MAX_WAIT=0.1)
+class PaymentStatusViewTests(TestCase):
+    """
+    Tests of the payment status long polling.
+    """
+    def setUp(self):
+        self.order = Order.objects.create()
+        create_payment(self.order, status=Payment.Status.PROCESSING)
+        bind_guest_order(self.client, self.order)
+        self.url = f'/api/payment/{self.order.pk}/status'
+
+    def test_returns_current_status(self):
+        response = self.client.get(self.url, {'wait': '-5'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'processing')
+
+    def test_wait_is_capped(self):
+        response = self.client.get(self.url, {'wait': '1e9'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_rejects_invalid_wait(self):
+        for wait in ('nan', 'inf', '-inf', 'soon'):
+            with self.subTest(wait=wait):
+                self.assertEqual(self.client.get(self.url, {'wait': wait}).status_code, 400)
+
+
+class RecordingHandler:
+    def __init__(self, fail_on: int = None):
+        self.events = []
+        self.fail_on = fail_on
+
+    def handle(self, event: OrderEvent) -> None:
+        if event.pk == self.fail_on:
+            raise RuntimeError('Handler is down')
+        self.events.append(event.pk)
+
+
+class OutboxDispatchTests(TestCase):
+    """
+    Tests of the order events dispatcher.
+    """
+    def setUp(self):
+        order = Order.objects.create()
+        self.events = [outbox.record_order_event(order, outbox.ORDER_CREATED).pk for _ in range(3)]
+        self.handler = RecordingHandler()
+        patcher = mock.patch.object(outbox, '_handlers', [self.handler])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def retry_jobs(self):
+        return Job.objects.filter(dedup_key='orders.dispatch_order_events.retry', status=Job.Status.PENDING)
+
+    def test_delivers_events_in_order(self):
+        self.assertEqual(outbox.dispatch_events(), 3)
+        self.assertEqual(self.handler.events, self.events)
+        self.assertFalse(OrderEvent.objects.filter(dispatched__isnull=True).exists())
+        self.assertEqual(OutboxLock.objects.get().owner, '')
+
+    def test_failed_event_blocks_following_and_is_retried(self):
+        self.handler.fail_on = self.events[1]
+        with self.assertLogs('orders.outbox', 'ERROR'):
+            self.assertEqual(outbox.dispatch_events(), 1)
+        self.assertEqual(self.handler.events, self.events[:1])
+        failed = OrderEvent.objects.get(pk=self.events[1])
+        self.assertEqual(failed.attempts, 1)
+        self.assertEqual(self.retry_jobs().get().run_at, failed.retry_at)
+        # The event is not due yet, the dispatch keeps the single retry job.
+        self.assertEqual(outbox.dispatch_events(), 0)
+        self.assertEqual(self.retry_jobs().count(), 1)
+
+    def test_busy_dispatcher_queues_retry(self):
+        OutboxLock.objects.create(name=outbox._LOCK_NAME, owner='other', expires=timezone.now() + timedelta(minutes=1))
+        self.assertEqual(outbox.dispatch_events(), 0)
+        self.assertEqual(self.handler.events, [])
+        self.assertEqual(self.retry_jobs().count(), 1)
+
+    def test_expired_lock_is_taken_over(self):
+        OutboxLock.objects.create(name=outbox._LOCK_NAME, owner='other', expires=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(outbox.dispatch_events(), 3)
+
+    def test_batch_stops_when_lock_is_lost(self):
+        def handle(event):
+            OutboxLock.objects.update(owner='other')
+            self.handler.events.append(event.pk)
+
+        self.handler.handle = handle
+        with self.assertLogs('orders.outbox', 'WARNING'):
+            self.assertEqual(outbox.dispatch_events(), 1)
+        self.assertEqual(OutboxLock.objects.get().owner, 'other')
+
+
+# The in-process target sends requests to localhost.
+@override_settings(CACHES=LOCMEM_CACHES, ALLOWED_HOSTS=['localhost'])
+class LoadTestShopperTests(TransactionTestCase):
+    """
+    Tests of the load test shopper flow.
+    """
+    def test_shopper_completes_flow(self):
+        category = Category.objects.create(title='Phones')
+        for number in range(3):
+            create_product(f'Phone {number}', category=category)
+        target = WSGITarget(threads=2)
+        self.addCleanup(target.close)
+        stats, order_ids = {}, []
+        shopper = Shopper(target, random.Random(1), stats, set(), think_time=0, order_ids=order_ids)
+        with mock.patch.object(payments.payment_queue, 'submit') as submit:
+            asyncio.run(shopper.run())
+        self.assertEqual({step: stats[step].errors for step in stats}, dict.fromkeys(STEPS, 0))
+        self.assertEqual(len(order_ids), 1)
+        submit.assert_called_once()
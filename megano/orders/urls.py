@@ -6,10 +6,13 @@ Attributes:
 """
 from django.urls import path
 
-from .views import OrdersView, GetConfirmOrderView, PaymentView
+from .views import OrdersView, GetConfirmOrderView, PaymentView, PaymentStatusView, PaymentMetricsView, OrderEventsMetricsView
 
 urlpatterns: list[path] = [
     path('orders', OrdersView.as_view(), name='orders'),
     path('order/<int:pk>', GetConfirmOrderView.as_view(), name='get-confirm-order'),
-    path('payment/<int:pk>', PaymentView.as_view(), name='payment')
+    path('payment/<int:pk>', PaymentView.as_view(), name='payment'),
+    path('payment/<int:pk>/status', PaymentStatusView.as_view(), name='payment-status'),
+    path('payment/metrics', PaymentMetricsView.as_view(), name='payment-metrics'),
+    path('order-events/metrics', OrderEventsMetricsView.as_view(), name='order-events-metrics'),
 ]
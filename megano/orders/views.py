@@ -1,17 +1,29 @@
+import math
 import random
+import time
 from string import ascii_lowercase
 
-from rest_framework.permissions import IsAuthenticated
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum
+
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework import status
 
-from megano.settings import BASKET_SESSION_ID
+from basket.misc import clear_basket
 from users.serializers import PaymentSerializer
-from .models import Order
-from .serializers import OrderSerializer, OrderProductSerializer
-from users.models import Profile
+from .models import Order, OrderItem
+from .inventory import OutOfStock, release_reservations
+from .misc import checkout, get_customer_order, remember_guest_order, update_order_totals, ORDER_ITEMS_PREFETCH
+from .outbox import ORDER_CONFIRMED, ORDER_DECLINED, record_order_event, get_outbox_metrics
+from .payments import payment_queue
+from .paginators import OrderHistoryPaginator
+from .serializers import OrderSerializer, OrderSummarySerializer, CheckoutItemSerializer
+from products.models import Product
+from users.models import Payment, Profile
 
 class OrdersView(APIView):
     """
@@ -21,7 +33,7 @@ class OrdersView(APIView):
         permission_classes: Array of permissions required to access the view.
 
     Methods:
-        get: Retrieve all user's orders.
+        get: Retrieve page of user's orders.
         post: Create new order.
     """
 
@@ -34,14 +46,17 @@ class OrdersView(APIView):
             request: Current HTTP request.
 
         Returns:
-            Response: response with serialized data.
+            Response: response with a page of order summaries or 403 status code.
         """
-        profile = Profile.objects.get(user=request.user)
-        orders = Order.objects.filter(
-            fullName=profile.fullName,
-        ).prefetch_related('products').all()
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        if not request.user.is_authenticated:
+            return Response(status=status.HTTP_403_FORBIDDEN)
+        item_count = (OrderItem.objects.filter(order=OuterRef('pk'))
+                      .order_by().values('order').annotate(total=Sum('count')).values('total'))
+        orders = Order.objects.filter(user=request.user).annotate(item_count=Subquery(item_count))
+        paginator = OrderHistoryPaginator()
+        page = paginator.paginate_queryset(orders, request)
+        serializer = OrderSummarySerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     @classmethod
     def post(cls, request: Request):
@@ -54,17 +69,20 @@ class OrdersView(APIView):
         Returns:
             Response: response with serialized data or 400 status code.
         """
-        serializer = OrderProductSerializer(create_order=True, data=request.data, many=True)
+        serializer = CheckoutItemSerializer(data=request.data, many=True, allow_empty=False)
         if serializer.is_valid():
-            order_id = serializer.save()[0]
-            order = Order.objects.get(pk=order_id)
+            profile = None
             if request.user.is_authenticated:
-                profile = Profile.objects.get(user=request.user)
-                order.fullName = profile.fullName
-                order.phone = profile.phone
-                order.email = profile.email
-            order.save()
-            return Response({'orderId': order_id})
+                profile = Profile.objects.filter(user=request.user).first()
+            try:
+                order = checkout(serializer.validated_data, profile)
+            except Product.DoesNotExist:
+                return Response(status=status.HTTP_400_BAD_REQUEST)
+            except OutOfStock as error:
+                return Response({'outOfStock': error.product_ids}, status=status.HTTP_409_CONFLICT)
+            if order.user_id is None:
+                remember_guest_order(request, order)
+            return Response({'orderId': order.id})
         return Response(status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -89,9 +107,9 @@ class GetConfirmOrderView(APIView):
             pk: Order primary key.
 
         Returns:
-            Response: response with serialized data or 400 status code.
+            Response: response with serialized data or 404 status code.
         """
-        order = Order.objects.prefetch_related('products').get(pk=pk)
+        order = get_customer_order(request, Order.objects.prefetch_related(*ORDER_ITEMS_PREFETCH), pk)
         serializer = OrderSerializer(order)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -107,14 +125,20 @@ class GetConfirmOrderView(APIView):
         Returns:
             Response: response with serialized data or 400 status code.
         """
-        order = Order.objects.prefetch_related('products').get(pk=pk)
+        order = get_customer_order(request, Order.objects.all(), pk)
+        if order.user_id is None and request.user.is_authenticated:
+            # The order was placed by this session before the login.
+            order.user = request.user
         order_id = request.data.get('orderId')
         if request.data.get('orderId'):
             del request.data['orderId']
             del request.data['products']
             request.data['id'] = order_id
         serializer = OrderSerializer(order)
-        serializer.update(order, request.data)
+        with transaction.atomic():
+            serializer.update(order, request.data)
+            update_order_totals(Order.objects.filter(pk=order.pk))
+            record_order_event(order, ORDER_CONFIRMED)
         return Response({'orderId': order.id}, status=status.HTTP_200_OK)
 
 
@@ -126,35 +150,145 @@ class PaymentView(APIView):
         permission_classes: Array of permissions required to access the view.
 
     Methods:
-        post: Create new order.
+        post: Submit payment of the order.
     """
     @classmethod
     def post(cls, request: Request, pk: int) -> Response:
         """
         Handles post requests.
 
+        The card is authorized by the payment workers, the progress is
+        available at the payment status endpoint.
+
         Args:
             request: Current HTTP request.
             pk: Order primary key.
 
         Returns:
-            Response: response with 202 status code or payment error.
+            Response: response with 202 status code, payment error or 409 status code.
         """
+        order = get_customer_order(request, Order.objects.all(), pk)
+        if order.status == 2 or order.payments.filter(
+            status__in=[Payment.Status.PENDING, Payment.Status.PROCESSING],
+        ).exists():
+            return Response(status=status.HTTP_409_CONFLICT)
+
         serializer = PaymentSerializer(data=request.data)
-        order = Order.objects.get(pk=pk)
-        if serializer.is_valid():
-            if str(serializer.data['number']).endswith('0'):
-                order.status = 2
-            else:
+        if not serializer.is_valid():
+            with transaction.atomic():
                 order.status = 1
-            serializer.save()
-        else:
-            order.status = 1
-        order.save()
-        if request.session[BASKET_SESSION_ID]:
-            request.session[BASKET_SESSION_ID] = []
-        if order.status == 1:
+                release_reservations(order)
+                order.save()
+                record_order_event(order, ORDER_DECLINED, paymentError='invalid_card')
+            clear_basket(request)
             return Response(
                 {'paymentError': ''.join([random.choice(ascii_lowercase) for _ in range(10)])}
             )
-        return Response(status=status.HTTP_202_ACCEPTED)
+
+        payment = serializer.save(order=order)
+        transaction.on_commit(lambda: payment_queue.submit(payment.pk))
+        clear_basket(request)
+        return Response(
+            {'orderId': order.id, 'paymentId': payment.pk, 'status': 'pending'},
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+
+class PaymentStatusView(APIView):
+    """
+    API view for following payment progress.
+
+    Methods:
+        get: Retrieve status of the last order payment.
+    """
+    final_statuses = Payment.Status.SUCCEEDED, Payment.Status.FAILED
+
+    @classmethod
+    def get(cls, request: Request, pk: int) -> Response:
+        """
+        Handles get requests.
+
+        With the wait query param the request is held (long polling) until
+        the payment is processed or the wait time in seconds runs out.
+
+        Args:
+            request: Current HTTP request.
+            pk: Order primary key.
+
+        Returns:
+            Response: response with payment status or 404 status code.
+        """
+        order = get_customer_order(request, Order.objects.all(), pk)
+        try:
+            wait = float(request.query_params.get('wait', 0))
+        except ValueError:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        if not math.isfinite(wait):
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        wait = min(max(wait, 0), settings.PAYMENT_STATUS_MAX_WAIT)
+        deadline = time.monotonic() + wait
+        while True:
+            payment = order.payments.order_by('-pk').first()
+            if payment is None:
+                return Response(status=status.HTTP_404_NOT_FOUND)
+            if payment.status in cls.final_statuses or time.monotonic() >= deadline:
+                break
+            time.sleep(settings.PAYMENT_STATUS_POLL_INTERVAL)
+        return Response({
+            'orderId': order.id,
+            'paymentId': payment.pk,
+            'status': Payment.Status(payment.status).name.lower(),
+            'paymentError': payment.error,
+        })
+
+
+class PaymentMetricsView(APIView):
+    """
+    API view for payment workers metrics.
+
+    Attributes:
+        permission_classes: Array of permissions required to access the view.
+
+    Methods:
+        get: Retrieve metrics of the payment workers of the current process.
+    """
+    permission_classes = [IsAdminUser]
+
+    @classmethod
+    def get(cls, request: Request) -> Response:
+        """
+        Handles get requests.
+
+        Args:
+            request: Current HTTP request.
+
+        Returns:
+            Response: response with worker metrics.
+        """
+        return Response(payment_queue.metrics())
+
+
+class OrderEventsMetricsView(APIView):
+    """
+    API view for order events outbox metrics.
+
+    Attributes:
+        permission_classes: Array of permissions required to access the view.
+
+    Methods:
+        get: Retrieve outbox metrics.
+    """
+    permission_classes = [IsAdminUser]
+
+    @classmethod
+    def get(cls, request: Request) -> Response:
+        """
+        Handles get requests.
+
+        Args:
+            request: Current HTTP request.
+
+        Returns:
+            Response: response with pending events count, dispatch lag and batch sizes.
+        """
+        return Response(get_outbox_metrics())
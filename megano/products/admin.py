@@ -2,8 +2,15 @@
 Products app admin control panel module.
 """
 
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.contrib.admin.widgets import AutocompleteSelect
 
+from megano.changelists import ScalableAdminMixin
+from .misc import (
+    PRODUCT_FLAGS, attach_tag, detach_tag, end_sales, reprice_products, set_product_flag, start_sale,
+)
 from .models import Product, ProductImage, Specification, Tag, Review, Category, Sale, Subcategory
 from users.admin import ImageInline
 
@@ -14,8 +21,37 @@ class TagInline(admin.TabularInline):
 
     Attributes:
         model: The model which the inline is using.
+        autocomplete_fields: Foreign keys edited with a searchable autocomplete widget.
     """
     model = Product.tags.through
+    autocomplete_fields = 'tag',
+
+
+class ProductActionForm(ActionForm):
+    """
+    Admin actions form with the parameters of the bulk product actions.
+
+    Attributes:
+        tag: Tag attached to or detached from the selected products.
+        flag: Product status flag turned on or off.
+        value: Price change or sale discount.
+        days: Sale duration in days.
+    """
+    tag = forms.ModelChoiceField(
+        Tag.objects.all(),
+        required=False,
+        label='Тег',
+        widget=AutocompleteSelect(Product.tags.through._meta.get_field('tag'), admin.site),
+    )
+    flag = forms.ChoiceField(
+        choices=[('', '---------')] + [
+            (flag, Product._meta.get_field(flag).verbose_name) for flag in PRODUCT_FLAGS
+        ],
+        required=False,
+        label='Признак',
+    )
+    value = forms.DecimalField(max_digits=10, decimal_places=2, required=False, label='Значение')
+    days = forms.IntegerField(min_value=1, initial=7, required=False, label='Дней')
 
 class ProductImageInline(admin.StackedInline):
     """
@@ -36,7 +72,7 @@ class SpecificationInline(admin.StackedInline):
     model = Specification
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(ScalableAdminMixin, admin.ModelAdmin):
     """
     Admin form for a Product model.
 
@@ -44,9 +80,24 @@ class ProductAdmin(admin.ModelAdmin):
         inlines: Array of inlines forms.
         list_display: Array of fields that displays at the admin panel.
         list_display_links: Array of fields that redirects to update instance form.
-        ordering: Array of fields that define the sorting rules.
+        list_select_related: Related objects loaded with the changelist rows.
+        list_only: Fields loaded for the changelist rows.
         search_fields: Array of fields used in the search.
+        prefix_search_fields: Indexed fields searched by prefix.
+        ordering: Autocomplete results order, served by the search title index.
+        action_form: Admin actions form with the tag choice.
+        actions: Bulk actions over the selected products.
         fieldsets: Array of field sets that define the presentation of form fields.
+
+    Methods:
+        reprice_by_percent: Change prices of the selected products by the percentage.
+        reprice_by_amount: Change prices of the selected products by the amount.
+        start_sale: Put the selected products on sale with the percentage discount.
+        end_sales: Take the selected products off sale.
+        turn_flag_on: Turn the chosen status flag on for the selected products.
+        turn_flag_off: Turn the chosen status flag off for the selected products.
+        attach_tag: Attach the chosen tag to the selected products.
+        detach_tag: Detach the chosen tag from the selected products.
     """
     inlines = [
         TagInline,
@@ -54,10 +105,18 @@ class ProductAdmin(admin.ModelAdmin):
         SpecificationInline,
     ]
 
-    list_display = "pk", "title", "description", "price"
+    list_display = "pk", "title", "description", "price", "category"
     list_display_links = "pk", "title"
-    ordering = "-title", "pk"
-    search_fields = "name", "description"
+    list_select_related = "category",
+    list_only = "title", "description", "price", "category__title"
+    search_fields = "title",
+    prefix_search_fields = "searchTitle",
+    ordering = "searchTitle", "pk"
+    action_form = ProductActionForm
+    actions = (
+        "reprice_by_percent", "reprice_by_amount", "start_sale", "end_sales",
+        "turn_flag_on", "turn_flag_off", "attach_tag", "detach_tag",
+    )
     fieldsets = [
         (None, {
            "fields": ("title", "description", 'fullDescription'),
@@ -72,6 +131,9 @@ class ProductAdmin(admin.ModelAdmin):
         ('Product status', {
             'fields': ('freeDelivery', 'available', 'limited')
         }),
+        ('Inventory', {
+            'fields': ('stock',)
+        }),
         ('Sorting options', {
             'fields': ('index', )
         }),
@@ -80,14 +142,80 @@ class ProductAdmin(admin.ModelAdmin):
         }),
     ]
 
+    def _get_action_param(self, request, name: str, message: str):
+        form = self.action_form(request.POST)
+        form.fields['action'].choices = self.get_action_choices(request)
+        value = form.cleaned_data[name] if form.is_valid() else None
+        if value in (None, ''):
+            self.message_user(request, message, messages.WARNING)
+            return None
+        return value
+
+    @admin.action(description='Изменить цену выбранных товаров на N %%')
+    def reprice_by_percent(self, request, queryset):
+        percent = self._get_action_param(request, 'value', 'Укажите изменение цены в процентах.')
+        if percent is not None:
+            count = reprice_products(queryset, percent=percent)
+            self.message_user(request, f'Изменены цены {count} товаров.', messages.SUCCESS)
+
+    @admin.action(description='Изменить цену выбранных товаров на N')
+    def reprice_by_amount(self, request, queryset):
+        amount = self._get_action_param(request, 'value', 'Укажите изменение цены.')
+        if amount is not None:
+            count = reprice_products(queryset, amount=amount)
+            self.message_user(request, f'Изменены цены {count} товаров.', messages.SUCCESS)
+
+    @admin.action(description='Начать распродажу выбранных товаров со скидкой N %%')
+    def start_sale(self, request, queryset):
+        percent = self._get_action_param(request, 'value', 'Укажите скидку в процентах.')
+        days = self._get_action_param(request, 'days', 'Укажите длительность распродажи.')
+        if percent is not None and days is not None:
+            count = start_sale(queryset, percent, days)
+            self.message_user(request, f'Создано {count} распродаж.', messages.SUCCESS)
+
+    @admin.action(description='Завершить распродажи выбранных товаров')
+    def end_sales(self, request, queryset):
+        count = end_sales(queryset)
+        self.message_user(request, f'Завершено {count} распродаж.', messages.SUCCESS)
+
+    @admin.action(description='Включить признак у выбранных товаров')
+    def turn_flag_on(self, request, queryset):
+        flag = self._get_action_param(request, 'flag', 'Выберите признак.')
+        if flag is not None:
+            count = set_product_flag(queryset, flag, True)
+            self.message_user(request, f'Изменено {count} товаров.', messages.SUCCESS)
+
+    @admin.action(description='Выключить признак у выбранных товаров')
+    def turn_flag_off(self, request, queryset):
+        flag = self._get_action_param(request, 'flag', 'Выберите признак.')
+        if flag is not None:
+            count = set_product_flag(queryset, flag, False)
+            self.message_user(request, f'Изменено {count} товаров.', messages.SUCCESS)
+
+    @admin.action(description='Добавить тег к выбранным товарам')
+    def attach_tag(self, request, queryset):
+        tag = self._get_action_param(request, 'tag', 'Выберите тег.')
+        if tag is not None:
+            count = attach_tag(tag, queryset)
+            self.message_user(request, f'Тег «{tag}» добавлен к {count} товарам.', messages.SUCCESS)
+
+    @admin.action(description='Убрать тег у выбранных товаров')
+    def detach_tag(self, request, queryset):
+        tag = self._get_action_param(request, 'tag', 'Выберите тег.')
+        if tag is not None:
+            count = detach_tag(tag, queryset)
+            self.message_user(request, f'Тег «{tag}» убран у {count} товаров.', messages.SUCCESS)
+
 class TagProductInline(admin.TabularInline):
     """
     Inline form for changing products related with Tag instance.
 
     Attributes:
         model: The model which the inline is using.
+        autocomplete_fields: Foreign keys edited with a searchable autocomplete widget.
     """
     model = Tag.products.through
+    autocomplete_fields = 'product',
 
 
 @admin.register(Tag)
@@ -99,6 +227,8 @@ class TagAdmin(admin.ModelAdmin):
         inlines: Array of inlines forms.
         list_display: Array of fields that displays at the admin panel.
         list_display_links: Array of fields that redirects to update instance form.
+        search_fields: Array of fields used in the search.
+        ordering: Array of fields that define the sorting rules.
         fieldsets: Array of field sets that define the presentation of form fields.
     """
     inlines = [
@@ -106,6 +236,8 @@ class TagAdmin(admin.ModelAdmin):
     ]
     list_display = 'pk', 'name'
     list_display_links = 'name',
+    search_fields = 'name',
+    ordering = 'name', 'pk'
     fieldsets = [
         (None, {
             "fields": ("name", 'category'),
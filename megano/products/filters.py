@@ -6,7 +6,15 @@ from django_filters import rest_framework as filters
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import OrderingFilter
 
-from .models import Product
+from megano.timing import timed
+from .models import Product, Tag
+
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    """
+    Filter by comma separated list of numbers.
+    """
+
 
 class ProductFilter(filters.FilterSet):
     """
@@ -21,6 +29,9 @@ class ProductFilter(filters.FilterSet):
         category: Filter by category.
         tags: Filter by tags.
 
+    Methods:
+        filter_tags: Filter products marked with any of the tags.
+
     Meta:
         model: Model of serializer.
         fields: Array of representing fields.
@@ -31,12 +42,17 @@ class ProductFilter(filters.FilterSet):
     freeDelivery = filters.BooleanFilter(field_name='freeDelivery')
     available = filters.BooleanFilter(field_name='available')
     category = filters.NumberFilter(field_name="category_id")
-    tags = filters.AllValuesFilter(field_name='tags', lookup_expr='in')
+    tags = NumberInFilter(method='filter_tags')
 
     class Meta:
         model = Product
         fields = ['name', 'minPrice', 'maxPrice', 'freeDelivery', 'available', 'category']
 
+    def filter_tags(self, queryset, name, value):
+        # A subquery instead of a join keeps products of several tags unique without DISTINCT.
+        tagged = Tag.products.through.objects.filter(tag_id__in=value).values('product_id')
+        return queryset.filter(pk__in=tagged)
+
 
 class CustomFilterBackend(DjangoFilterBackend):
     """
@@ -46,6 +62,7 @@ class CustomFilterBackend(DjangoFilterBackend):
 
     Methods:
         get_filterset_kwargs: Customised parent class method that parses data in a different way.
+        filter_queryset: Filter queryset, measured as the filter phase of the request timings.
     """
     def get_filterset_kwargs(self, request, queryset, view) -> dict:
         """
@@ -75,6 +92,10 @@ class CustomFilterBackend(DjangoFilterBackend):
 
         return result
 
+    def filter_queryset(self, request, queryset, view):
+        with timed('filter'):
+            return super().filter_queryset(request, queryset, view)
+
 
 class CustomOrderingBackend(OrderingFilter):
     """
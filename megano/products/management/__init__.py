@@ -0,0 +1 @@
+"""Products app management commands"""
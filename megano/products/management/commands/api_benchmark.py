@@ -0,0 +1,488 @@
+"""
+Benchmark suite of the API endpoints with tracked baselines.
+"""
+import json
+import statistics
+import time
+from contextlib import contextmanager
+from copy import deepcopy
+from pathlib import Path
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from rest_framework.serializers import BaseSerializer
+
+from analytics.rollups import rebuild_sales_rollups
+from basket.models import Basket, BasketItem
+from megano import sessions
+from megano.cache import invalidate_cached_pages
+from orders.models import Order
+from users.models import Payment
+from .seed import Seeder, seed_sizes
+
+DATASETS = {'small': 1000, 'medium': 10000, 'large': 100000}
+BASELINE_PATH = Path(settings.BASE_DIR) / 'benchmarks' / 'api_baseline.json'
+
+# Timings compared against the baseline with the relative threshold.
+TIMING_METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'sql_ms', 'serializer_ms')
+
+# Benchmark cases of the API routes by URL name: case name, HTTP method,
+# URL kwargs, query params or request body, client user and expected status.
+# Values in braces are replaced with primary keys of the seeded rows.
+ROUTES = {
+    'catalog': [
+        ('catalog', 'GET', {}, {}, None, 200),
+        ('catalog by category', 'GET', {}, {'category': '{category}', 'filter[available]': 'true'}, None, 200),
+        ('catalog by tag', 'GET', {}, {'tags[]': '{tag}'}, None, 200),
+        ('catalog by rating', 'GET', {}, {'sort': 'rating', 'sortType': 'dec'}, None, 200),
+    ],
+    'product_retrieve': [('product', 'GET', {'pk': '{product}'}, {}, None, 200)],
+    'create_review': [('create review', 'POST', {'pk': '{product}'}, {
+        'author': 'Benchmark', 'email': 'benchmark@example.com', 'text': 'Benchmark review', 'rate': 5,
+    }, None, 201)],
+    'tags_list': [('tags', 'GET', {}, {'category': '{category}'}, None, 200)],
+    'category_list': [('categories', 'GET', {}, {}, None, 200)],
+    'limited-products': [('limited products', 'GET', {}, {}, None, 200)],
+    'popular-products': [('popular products', 'GET', {}, {}, None, 200)],
+    'banners': [('banners', 'GET', {}, {}, None, 200)],
+    'sales': [('sales', 'GET', {}, {}, None, 200)],
+    'orders': [
+        ('orders', 'GET', {}, {}, 'customer', 200),
+        ('checkout', 'POST', {}, [{'id': '{product}', 'count': 1}], 'customer', 200),
+    ],
+    'get-confirm-order': [
+        ('order', 'GET', {'pk': '{order}'}, {}, 'customer', 200),
+        ('confirm order', 'POST', {'pk': '{order}'}, {
+            'fullName': 'Benchmark', 'email': 'benchmark@example.com', 'phone': '+70000000000',
+            'deliveryType': 'ordinary', 'paymentType': 'online', 'city': 'Москва', 'address': 'ул. Ленина, д. 1',
+        }, 'customer', 200),
+    ],
+    'payment': [('payment', 'POST', {'pk': '{unpaid_order}'}, {
+        'number': 12345678, 'name': 'Benchmark', 'month': '12', 'year': '2030', 'code': '123',
+    }, 'customer', 202)],
+    'payment-status': [('payment status', 'GET', {'pk': '{order}'}, {}, 'customer', 200)],
+    'payment-metrics': [('payment metrics', 'GET', {}, {}, 'admin', 200)],
+    'order-events-metrics': [('order events metrics', 'GET', {}, {}, 'admin', 200)],
+    'analytics-sales': [('sales report', 'GET', {}, {}, 'admin', 200)],
+    'basket': [
+        ('basket', 'GET', {}, {}, 'customer', 200),
+        ('add to basket', 'POST', {}, {'id': '{product}', 'count': 1}, 'customer', 201),
+        ('remove from basket', 'DELETE', {}, {'id': '{product}', 'count': 1}, 'customer', 200),
+    ],
+    'basket-batch': [('basket batch', 'POST', {}, [
+        {'action': 'add', 'id': '{product}', 'count': 2}, {'action': 'remove', 'id': '{product}', 'count': 1},
+    ], 'customer', 200)],
+    'sign-up': [('sign up', 'FORM', {}, {
+        'username': 'benchmark', 'password': 'password', 'name': 'Benchmark',
+    }, None, 201)],
+    'sign-in': [('sign in', 'FORM', {}, {'username': '{username}', 'password': 'password'}, None, 200)],
+    'sign-out': [('sign out', 'POST', {}, {}, 'customer', 200)],
+    'profile': [
+        ('profile', 'GET', {}, {}, 'customer', 200),
+        ('change profile', 'POST', {}, {
+            'fullName': 'Benchmark', 'email': 'benchmark@example.com', 'phone': '+70000000000',
+        }, 'customer', 200),
+    ],
+}
+
+# Routes that are not benchmarked with the reasons.
+SKIPPED_ROUTES = {
+    'change-avatar': 'uploaded files are written to the media storage and are not rolled back',
+}
+
+
+def get_api_routes() -> list[str]:
+    """
+    Get names of the API routes in the project URLconf.
+
+    Returns:
+        list: URL names of the routes under api/ in the URLconf order.
+    """
+    names = []
+
+    def collect(patterns, prefix):
+        for pattern in patterns:
+            route = prefix + str(pattern.pattern)
+            if isinstance(pattern, URLResolver):
+                collect(pattern.url_patterns, route)
+            elif isinstance(pattern, URLPattern) and route.startswith('api/') and pattern.name not in names:
+                names.append(pattern.name)
+
+    collect(get_resolver().url_patterns, '')
+    return names
+
+
+def percentile(values: list[float], percent: int) -> float:
+    """
+    Get percentile of the values with linear interpolation.
+
+    Args:
+        values: Measured values.
+        percent: Percentile from 1 to 99.
+
+    Returns:
+        float: Percentile value.
+    """
+    if len(values) < 2:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[percent - 1]
+
+
+def compare_results(baseline: dict, results: dict, threshold: float, min_delta: float) -> list[str]:
+    """
+    Find metrics that got worse than in the baseline.
+
+    Timings regress when they grow by more than threshold percent and by
+    more than min_delta milliseconds, the response size when it grows by
+    more than threshold percent, the query count on any growth.
+
+    Args:
+        baseline: Baseline results by dataset and case name.
+        results: Current results by dataset and case name.
+        threshold: Allowed growth in percent.
+        min_delta: Allowed growth of timings in milliseconds.
+
+    Returns:
+        list: Regression descriptions.
+    """
+    regressions = []
+    for dataset, cases in results.items():
+        for name, current in cases.items():
+            previous = baseline.get(dataset, {}).get(name)
+            if previous is None:
+                continue
+            for metric in (*TIMING_METRICS, 'response_bytes', 'queries'):
+                old, new = previous[metric], current[metric]
+                if metric == 'queries':
+                    regressed = new > old
+                else:
+                    regressed = new > old * (1 + threshold / 100)
+                    if metric in TIMING_METRICS:
+                        regressed = regressed and new - old > min_delta
+                if regressed:
+                    growth = f' (+{(new - old) / old * 100:.0f}%)' if old else ''
+                    regressions.append(f'{dataset} / {name} / {metric}: {old} -> {new}{growth}')
+    return regressions
+
+
+class SerializerTimer:
+    """
+    Timer of the serializer representation.
+
+    Measures time spent in the data property of the outermost serializers,
+    including queries that their fields run lazily.
+
+    Attributes:
+        elapsed: Measured time in seconds.
+    """
+    def __init__(self):
+        self.elapsed = 0.0
+        self._depth = 0
+
+    @contextmanager
+    def install(self):
+        """
+        Time serializers while the context is active.
+        """
+        original = BaseSerializer.data
+        timer = self
+
+        def data(serializer):
+            if timer._depth:
+                return original.fget(serializer)
+            timer._depth += 1
+            started = time.perf_counter()
+            try:
+                return original.fget(serializer)
+            finally:
+                timer.elapsed += time.perf_counter() - started
+                timer._depth -= 1
+
+        BaseSerializer.data = property(data)
+        try:
+            yield self
+        finally:
+            BaseSerializer.data = original
+
+
+class QueryTimer:
+    """
+    Database execute wrapper that counts and times queries.
+
+    Attributes:
+        count: Number of executed queries.
+        elapsed: Time spent in the queries in seconds.
+    """
+    def __init__(self):
+        self.count = 0
+        self.elapsed = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.elapsed += time.perf_counter() - started
+            self.count += 1
+
+
+class Command(BaseCommand):
+    """
+    Benchmark every API route against seeded datasets.
+
+    Each dataset is generated by the seed command generator in a fresh test
+    database. Every case of every API route is requested a number of times
+    with the page cache invalidated, recording latency percentiles, number
+    and time of SQL queries, serializer time and response size. Requests
+    changing data run in a transaction that is rolled back, so all
+    iterations see the same rows. API routes without benchmark cases fail
+    the run, so new endpoints are not forgotten.
+
+    Results can be saved as the baseline or compared with it, the command
+    fails if some metrics regressed beyond the threshold.
+    """
+    help = 'Measure latency, SQL queries, serializer time and response size of the API routes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--datasets', nargs='+', choices=DATASETS, default=list(DATASETS),
+            help='Seeded datasets (small: 1000, medium: 10000, large: 100000 products).',
+        )
+        parser.add_argument('--iterations', type=int, default=30, help='Measured requests per case.')
+        parser.add_argument('--warmup', type=int, default=3, help='Unmeasured requests per case.')
+        parser.add_argument('--cases', nargs='+', help='Run only the cases with these names.')
+        parser.add_argument('--baseline', type=Path, default=BASELINE_PATH, help='Baseline JSON file.')
+        parser.add_argument('--save', action='store_true', help='Save results as the baseline.')
+        parser.add_argument('--compare', action='store_true', help='Compare results with the baseline.')
+        parser.add_argument('--threshold', type=float, default=20, help='Allowed growth of metrics in percent.')
+        parser.add_argument(
+            '--min-delta', type=float, default=2, help='Allowed growth of timings in milliseconds.',
+        )
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be positive')
+        missing = [name for name in get_api_routes() if name not in ROUTES and name not in SKIPPED_ROUTES]
+        if missing:
+            raise CommandError(f'API routes without benchmark cases: {", ".join(missing)}')
+        baseline = None
+        if options['compare']:
+            if not options['baseline'].exists():
+                raise CommandError(f'Baseline {options["baseline"]} does not exist, run with --save first')
+            baseline = json.loads(options['baseline'].read_text())['results']
+
+        results = {}
+        errors = 0
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        # Session rows are written by the benchmark thread only, the background
+        # writer would compete with the measured requests for the database.
+        try:
+            with override_settings(SESSION_WRITE_BEHIND_INTERVAL=24 * 3600):
+                for number, dataset in enumerate(options['datasets']):
+                    if number:
+                        call_command('flush', interactive=False, verbosity=0)
+                    try:
+                        results[dataset], dataset_errors = self.run_dataset(dataset, options)
+                    finally:
+                        sessions.writer.flush()
+                    errors += dataset_errors
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['save']:
+            options['baseline'].parent.mkdir(parents=True, exist_ok=True)
+            options['baseline'].write_text(json.dumps({
+                'datasets': {dataset: DATASETS[dataset] for dataset in results},
+                'iterations': options['iterations'],
+                'results': results,
+            }, indent=2, ensure_ascii=False) + '\n')
+            self.stdout.write(f'Baseline saved to {options["baseline"]}')
+        if errors:
+            raise CommandError(f'{errors} benchmark cases failed')
+        if baseline is not None:
+            regressions = compare_results(baseline, results, options['threshold'], options['min_delta'])
+            for regression in regressions:
+                self.stderr.write(regression)
+            if regressions:
+                raise CommandError(f'{len(regressions)} metrics regressed beyond {options["threshold"]:g}%')
+            self.stdout.write(self.style.SUCCESS('No regressions'))
+
+    def run_dataset(self, dataset: str, options: dict) -> tuple[dict, int]:
+        """
+        Seed one dataset and benchmark all cases against it.
+
+        Args:
+            dataset: Dataset name.
+            options: Command options.
+
+        Returns:
+            tuple: Results by case name and number of failed cases.
+        """
+        started = time.perf_counter()
+        values = self.seed(DATASETS[dataset])
+        self.stdout.write(f'{dataset}: seeded {DATASETS[dataset]} products in {time.perf_counter() - started:.1f}s')
+        self.stdout.write(f'{"case":<24}{"p50":>9}{"p95":>9}{"p99":>9}{"queries":>9}{"sql":>9}'
+                          f'{"serializer":>12}{"bytes":>10}')
+        users = {
+            'customer': User.objects.get(pk=values['user']),
+            'admin': User.objects.create_user('benchmark-admin', is_staff=True),
+        }
+        results = {}
+        errors = 0
+        with SerializerTimer().install() as serializer_timer:
+            for route, cases in ROUTES.items():
+                for name, method, kwargs, data, user, expected in cases:
+                    if options['cases'] and name not in options['cases']:
+                        continue
+                    path = reverse(route, kwargs={key: value.format(**values) for key, value in kwargs.items()})
+                    client = Client()
+                    if user:
+                        client.force_login(users[user])
+                    try:
+                        result = self.measure(
+                            client, users.get(user), method, path, self.fill(data, values), expected,
+                            options['warmup'], options['iterations'], serializer_timer,
+                        )
+                    except Exception as error:
+                        self.stderr.write(f'{dataset} / {name}: {error!r}')
+                        errors += 1
+                        continue
+                    results[name] = result
+                    self.stdout.write(
+                        f'{name:<24}{result["p50_ms"]:>9.2f}{result["p95_ms"]:>9.2f}{result["p99_ms"]:>9.2f}'
+                        f'{result["queries"]:>9}{result["sql_ms"]:>9.2f}{result["serializer_ms"]:>12.2f}'
+                        f'{result["response_bytes"]:>10}'
+                    )
+        return results, errors
+
+    def measure(self, client: Client, user: User | None, method: str, path: str, data, expected: int,
+                warmup: int, iterations: int, serializer_timer: SerializerTimer) -> dict:
+        """
+        Request one case repeatedly and aggregate its metrics.
+
+        Args:
+            client: Test client of the case user.
+            user: Logged-in user or None for anonymous cases.
+            method: HTTP method, FORM for posts of the JSON encoded form data.
+            path: Request path.
+            data: Query params or request body.
+            expected: Expected response status.
+            warmup: Number of unmeasured requests.
+            iterations: Number of measured requests.
+            serializer_timer: Installed serializer timer.
+
+        Returns:
+            dict: Latency percentiles and medians of the other metrics.
+
+        Raises:
+            CommandError: If the response status is not the expected one.
+        """
+        latencies, queries, sql, serialization, sizes = [], [], [], [], []
+        for iteration in range(warmup + iterations):
+            invalidate_cached_pages()
+            query_timer = QueryTimer()
+            serializer_timer.elapsed = 0.0
+            cookies = deepcopy(client.cookies)
+            with transaction.atomic():
+                with connection.execute_wrapper(query_timer):
+                    started = time.perf_counter()
+                    response = self.request(client, method, path, data)
+                    elapsed = time.perf_counter() - started
+                transaction.set_rollback(method != 'GET')
+            if method != 'GET':
+                client.cookies = cookies
+                if user is not None and settings.SESSION_COOKIE_NAME in response.cookies:
+                    # Sessions live in the cache, which is not rolled back.
+                    client.force_login(user)
+            if response.status_code != expected:
+                raise CommandError(f'{method} {path} returned {response.status_code}, expected {expected}')
+            if iteration >= warmup:
+                latencies.append(elapsed * 1000)
+                queries.append(query_timer.count)
+                sql.append(query_timer.elapsed * 1000)
+                serialization.append(serializer_timer.elapsed * 1000)
+                sizes.append(len(response.content))
+        return {
+            'method': 'POST' if method == 'FORM' else method,
+            'path': path,
+            'p50_ms': round(percentile(latencies, 50), 3),
+            'p95_ms': round(percentile(latencies, 95), 3),
+            'p99_ms': round(percentile(latencies, 99), 3),
+            'queries': round(statistics.median(queries)),
+            'sql_ms': round(statistics.median(sql), 3),
+            'serializer_ms': round(statistics.median(serialization), 3),
+            'response_bytes': max(sizes),
+        }
+
+    @staticmethod
+    def request(client: Client, method: str, path: str, data):
+        if method == 'GET':
+            return client.get(path, data)
+        if method == 'FORM':
+            # Auth views parse the JSON document sent as the only form key.
+            return client.post(path, urlencode({json.dumps(data): ''}), content_type='application/x-www-form-urlencoded')
+        return client.generic(method, path, json.dumps(data), content_type='application/json')
+
+    def fill(self, data, values: dict):
+        """
+        Replace placeholders in the request data with the seeded primary keys.
+
+        Args:
+            data: Query params or request body.
+            values: Primary keys by placeholder name.
+
+        Returns:
+            Data with the placeholders replaced, numeric ones as integers.
+        """
+        if isinstance(data, list):
+            return [self.fill(item, values) for item in data]
+        if isinstance(data, dict):
+            return {key: self.fill(value, values) for key, value in data.items()}
+        if isinstance(data, str) and data.startswith('{') and data.endswith('}'):
+            return values[data[1:-1]]
+        return data
+
+    def seed(self, product_count: int) -> dict:
+        """
+        Fill the test database and prepare the rows used by the cases.
+
+        Args:
+            product_count: Number of products.
+
+        Returns:
+            dict: Values used in the case URLs and data.
+        """
+        seeder = Seeder(seed_sizes(product_count, placeholders=0))
+        seeder.run()
+        rebuild_sales_rollups()
+        user_id = seeder.user_ids[0]
+        order_id, unpaid_order_id = Order.objects.filter(user_id=user_id).order_by('pk').values_list(
+            'pk', flat=True,
+        )[:2]
+        Order.objects.filter(pk=unpaid_order_id).update(status=0)
+        Payment.objects.create(
+            order_id=order_id, number=12345678, name='Benchmark', month='12', year='2030', code='123',
+            status=Payment.Status.SUCCEEDED,
+        )
+        basket = Basket.objects.create(user_id=user_id)
+        BasketItem.objects.bulk_create(
+            BasketItem(basket=basket, product_id=product_id, count=1) for product_id in seeder.popular_ids[:3]
+        )
+        return {
+            'user': user_id,
+            'username': f'customer{user_id}',
+            'category': seeder.category_ids[0],
+            'tag': seeder.tag_ids[0],
+            'product': seeder.popular_ids[0],
+            'order': order_id,
+            'unpaid_order': unpaid_order_id,
+        }
@@ -0,0 +1,509 @@
+"""
+Deterministic synthetic data for scale testing.
+"""
+import itertools
+import math
+import random
+import time
+from array import array
+from bisect import bisect
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from multiprocessing import Pool
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from orders.misc import update_order_totals
+from orders.models import Order, OrderItem
+from products.models import Category, Product, ProductImage, Review, Sale, Specification, Subcategory, Tag
+from users.models import Image, Profile
+
+PLACEHOLDER_DIR = 'media/products/placeholders'
+
+_ADJECTIVES = (
+    'Умный', 'Лёгкий', 'Компактный', 'Классический', 'Новый', 'Прочный', 'Мощный', 'Тихий',
+    'Быстрый', 'Цифровой', 'Складной', 'Беспроводной', 'Игровой', 'Детский', 'Дорожный', 'Домашний',
+)
+_NOUNS = (
+    'чайник', 'ноутбук', 'телефон', 'рюкзак', 'фонарь', 'пылесос', 'монитор', 'планшет',
+    'велосипед', 'стул', 'светильник', 'термос', 'динамик', 'принтер', 'часы', 'утюг',
+)
+_SPEC_NAMES = ('Цвет', 'Вес', 'Материал', 'Гарантия', 'Страна', 'Размер', 'Мощность', 'Объём')
+_SPEC_VALUES = ('Чёрный', 'Белый', '1 кг', '250 г', 'Пластик', 'Металл', '12 мес.', 'Китай', 'M', '1500 Вт')
+_CITIES = ('Москва', 'Казань', 'Самара', 'Омск', 'Тверь', 'Пермь', 'Сочи', 'Томск')
+_FIRST_NAMES = ('Анна', 'Иван', 'Мария', 'Олег', 'Елена', 'Павел', 'Ольга', 'Денис')
+_LAST_NAMES = ('Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов', 'Лебедев', 'Козлов', 'Новиков')
+
+
+def zipf_cum_weights(count: int, exponent: float) -> list[float]:
+    """
+    Get cumulative Zipf weights of ranks 1..count.
+
+    Args:
+        count: Number of ranks.
+        exponent: Zipf exponent, the larger the more skewed.
+
+    Returns:
+        list: Cumulative weights for random.choices and bisect.
+    """
+    return list(itertools.accumulate(rank ** -exponent for rank in range(1, count + 1)))
+
+
+def seed_sizes(products: int, **sizes) -> dict:
+    """
+    Get numbers of generated rows.
+
+    Args:
+        products: Number of products.
+        sizes: Explicit sizes, None values are replaced with the defaults.
+
+    Returns:
+        dict: Sizes by entity, the defaults are ratios of the product count.
+    """
+    result = {
+        'products': products,
+        'categories': max(5, round(products ** 0.35)),
+        'subcategories_per_category': 4,
+        'tags': max(20, products // 200),
+        'tags_per_product': 2,
+        'specs_per_product': 2,
+        'images_per_product': 1,
+        'reviews': products * 2,
+        'sales': products // 100,
+        'users': max(1, products // 10),
+        'orders': products // 2,
+        'items_per_order': 1.5,
+        'placeholders': 100,
+    }
+    result.update((name, value) for name, value in sizes.items() if value is not None)
+    result['specs_per_product'] = min(result['specs_per_product'], len(_SPEC_NAMES))
+    return result
+
+
+def render_placeholder(task: tuple[str, int, int]) -> str:
+    """
+    Draw one placeholder image. Runs in a worker process.
+
+    Args:
+        task: Image path, placeholder number and random seed.
+
+    Returns:
+        str: Image path.
+    """
+    from PIL import Image as PillowImage, ImageDraw
+
+    path, number, seed = task
+    if not Path(path).exists():
+        rng = random.Random(f'{seed}-placeholder-{number}')
+        image = PillowImage.new('RGB', (400, 400), tuple(rng.randrange(64, 224) for _ in range(3)))
+        draw = ImageDraw.Draw(image)
+        for _ in range(8):
+            x, y = rng.randrange(400), rng.randrange(400)
+            radius = rng.randrange(20, 80)
+            draw.ellipse((x - radius, y - radius, x + radius, y + radius),
+                         fill=tuple(rng.randrange(256) for _ in range(3)))
+        draw.text((20, 20), f'#{number}', fill=(255, 255, 255))
+        image.save(path, 'PNG')
+    return path
+
+
+class Seeder:
+    """
+    Generator of a consistent catalog with customers and their orders.
+
+    All rows are derived from one seeded random generator per stage, so the
+    same options always produce the same data (dates are relative to the
+    time of the run). Primary keys are assigned
+    explicitly after the current maximums, so the generator can add data
+    to a non-empty database. Product popularity, category sizes, tag usage
+    and review counts follow Zipf distributions.
+
+    Attributes:
+        seed: Random seed.
+        sizes: Number of rows to generate per entity.
+        batch_size: Number of rows per bulk insert.
+        workers: Number of processes drawing placeholder images.
+        log: Callable receiving progress messages.
+
+    Methods:
+        run: Generate all entities.
+    """
+    def __init__(self, sizes: dict[str, int], seed: int = 0, batch_size: int = 5000, workers: int = None,
+                 log=None):
+        self.seed = seed
+        self.sizes = sizes
+        self.batch_size = batch_size
+        self.workers = workers
+        self.log = log or (lambda message: None)
+        self.now = timezone.now().replace(microsecond=0)
+
+    def rng(self, stage: str) -> random.Random:
+        return random.Random(f'{self.seed}-{stage}')
+
+    def next_pk(self, model) -> int:
+        return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+    def insert(self, model, fields: tuple[str, ...], rows) -> int:
+        """
+        Insert rows with executemany in batches.
+
+        Model instances are not created: building millions of them costs
+        more than the inserts, so rows are plain tuples of field values.
+
+        Args:
+            model: Model class.
+            fields: Names of the inserted fields.
+            rows: Iterable of value tuples in the fields order.
+
+        Returns:
+            int: Number of inserted rows.
+        """
+        ops = connection.ops
+        model_fields = [model._meta.get_field(name) for name in fields]
+        converters = []
+        for field in model_fields:
+            if field.get_internal_type() == 'DateTimeField':
+                converters.append(ops.adapt_datetimefield_value)
+            elif field.get_internal_type() == 'DecimalField':
+                converters.append(lambda value, field=field: ops.adapt_decimalfield_value(
+                    value, field.max_digits, field.decimal_places,
+                ))
+            else:
+                converters.append(None)
+        indexes = [(index, converter) for index, converter in enumerate(converters) if converter]
+        columns = ', '.join(ops.quote_name(field.column) for field in model_fields)
+        sql = (f'INSERT INTO {ops.quote_name(model._meta.db_table)} ({columns}) '
+               f'VALUES ({", ".join(["%s"] * len(fields))})')
+
+        count = 0
+        rows = iter(rows)
+        with connection.cursor() as cursor:
+            while batch := list(itertools.islice(rows, self.batch_size)):
+                if indexes:
+                    batch = [list(row) for row in batch]
+                    for row in batch:
+                        for index, converter in indexes:
+                            row[index] = converter(row[index])
+                cursor.executemany(sql, batch)
+                count += len(batch)
+        return count
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        with transaction.atomic():
+            yield
+        self.log(f'{name}: {time.perf_counter() - started:.1f}s')
+
+    def run(self) -> None:
+        """
+        Generate all entities.
+        """
+        placeholders = self.make_placeholders()
+        self.make_categories(placeholders)
+        self.make_tags()
+        self.make_products(placeholders)
+        self.make_reviews()
+        self.make_sales()
+        self.make_users()
+        self.make_orders()
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [
+                Category, Subcategory, Tag, Product, ProductImage, Specification, Review, Sale, User, Profile,
+                Image, Order, OrderItem,
+            ]):
+                cursor.execute(sql)
+            if connection.vendor == 'sqlite':
+                cursor.execute('ANALYZE')
+
+    def make_placeholders(self) -> list[str]:
+        """
+        Draw placeholder images in parallel processes.
+
+        Returns:
+            list: Image names relative to MEDIA_ROOT.
+        """
+        count = self.sizes['placeholders']
+        if not count:
+            return []
+        started = time.perf_counter()
+        directory = Path(settings.MEDIA_ROOT) / PLACEHOLDER_DIR
+        directory.mkdir(parents=True, exist_ok=True)
+        tasks = [(str(directory / f'{number}.png'), number, self.seed) for number in range(count)]
+        with Pool(self.workers) as pool:
+            pool.map(render_placeholder, tasks, chunksize=max(1, count // 64))
+        self.log(f'placeholders: {time.perf_counter() - started:.1f}s')
+        return [f'{PLACEHOLDER_DIR}/{number}.png' for number in range(count)]
+
+    def make_categories(self, placeholders: list[str]) -> None:
+        rng = self.rng('categories')
+        with self.stage('categories'):
+            first = self.next_pk(Category)
+            self.category_ids = list(range(first, first + self.sizes['categories']))
+            self.insert(Category, ('id', 'title'), ((pk, f'Категория {pk}'[:30]) for pk in self.category_ids))
+            first_sub = self.next_pk(Subcategory)
+            subcategories = [
+                (first_sub + index, f'Подкатегория {first_sub + index}'[:30], category_id)
+                for index, category_id in enumerate(
+                    category_id for category_id in self.category_ids
+                    for _ in range(self.sizes['subcategories_per_category'])
+                )
+            ]
+            self.insert(Subcategory, ('id', 'title', 'category'), subcategories)
+            if placeholders:
+                self.insert(Image, ('image', 'content', 'category', 'subcategory'), itertools.chain(
+                    ((rng.choice(placeholders), 'Категория', pk, None) for pk in self.category_ids),
+                    ((rng.choice(placeholders), 'Подкатегория', None, pk) for pk, _, _ in subcategories),
+                ))
+        # Few categories hold most of the products.
+        self.category_weights = zipf_cum_weights(len(self.category_ids), 0.8)
+
+    def make_tags(self) -> None:
+        rng = self.rng('tags')
+        with self.stage('tags'):
+            first = self.next_pk(Tag)
+            self.tag_ids = list(range(first, first + self.sizes['tags']))
+            self.insert(Tag, ('id', 'name', 'category'), (
+                (pk, f'тег-{pk}'[:20], rng.choice(self.category_ids)) for pk in self.tag_ids
+            ))
+        # Long tail: a few tags are on many products, most on a handful.
+        self.tag_weights = zipf_cum_weights(len(self.tag_ids), 1.2)
+
+    def make_products(self, placeholders: list[str]) -> None:
+        rng = self.rng('products')
+        count = self.sizes['products']
+        first = self.next_pk(Product)
+        self.product_first = first
+        ranks = list(range(1, count + 1))
+        rng.shuffle(ranks)
+        # Products by popularity, the most popular first.
+        self.popular_ids = array('l', [0] * count)
+        for offset, rank in enumerate(ranks):
+            self.popular_ids[rank - 1] = first + offset
+        self.product_weights = zipf_cum_weights(count, 1.07)
+        self.prices = array('l')
+        category_total = self.category_weights[-1]
+        category_last = len(self.category_ids) - 1
+        tag_total = self.tag_weights[-1]
+        tag_last = len(self.tag_ids) - 1
+
+        def products():
+            for offset in range(count):
+                pk = first + offset
+                adjective, noun = rng.choice(_ADJECTIVES), rng.choice(_NOUNS)
+                title = f'{adjective} {noun} {pk}'
+                cents = min(max(int(rng.lognormvariate(8.5, 1.1)), 100), 10_000_000)
+                self.prices.append(cents)
+                stock = None if rng.random() < 0.7 else rng.randrange(0, 500)
+                listed = rng.random() < 0.95
+                category_index = min(bisect(self.category_weights, rng.random() * category_total), category_last)
+                rank = ranks[offset]
+                yield (
+                    pk, title, title.lower(), f'{adjective} {noun}',
+                    f'{adjective} {noun} для дома и работы. Артикул {pk}.',
+                    Decimal(cents) / 100, rng.random() < 0.2,
+                    # Like Product.save, tracked stock decides the availability.
+                    listed if stock is None else stock > 0, rank,
+                    self.category_ids[category_index], 0,
+                    self.now - timedelta(seconds=rng.randrange(730 * 24 * 3600)),
+                    max(0, min(5, round(5 - math.log10(rank) + rng.gauss(0, 0.7)))),
+                    rng.random() < 0.005, stock,
+                )
+
+        def images():
+            if not placeholders:
+                return
+            for product_id in range(first, first + count):
+                for number in range(self.sizes['images_per_product']):
+                    yield product_id, rng.choice(placeholders), f'Фото {number + 1}'
+
+        def specifications():
+            for product_id in range(first, first + count):
+                for name in rng.sample(_SPEC_NAMES, self.sizes['specs_per_product']):
+                    yield product_id, name, rng.choice(_SPEC_VALUES)
+
+        def tag_links():
+            mean = self.sizes['tags_per_product']
+            for product_id in range(first, first + count):
+                tag_indexes = {
+                    min(bisect(self.tag_weights, rng.random() * tag_total), tag_last)
+                    for _ in range(min(int(rng.expovariate(1 / mean)), 10))
+                } if mean else ()
+                for tag_index in sorted(tag_indexes):
+                    yield product_id, self.tag_ids[tag_index]
+
+        with self.stage('products'):
+            self.insert(Product, (
+                'id', 'title', 'searchTitle', 'description', 'fullDescription', 'price', 'freeDelivery',
+                'available', 'index', 'category', 'count', 'date', 'rating', 'limited', 'stock',
+            ), products())
+        with self.stage('product images'):
+            self.insert(ProductImage, ('product', 'image', 'content'), images())
+        with self.stage('specifications'):
+            self.insert(Specification, ('product', 'name', 'value'), specifications())
+        with self.stage('product tags'):
+            self.insert(Product.tags.through, ('product', 'tag'), tag_links())
+
+    def pick_products(self, rng: random.Random, count: int) -> list[int]:
+        return rng.choices(self.popular_ids, cum_weights=self.product_weights, k=count)
+
+    def make_reviews(self) -> None:
+        rng = self.rng('reviews')
+
+        def reviews():
+            remaining = self.sizes['reviews']
+            while remaining > 0:
+                chunk = min(remaining, self.batch_size)
+                for product_id in self.pick_products(rng, chunk):
+                    name = rng.choice(_FIRST_NAMES)
+                    yield (
+                        name, f'{rng.randrange(10 ** 6)}@example.com',
+                        'Отличный товар, рекомендую.' if rng.random() < 0.7 else 'Ожидал большего.',
+                        min(5, max(1, round(rng.gauss(4, 1)))),
+                        self.now - timedelta(seconds=rng.randrange(365 * 24 * 3600)), product_id,
+                    )
+                remaining -= chunk
+
+        with self.stage('reviews'):
+            self.insert(Review, ('author', 'email', 'text', 'rate', 'date', 'product'), reviews())
+
+    def make_sales(self) -> None:
+        rng = self.rng('sales')
+        count = min(self.sizes['sales'], self.sizes['products'])
+
+        def sales():
+            product_ids = range(self.product_first, self.product_first + self.sizes['products'])
+            for product_id in rng.sample(product_ids, count):
+                cents = self.prices[product_id - self.product_first]
+                start = self.now.date() + timedelta(days=rng.randrange(-10, 10))
+                yield (
+                    product_id, Decimal(cents * rng.randrange(50, 95) // 100) / 100, start.strftime('%m-%d'),
+                    (start + timedelta(days=rng.randrange(3, 30))).strftime('%m-%d'),
+                )
+
+        with self.stage('sales'):
+            self.insert(Sale, ('product', 'salePrice', 'dateFrom', 'dateTo'), sales())
+
+    def make_users(self) -> None:
+        rng = self.rng('users')
+        password = make_password('password')
+        first = self.next_pk(User)
+        count = self.sizes['users']
+        self.user_ids = list(range(first, first + count))
+        self.user_names = {}
+
+        def users():
+            for pk in self.user_ids:
+                yield (
+                    pk, f'customer{pk}', f'customer{pk}@example.com', password, '', '', False, False, True,
+                    self.now - timedelta(seconds=rng.randrange(730 * 24 * 3600)),
+                )
+
+        def profiles():
+            for pk in self.user_ids:
+                self.user_names[pk] = f'{rng.choice(_LAST_NAMES)} {rng.choice(_FIRST_NAMES)}'
+                yield pk, self.user_names[pk], f'customer{pk}@example.com', f'+7{pk:010d}'[:15]
+
+        with self.stage('users'):
+            self.insert(User, (
+                'id', 'username', 'email', 'password', 'first_name', 'last_name', 'is_superuser', 'is_staff',
+                'is_active', 'date_joined',
+            ), users())
+            self.insert(Profile, ('user', 'fullName', 'email', 'phone'), profiles())
+        # A few customers place most of the orders.
+        self.user_weights = zipf_cum_weights(count, 0.9) if count else []
+
+    def make_orders(self) -> None:
+        if not self.user_ids:
+            return
+        rng = self.rng('orders')
+        first = self.next_pk(Order)
+        count = self.sizes['orders']
+
+        def orders():
+            user_ids = rng.choices(self.user_ids, cum_weights=self.user_weights, k=count)
+            for pk, user_id in enumerate(user_ids, first):
+                yield (
+                    pk, user_id, self.now - timedelta(seconds=rng.randrange(365 * 24 * 3600)),
+                    self.user_names[user_id], f'customer{user_id}@example.com', f'+7{user_id:010d}',
+                    rng.choice(_CITIES), f'ул. Ленина, д. {rng.randrange(1, 200)}', int(rng.random() < 0.2),
+                    int(rng.random() < 0.5), rng.choices((2, 0, 1), weights=(85, 10, 5))[0],
+                )
+
+        def items():
+            mean = self.sizes['items_per_order']
+            for order_id in range(first, first + count):
+                size = min(1 + int(rng.expovariate(1 / mean)), 20)
+                for product_id in sorted(set(self.pick_products(rng, size))):
+                    yield (order_id, product_id, rng.randint(1, 3),
+                           Decimal(self.prices[product_id - self.product_first]) / 100)
+
+        with self.stage('orders'):
+            self.insert(Order, (
+                'id', 'user', 'date', 'fullName', 'email', 'phone', 'city', 'address', 'deliveryType',
+                'paymentType', 'status',
+            ), orders())
+        with self.stage('order items'):
+            self.insert(OrderItem, ('order', 'product', 'count', 'price'), items())
+        with self.stage('order totals'):
+            for start in range(first, first + count, self.batch_size):
+                update_order_totals(Order.objects.filter(pk__gte=start, pk__lt=start + self.batch_size))
+
+
+class Command(BaseCommand):
+    """
+    Fill the database with deterministic synthetic data.
+
+    Sizes of the dependent entities default to ratios of --products, every
+    size can be set explicitly. The same --seed and sizes always produce
+    the same rows. Placeholder images are drawn once by a process pool and
+    shared by all products.
+    """
+    help = 'Generate categories, tags, products, reviews, sales, customers and orders for scale testing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=10000, help='Number of products.')
+        parser.add_argument('--categories', type=int, help='Number of categories (default: products ** 0.35).')
+        parser.add_argument('--subcategories-per-category', type=int, help='Number of subcategories per category.')
+        parser.add_argument('--tags', type=int, help='Number of tags (default: products / 200).')
+        parser.add_argument('--tags-per-product', type=float, help='Average number of product tags.')
+        parser.add_argument('--specs-per-product', type=int, help='Number of specifications per product.')
+        parser.add_argument('--images-per-product', type=int, help='Number of images per product.')
+        parser.add_argument('--reviews', type=int, help='Number of reviews (default: products * 2).')
+        parser.add_argument('--sales', type=int, help='Number of sales (default: products / 100).')
+        parser.add_argument('--users', type=int, help='Number of customers (default: products / 10).')
+        parser.add_argument('--orders', type=int, help='Number of orders (default: products / 2).')
+        parser.add_argument('--items-per-order', type=float, help='Average number of order lines.')
+        parser.add_argument(
+            '--placeholders', type=int, help='Number of placeholder images (0 generates no images).',
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Random seed.')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Number of rows per insert.')
+        parser.add_argument('--workers', type=int, help='Number of processes drawing images (default: CPU count).')
+
+    def handle(self, *args, **options):
+        products = options['products']
+        if products < 1:
+            raise CommandError('--products must be positive')
+        sizes = seed_sizes(products, **{
+            name: options[name] for name in (
+                'categories', 'subcategories_per_category', 'tags', 'tags_per_product', 'specs_per_product',
+                'images_per_product', 'reviews', 'sales', 'users', 'orders', 'items_per_order', 'placeholders',
+            )
+        })
+        started = time.perf_counter()
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA synchronous = OFF')
+        Seeder(sizes, seed=options['seed'], batch_size=options['batch_size'], workers=options['workers'],
+               log=self.stdout.write).run()
+        self.stdout.write(f'Seeded {products} products in {time.perf_counter() - started:.1f}s')
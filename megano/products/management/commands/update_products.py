@@ -0,0 +1,67 @@
+"""
+Bulk changes of product prices, sales and status flags.
+"""
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.misc import PRODUCT_FLAGS, end_sales, reprice_products, set_product_flag, start_sale
+from products.models import Product
+
+
+class Command(BaseCommand):
+    """
+    Apply one bulk operation to the filtered products.
+
+    Every operation is a single UPDATE or DELETE statement (or batched
+    inserts for new sales), cached catalog pages are invalidated once.
+    """
+    help = 'Reprice products, start or end their sales, or turn their status flags on or off.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--category', type=int, action='append', help='Category primary key.')
+        parser.add_argument('--tag', type=int, action='append', help='Tag primary key.')
+        parser.add_argument('--ids', type=int, nargs='+', help='Product primary keys.')
+        parser.add_argument('--search', help='Prefix of the product title.')
+
+        operation = parser.add_mutually_exclusive_group(required=True)
+        operation.add_argument('--reprice-percent', type=Decimal, help='Change prices by the percentage.')
+        operation.add_argument('--reprice-amount', type=Decimal, help='Change prices by the amount.')
+        operation.add_argument('--start-sale', type=Decimal, metavar='PERCENT', help='Start sale with the discount.')
+        operation.add_argument('--end-sales', action='store_true', help='End sales of the products.')
+        operation.add_argument('--flag-on', choices=PRODUCT_FLAGS, help='Turn the status flag on.')
+        operation.add_argument('--flag-off', choices=PRODUCT_FLAGS, help='Turn the status flag off.')
+
+        parser.add_argument('--days', type=int, default=7, help='Sale duration in days.')
+
+    def handle(self, *args, **options):
+        products = Product.objects.all()
+        if options['category']:
+            products = products.filter(category__in=options['category'])
+        if options['tag']:
+            products = products.filter(pk__in=Product.tags.through.objects.filter(
+                tag__in=options['tag'],
+            ).values('product'))
+        if options['ids']:
+            products = products.filter(pk__in=options['ids'])
+        if options['search']:
+            key = options['search'].lower()
+            products = products.filter(searchTitle__gte=key, searchTitle__lt=key + '\U0010ffff')
+
+        if options['reprice_percent'] is not None:
+            count = reprice_products(products, percent=options['reprice_percent'])
+            self.stdout.write(f'Repriced {count} products')
+        elif options['reprice_amount'] is not None:
+            count = reprice_products(products, amount=options['reprice_amount'])
+            self.stdout.write(f'Repriced {count} products')
+        elif options['start_sale'] is not None:
+            if options['days'] < 1:
+                raise CommandError('--days must be positive')
+            count = start_sale(products, options['start_sale'], options['days'])
+            self.stdout.write(f'Started {count} sales')
+        elif options['end_sales']:
+            self.stdout.write(f'Ended {end_sales(products)} sales')
+        else:
+            flag = options['flag_on'] or options['flag_off']
+            count = set_product_flag(products, flag, bool(options['flag_on']))
+            self.stdout.write(f'Changed {flag} of {count} products')
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 22:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_sale'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='stock',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Остаток на складе'),
+        ),
+    ]
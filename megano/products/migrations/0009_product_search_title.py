@@ -0,0 +1,34 @@
+# Generated by Django 5.1.4 on 2026-10-18 22:20
+
+from django.db import migrations, models
+
+
+def fill_search_title(apps, schema_editor):
+    """
+    Fill search titles of the existing products in batches.
+    """
+    Product = apps.get_model('products', 'Product')
+    batch = []
+    for product in Product.objects.only('pk', 'title').iterator(chunk_size=1000):
+        product.searchTitle = product.title.lower()
+        batch.append(product)
+        if len(batch) == 1000:
+            Product.objects.bulk_update(batch, ['searchTitle'])
+            batch = []
+    Product.objects.bulk_update(batch, ['searchTitle'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_product_stock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='searchTitle',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=50),
+        ),
+        migrations.RunPython(fill_search_title, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,198 @@
+"""
+Misc functions for products app.
+
+Bulk operations over product sets (repricing, sales, status flags and tags)
+run as single set-based statements or batched inserts, so changing a
+filtered admin changelist costs the same number of queries for ten products
+and for ten thousand. They do not call Product.save and do not send model
+signals; cached catalog pages are invalidated once per operation after the
+transaction commits.
+"""
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Case, F, QuerySet, Value, When
+from django.db.models.functions import Greatest, Round
+from django.utils import timezone
+
+from megano.cache import invalidate_cached_pages
+from .models import Product, Sale, Tag
+
+PRODUCT_FLAGS = ('freeDelivery', 'available', 'limited')
+SALE_DATE_FORMAT = '%m-%d'
+
+
+def _invalidate_catalog(using: str) -> None:
+    transaction.on_commit(invalidate_cached_pages, using=using)
+
+
+def reprice_products(products: QuerySet, *, percent: Decimal = None, amount: Decimal = None) -> int:
+    """
+    Change prices of the products by a percentage or by an absolute amount.
+
+    Prices are rounded to cents and never become negative.
+
+    Args:
+        products: Products to reprice.
+        percent: Price change in percent (negative to reduce prices).
+        amount: Price change in money (negative to reduce prices).
+
+    Returns:
+        int: Number of repriced products.
+
+    Raises:
+        ValueError: If neither or both of percent and amount are given.
+    """
+    if (percent is None) == (amount is None):
+        raise ValueError('Pass either percent or amount')
+    price_field = Product._meta.get_field('price')
+    if percent is not None:
+        price = F('price') * Value(1 + Decimal(percent) / 100, output_field=price_field)
+    else:
+        price = F('price') + Value(Decimal(amount), output_field=price_field)
+    count = products.order_by().update(price=Greatest(
+        Round(price, 2, output_field=price_field),
+        Value(Decimal('0'), output_field=price_field),
+        output_field=price_field,
+    ))
+    _invalidate_catalog(products.db)
+    return count
+
+
+def set_product_flag(products: QuerySet, flag: str, value: bool) -> int:
+    """
+    Turn product status flag on or off.
+
+    Products with an empty tracked stock stay unavailable.
+
+    Args:
+        products: Products to change.
+        flag: One of PRODUCT_FLAGS.
+        value: New flag value.
+
+    Returns:
+        int: Number of changed products.
+
+    Raises:
+        ValueError: If the flag is unknown.
+    """
+    if flag not in PRODUCT_FLAGS:
+        raise ValueError(f'Unknown product flag {flag!r}')
+    new_value = Value(value)
+    if flag == 'available' and value:
+        new_value = Case(When(stock=0, then=Value(False)), default=Value(True))
+    count = products.order_by().update(**{flag: new_value})
+    _invalidate_catalog(products.db)
+    return count
+
+
+def start_sale(products: QuerySet, percent: Decimal, days: int, batch_size: int = None) -> int:
+    """
+    Put the products on sale with a percentage discount.
+
+    Sale rows are created with bulk inserts of batch_size rows, sale prices
+    are computed from the current product prices.
+
+    Args:
+        products: Products to put on sale.
+        percent: Discount in percent.
+        days: Sale duration in days starting today.
+        batch_size: Number of rows per insert. Defaults to PRODUCT_BULK_BATCH_SIZE.
+
+    Returns:
+        int: Number of created sales.
+    """
+    batch_size = batch_size or settings.PRODUCT_BULK_BATCH_SIZE
+    factor = 1 - Decimal(percent) / 100
+    today = timezone.localdate()
+    date_from = today.strftime(SALE_DATE_FORMAT)
+    date_to = (today + timedelta(days=days)).strftime(SALE_DATE_FORMAT)
+    count = 0
+    batch = []
+    with transaction.atomic(using=products.db):
+        for product_id, price in products.order_by().values_list('pk', 'price').iterator(chunk_size=batch_size):
+            sale_price = max((price * factor).quantize(Decimal('0.01'), ROUND_HALF_UP), Decimal('0'))
+            batch.append(Sale(product_id=product_id, salePrice=sale_price, dateFrom=date_from, dateTo=date_to))
+            if len(batch) >= batch_size:
+                count += len(Sale.objects.using(products.db).bulk_create(batch))
+                batch = []
+        count += len(Sale.objects.using(products.db).bulk_create(batch))
+    _invalidate_catalog(products.db)
+    return count
+
+
+def end_sales(products: QuerySet) -> int:
+    """
+    Take the products off sale.
+
+    The storefront lists every Sale row, so ending a sale deletes it.
+
+    Args:
+        products: Products to take off sale.
+
+    Returns:
+        int: Number of ended sales.
+    """
+    count = Sale.objects.using(products.db).filter(product__in=products.order_by().values('pk')).delete()[0]
+    _invalidate_catalog(products.db)
+    return count
+
+
+def attach_tag(tag: Tag, products: QuerySet) -> int:
+    """
+    Attach tag to every product of the queryset that does not have it yet.
+
+    Runs one INSERT ... SELECT statement. Like the other bulk operations it
+    does not send m2m_changed signals.
+
+    Args:
+        tag: Tag to attach.
+        products: Products the tag is attached to.
+
+    Returns:
+        int: Number of products the tag was attached to.
+    """
+    through = Tag.products.through
+    connection = connections[products.db]
+    quote = connection.ops.quote_name
+    table = quote(through._meta.db_table)
+    tag_column = quote(through._meta.get_field('tag').column)
+    product_column = quote(through._meta.get_field('product').column)
+    select_sql, params = products.order_by().values('pk').query.sql_with_params()
+    pk_column = quote(products.model._meta.pk.column)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({tag_column}, {product_column}) '
+            f'SELECT %s, selected.{pk_column} FROM ({select_sql}) selected '
+            f'WHERE NOT EXISTS (SELECT 1 FROM {table} linked '
+            f'WHERE linked.{tag_column} = %s AND linked.{product_column} = selected.{pk_column})',
+            [tag.pk, *params, tag.pk],
+        )
+        count = cursor.rowcount
+    _invalidate_catalog(products.db)
+    return count
+
+
+def detach_tag(tag: Tag, products: QuerySet) -> int:
+    """
+    Detach tag from every product of the queryset.
+
+    Runs one DELETE statement (the through table has no dependent rows, so
+    the rows are not collected first). Like the other bulk operations it
+    does not send m2m_changed signals.
+
+    Args:
+        tag: Tag to detach.
+        products: Products the tag is detached from.
+
+    Returns:
+        int: Number of products the tag was detached from.
+    """
+    through = Tag.products.through
+    count = through.objects.using(products.db).filter(
+        tag=tag, product__in=products.order_by().values('pk'),
+    ).delete()[0]
+    _invalidate_catalog(products.db)
+    return count
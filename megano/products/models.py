@@ -38,9 +38,11 @@ class Product(models.Model):
     Meta:
         verbose_name: representing name of model.
         verbose_name_plural: plural form of verbose_name.
+        indexes: Indexes of the catalog filters and sort orders.
 
     Attributes:
         title: Title of the product.
+        searchTitle: Lowercased title used by the indexed prefix search.
         description: Short description of the product.
         fullDescription: Full product description.
         price: Product price.
@@ -49,15 +51,28 @@ class Product(models.Model):
         index: Index of sorting (used to popularity of product).
         category: Which category product is associated with.
         count: Count of products (used in orders)
+        stock: Number of items in stock (empty if stock is not tracked).
         date: Date the product was added.
         rating: Rating of a product.
         limited: Is product limited or not.
+
+    Methods:
+        save: Save product deriving availability from the stock and the search title from the title.
     """
     class Meta:
         verbose_name = 'Товар'
         verbose_name_plural = 'Товары'
+        indexes = [
+            models.Index(fields=['category', 'price', 'available'], name='product_catalog_idx'),
+            models.Index(fields=['price'], name='product_price_idx'),
+            models.Index(fields=['rating'], name='product_rating_idx'),
+            models.Index(fields=['date'], name='product_date_idx'),
+            models.Index(fields=['index'], name='product_index_idx'),
+            models.Index(fields=['id'], condition=models.Q(limited=True), name='product_limited_idx'),
+        ]
 
     title = models.CharField(max_length=50, null=False, verbose_name='Название')
+    searchTitle = models.CharField(max_length=50, default='', db_index=True, editable=False)
     description = models.CharField(max_length=50, null=False, verbose_name='Описание')
     fullDescription = models.TextField(max_length=1000, null=False, verbose_name='Полное описание')
     price = models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Цена')
@@ -75,10 +90,17 @@ class Product(models.Model):
     date = models.DateTimeField(auto_now_add=True)
     rating = models.IntegerField(default=0, verbose_name='Рейтинг')
     limited = models.BooleanField(default=False, verbose_name='Лимитированный')
+    stock = models.PositiveIntegerField(null=True, blank=True, verbose_name='Остаток на складе')
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        if self.stock is not None:
+            self.available = self.stock > 0
+        self.searchTitle = self.title.lower()
+        super().save(*args, **kwargs)
+
 class Category(models.Model):
     """
     Represents category
@@ -182,6 +204,7 @@ class Review(models.Model):
     Meta:
         verbose_name: representing name of the model.
         verbose_name_plural: plural form of the verbose_name.
+        indexes: Index of the product reviews in publication order.
 
     Attributes:
         author: Review author name.
@@ -194,6 +217,9 @@ class Review(models.Model):
     class Meta:
         verbose_name = 'Отзыв'
         verbose_name_plural = 'Отзывы'
+        indexes = [
+            models.Index(fields=['product', 'date'], name='review_product_date_idx'),
+        ]
 
     author = models.CharField(max_length=30, verbose_name='Автор')
     email = models.EmailField()
@@ -124,9 +124,14 @@ class ProductSerializer(serializers.ModelSerializer):
         """
         Method that returns Product instance reviews count.
 
+        Uses review_count annotation if the queryset provides it.
+
         Returns:
             int: Number of reviews.
         """
+        review_count = getattr(instance, 'review_count', None)
+        if review_count is not None:
+            return review_count
         return instance.reviews.count()
 
 
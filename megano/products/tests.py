@@ -0,0 +1,330 @@
+"""
+Products app tests.
+"""
+import threading
+import time
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from megano.cache import coalesced_cache_page, invalidate_cached_pages
+from orders.models import Order
+from .models import Category, Product, Sale, Tag
+from .management.commands.api_benchmark import ROUTES, SKIPPED_ROUTES, compare_results, get_api_routes
+from .management.commands.seed import Seeder, seed_sizes
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+# Tables that endpoints read whole by design.
+SMALL_TABLES = {
+    # The categories endpoint returns the whole category tree.
+    'products_category', 'products_subcategory',
+}
+
+# Endpoints with their query parameters and the plan steps expected for them.
+ENDPOINTS = [
+    ('catalog', '/api/catalog/', {}, ()),
+    ('catalog by category', '/api/catalog/', {'category': '{category}', 'filter[available]': 'true'}, ()),
+    ('catalog by price range', '/api/catalog/', {
+        'category': '{category}', 'filter[available]': 'true', 'filter[minPrice]': '10', 'filter[maxPrice]': '60',
+    }, ()),
+    ('catalog by rating', '/api/catalog/', {'sort': 'rating', 'sortType': 'dec'}, ()),
+    ('catalog by date', '/api/catalog/', {'sort': 'date', 'sortType': 'dec'}, ()),
+    # Products of the tags are found in the tag index, which can't give them in
+    # price order, so the page of one tag's products is sorted.
+    ('catalog by tag', '/api/catalog/', {'tags[]': '{tag}'}, ('USE TEMP B-TREE FOR ORDER BY',)),
+    ('product', '/api/product/{product}/', {}, ()),
+    # Tags of one category are sorted by their product count, which is computed by the query.
+    ('tags', '/api/tags/', {'category': '{category}'}, ('USE TEMP B-TREE FOR ORDER BY',)),
+    ('categories', '/api/categories/', {}, ()),
+    ('limited products', '/api/products/limited', {}, ()),
+    ('popular products', '/api/products/popular', {}, ()),
+    # Sale pages are read in primary key order, the scan stops after the page.
+    ('sales', '/api/sales', {}, ('SCAN products_sale',)),
+    ('basket', '/api/basket', {}, ()),
+    ('orders', '/api/orders', {}, ()),
+    ('order', '/api/order/{order}', {}, ()),
+    ('profile', '/api/profile', {}, ()),
+]
+
+
+def find_plan_problem(detail: str, tables: set[str]) -> str | None:
+    """
+    Check one step of an SQLite query plan.
+
+    Args:
+        detail: Step description from EXPLAIN QUERY PLAN.
+        tables: Names of the database tables.
+
+    Returns:
+        str | None: Problem description or None if the step is fine.
+    """
+    if detail.startswith('USE TEMP B-TREE'):
+        return 'temp sort'
+    if detail.startswith('SCAN ') and ' USING ' not in detail:
+        table = detail.split()[1]
+        if table in tables and table not in SMALL_TABLES:
+            return 'full scan'
+    return None
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CoalescedCachePageTests(SimpleTestCase):
+    """
+    Tests of the page cache stampede protection.
+    """
+    key_prefix = 'coalesced-test'
+    clients = 8
+
+    def setUp(self):
+        caches['default'].clear()
+        self.calls = 0
+        self.calls_lock = threading.Lock()
+
+        def view(request):
+            with self.calls_lock:
+                self.calls += 1
+            time.sleep(0.2)
+            return HttpResponse(f'page {self.calls}')
+
+        self.view = coalesced_cache_page(60, beta=0, cache='default', key_prefix=self.key_prefix)(view)
+        self.factory = RequestFactory()
+
+    def get(self) -> HttpResponse:
+        return self.view(self.factory.get('/catalog/'))
+
+    def test_concurrent_misses_compute_page_once(self):
+        barrier = threading.Barrier(self.clients)
+        contents = []
+
+        def client():
+            barrier.wait()
+            contents.append(self.get().content)
+
+        threads = [threading.Thread(target=client) for _ in range(self.clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(contents, [b'page 1'] * self.clients)
+
+    def test_pages_are_cached_per_vary_header(self):
+        def view(request):
+            self.calls += 1
+            response = HttpResponse(f'page as {request.headers["Accept"]}')
+            response['Vary'] = 'Accept'
+            return response
+
+        view = coalesced_cache_page(60, beta=0, cache='default', key_prefix=self.key_prefix)(view)
+        for accept in ('text/html', 'application/json', 'text/html', 'application/json'):
+            response = view(self.factory.get('/catalog/', headers={'Accept': accept}))
+            self.assertEqual(response.content, f'page as {accept}'.encode())
+        self.assertEqual(self.calls, 2)
+
+    def test_invalidation_recomputes_page(self):
+        self.assertEqual(self.get().content, b'page 1')
+        self.assertEqual(self.get().content, b'page 1')
+        invalidate_cached_pages(self.key_prefix, cache='default')
+        self.assertEqual(self.get().content, b'page 2')
+        self.assertEqual(self.calls, 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CatalogTagFilterTests(TestCase):
+    """
+    Tests of the catalog filter by tags.
+    """
+    def test_product_of_several_tags_is_listed_once(self):
+        product = Product.objects.create(title='Phone', description='Phone', fullDescription='Phone', price=10)
+        Product.objects.create(title='Case', description='Case', fullDescription='Case', price=5)
+        category = Category.objects.create(title='Phones')
+        for name in ('new', 'hit'):
+            Tag.objects.create(name=name, category=category).products.add(product)
+        tag_ids = list(Tag.objects.values_list('pk', flat=True))
+        response = self.client.get('/api/catalog/', {'tags[]': tag_ids})
+        self.assertEqual([item['id'] for item in response.json()['items']], [product.pk])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ProductAdminActionTests(TestCase):
+    """
+    Tests of the bulk actions of the product changelist.
+    """
+    url = '/admin/products/product/'
+
+    def setUp(self):
+        self.phone = Product.objects.create(title='Phone', description='Phone', fullDescription='Phone', price=10)
+        self.phablet = Product.objects.create(title='Phablet', description='Phablet', fullDescription='Phablet',
+                                              price=Decimal('9.99'))
+        self.case = Product.objects.create(title='Case', description='Case', fullDescription='Case', price=5)
+        self.tag = Tag.objects.create(name='new', category=Category.objects.create(title='Phones'))
+        self.client.force_login(User.objects.create_superuser('admin'))
+
+    def run_action(self, action: str, products: list[Product], **params):
+        return self.client.post(self.url, {
+            'action': action,
+            '_selected_action': [product.pk for product in products],
+            **params,
+        }, follow=True)
+
+    def test_tag_is_attached_once(self):
+        self.tag.products.add(self.phone)
+        self.run_action('attach_tag', [self.phone, self.phablet], tag=self.tag.pk)
+        self.assertEqual(set(self.tag.products.all()), {self.phone, self.phablet})
+        self.assertEqual(Tag.products.through.objects.count(), 2)
+
+    def test_tag_is_detached_from_selected_products(self):
+        self.tag.products.add(self.phone, self.case)
+        self.run_action('detach_tag', [self.phone, self.phablet], tag=self.tag.pk)
+        self.assertEqual(list(self.tag.products.all()), [self.case])
+
+    def test_action_without_tag_changes_nothing(self):
+        response = self.run_action('attach_tag', [self.phone])
+        self.assertContains(response, 'Выберите тег.')
+        self.assertFalse(self.tag.products.exists())
+
+    def prices(self) -> list[Decimal]:
+        return list(Product.objects.order_by('pk').values_list('price', flat=True))
+
+    def test_prices_change_by_percent(self):
+        self.run_action('reprice_by_percent', [self.phone, self.phablet], value='-15')
+        self.assertEqual(self.prices(), [Decimal('8.50'), Decimal('8.49'), Decimal('5.00')])
+
+    def test_prices_do_not_become_negative(self):
+        self.run_action('reprice_by_amount', [self.phone, self.case], value='-7')
+        self.assertEqual(self.prices(), [Decimal('3.00'), Decimal('9.99'), Decimal('0.00')])
+
+    def test_sale_prices_follow_product_prices(self):
+        self.run_action('start_sale', [self.phone, self.phablet], value='10', days=3)
+        self.assertEqual(dict(Sale.objects.values_list('product_id', 'salePrice')),
+                         {self.phone.pk: Decimal('9.00'), self.phablet.pk: Decimal('8.99')})
+        self.run_action('end_sales', [self.phone])
+        self.assertEqual(list(Sale.objects.values_list('product_id', flat=True)), [self.phablet.pk])
+
+    def test_product_without_stock_stays_unavailable(self):
+        Product.objects.filter(pk=self.case.pk).update(stock=0, available=False)
+        Product.objects.update(available=False)
+        self.run_action('turn_flag_on', [self.phone, self.case], flag='available')
+        self.assertEqual(list(Product.objects.order_by('pk').values_list('available', flat=True)),
+                         [True, False, False])
+
+    def test_bulk_change_invalidates_cached_pages(self):
+        with mock.patch('products.misc.invalidate_cached_pages') as invalidate:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.run_action('turn_flag_off', [self.phone], flag='limited')
+        invalidate.assert_called_once()
+
+    def test_product_autocomplete_searches_by_prefix(self):
+        response = self.client.get('/admin/autocomplete/', {
+            'term': 'PH', 'app_label': 'orders', 'model_name': 'orderitem', 'field_name': 'product',
+        })
+        self.assertEqual([item['id'] for item in response.json()['results']],
+                         [str(self.phablet.pk), str(self.phone.pk)])
+
+
+class ApiBenchmarkTests(SimpleTestCase):
+    """
+    Tests of the API benchmark cases and the baseline comparison.
+    """
+    def result(self, **metrics) -> dict:
+        return {'small': {'catalog': {
+            'p50_ms': 10, 'p95_ms': 20, 'p99_ms': 30, 'sql_ms': 5, 'serializer_ms': 2,
+            'response_bytes': 1000, 'queries': 4, **metrics,
+        }}}
+
+    def test_every_api_route_is_benchmarked(self):
+        self.assertEqual([name for name in get_api_routes() if name not in ROUTES and name not in SKIPPED_ROUTES], [])
+
+    def test_small_timing_changes_are_ignored(self):
+        self.assertEqual(compare_results(self.result(), self.result(p50_ms=11.5), threshold=10, min_delta=2), [])
+
+    def test_regressions_are_reported(self):
+        regressions = compare_results(self.result(), self.result(p95_ms=30, response_bytes=1200, queries=5),
+                                      threshold=10, min_delta=2)
+        self.assertEqual(regressions, [
+            'small / catalog / p95_ms: 20 -> 30 (+50%)',
+            'small / catalog / response_bytes: 1000 -> 1200 (+20%)',
+            'small / catalog / queries: 4 -> 5 (+25%)',
+        ])
+
+    def test_new_cases_are_not_compared(self):
+        self.assertEqual(compare_results({}, self.result(), threshold=10, min_delta=2), [])
+
+
+class SeederTests(TestCase):
+    """
+    Tests of the synthetic catalog data.
+    """
+    def test_tracked_stock_decides_availability(self):
+        Seeder(seed_sizes(300, placeholders=0)).run()
+        tracked = Product.objects.filter(stock__isnull=False)
+        self.assertTrue(tracked.exists())
+        self.assertFalse(tracked.filter(stock=0, available=True).exists())
+        self.assertFalse(tracked.filter(stock__gt=0, available=False).exists())
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Query plans are checked on SQLite')
+@override_settings(CACHES=LOCMEM_CACHES)
+class QueryPlanTests(TestCase):
+    """
+    Query plans of the API endpoints at a seeded data size.
+
+    Plans of the SELECT queries of every endpoint must not contain full scans
+    of large tables or temporary sort trees, except the steps expected for
+    the endpoint.
+    """
+    product_count = 2000
+
+    @classmethod
+    def setUpTestData(cls):
+        seeder = Seeder(seed_sizes(cls.product_count, placeholders=0))
+        seeder.run()
+        user_id = seeder.user_ids[0]
+        cls.user = User.objects.get(pk=user_id)
+        cls.values = {
+            'category': seeder.category_ids[0],
+            'tag': seeder.tag_ids[0],
+            'product': seeder.popular_ids[0],
+            'order': Order.objects.filter(user_id=user_id).values_list('pk', flat=True).first(),
+        }
+        cls.tables = set(connection.introspection.table_names())
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def get_queries(self, url: str, params: dict) -> list[tuple[str, tuple]]:
+        queries = []
+
+        def record(execute, sql, params_, many, context):
+            queries.append((sql, params_))
+            return execute(sql, params_, many, context)
+
+        invalidate_cached_pages()
+        with connection.execute_wrapper(record):
+            response = self.client.get(url.format(**self.values), {
+                key: value.format(**self.values) for key, value in params.items()
+            })
+        self.assertEqual(response.status_code, 200)
+        return [(sql, params_) for sql, params_ in queries if sql.lstrip().upper().startswith('SELECT')]
+
+    def test_endpoint_plans(self):
+        for name, url, params, expected in ENDPOINTS:
+            with self.subTest(name):
+                problems = []
+                for sql, params_ in self.get_queries(url, params):
+                    with connection.cursor() as cursor:
+                        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params_)
+                        plan = [row[3] for row in cursor.fetchall()]
+                    problems.extend(
+                        f'{problem}: {step} in {sql}'
+                        for step, problem in ((step, find_plan_problem(step, self.tables)) for step in plan)
+                        if problem and not step.startswith(expected)
+                    )
+                self.assertEqual(problems, [])
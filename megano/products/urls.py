@@ -2,22 +2,27 @@
 Module with urlpatterns for products app.
 
 Attributes:
+    cache_page: Page cache decorator with stampede protection used by catalog views.
     urlpatterns: List of url paths that are available for products app.
 """
 from django.urls import path
-from django.views.decorators.cache import cache_page
+from django.conf import settings
 
+from megano.cache import coalesced_cache_page
 from .views import CatalogView, ProductRetrieveView, CreateReviewView, TagView, CategoryListView, LimitedProductsView, \
     PopularProductsView, BannersView, SalesView
 
+
+cache_page = coalesced_cache_page(60 * 3, stale_while_revalidate=settings.PAGE_CACHE_STALE_SECONDS)
+
 urlpatterns: list[path] = [
-    path('catalog/', cache_page(60 * 3)(CatalogView.as_view()), name='catalog'),
-    path('product/<int:pk>/', cache_page(60 * 3)(ProductRetrieveView.as_view()), name='product_retrieve'),
+    path('catalog/', cache_page(CatalogView.as_view()), name='catalog'),
+    path('product/<int:pk>/', cache_page(ProductRetrieveView.as_view()), name='product_retrieve'),
     path('product/<int:pk>/reviews', CreateReviewView.as_view(), name='create_review'),
-    path('tags/', cache_page(60 * 3)(TagView.as_view()), name='tags_list'),
-    path('categories/', cache_page(60 * 3)(CategoryListView.as_view()), name='category_list'),
-    path('products/limited', cache_page(60 * 3)(LimitedProductsView.as_view()), name='limited-products'),
-    path('products/popular', cache_page(60 * 3)(PopularProductsView.as_view()), name='popular-products'),
-    path('banners', cache_page(60 * 3)(BannersView.as_view()), name='banners'),
-    path('sales', cache_page(60 * 3)(SalesView.as_view()), name='sales'),
+    path('tags/', cache_page(TagView.as_view()), name='tags_list'),
+    path('categories/', cache_page(CategoryListView.as_view()), name='category_list'),
+    path('products/limited', cache_page(LimitedProductsView.as_view()), name='limited-products'),
+    path('products/popular', cache_page(PopularProductsView.as_view()), name='popular-products'),
+    path('banners', cache_page(BannersView.as_view()), name='banners'),
+    path('sales', cache_page(SalesView.as_view()), name='sales'),
 ]
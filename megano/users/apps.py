@@ -13,7 +13,13 @@ class UsersConfig(AppConfig):
         default_auto_field: A field that automatically increases when an object is added.
         name: Name of the app.
         verbose_name: Representing name of the app.
+
+    Methods:
+        ready: Connect app signal receivers.
     """
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
     verbose_name = 'Пользователи'
+
+    def ready(self):
+        from . import signals  # noqa: F401
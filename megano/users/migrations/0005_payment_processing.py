@@ -0,0 +1,40 @@
+# Generated by Django 5.1.4 on 2026-10-18 22:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_order_totals'),
+        ('users', '0004_sitesetting'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, null=True, verbose_name='Создан'),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='error',
+            field=models.CharField(blank=True, default='', max_length=100, verbose_name='Ошибка'),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='order',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='orders.order', verbose_name='Заказ'),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='processed',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Обработан'),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='status',
+            field=models.IntegerField(choices=[(0, 'В очереди'), (1, 'Обрабатывается'), (2, 'Проведен'), (3, 'Отклонен')], db_index=True, default=0, verbose_name='Статус'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.4 on 2026-10-18 23:12
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_claimed(apps, schema_editor):
+    """
+    Treat payments in processing as claimed when they were submitted.
+    """
+    Payment = apps.get_model('users', 'Payment')
+    Payment.objects.filter(status=1).update(claimed=F('created'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_payment_processing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='claimed',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Взят в обработку'),
+        ),
+        migrations.RunPython(fill_claimed, migrations.RunPython.noop),
+    ]
@@ -96,12 +96,25 @@ class Payment(models.Model):
         verbose_name_plural: plural form of verbose_name.
 
     Attributes:
+        Status: Payment processing statuses.
         number: Credit card number.
         name: Name on credit card.
         month: Expiration month.
         year: Expiration year.
         code: CVV/CVC code of the credit card.
+        order: Paid order.
+        status: Current processing status.
+        error: Error returned by the payment provider.
+        created: When payment was submitted.
+        claimed: When payment was claimed by a worker last time.
+        processed: When payment processing was finished.
     """
+    class Status(models.IntegerChoices):
+        PENDING = 0, 'В очереди'
+        PROCESSING = 1, 'Обрабатывается'
+        SUCCEEDED = 2, 'Проведен'
+        FAILED = 3, 'Отклонен'
+
     number = models.IntegerField(
         null=False,
         validators=[validate_even, validate_length],
@@ -111,6 +124,23 @@ class Payment(models.Model):
     month = models.CharField(max_length=2, null=False, verbose_name='Месяц')
     year = models.CharField(max_length=4, null=False, verbose_name='Год')
     code = models.CharField(max_length=3, null=False, verbose_name='CVV/CVC код')
+    order = models.ForeignKey(
+        to='orders.Order',
+        on_delete=models.CASCADE,
+        null=True,
+        related_name='payments',
+        verbose_name='Заказ',
+    )
+    status = models.IntegerField(
+        choices=Status.choices,
+        default=Status.PENDING,
+        db_index=True,
+        verbose_name='Статус',
+    )
+    error = models.CharField(max_length=100, blank=True, default='', verbose_name='Ошибка')
+    created = models.DateTimeField(auto_now_add=True, null=True, verbose_name='Создан')
+    claimed = models.DateTimeField(null=True, blank=True, verbose_name='Взят в обработку')
+    processed = models.DateTimeField(null=True, blank=True, verbose_name='Обработан')
 
     class Meta:
         verbose_name = 'Платежная система'
@@ -132,6 +162,8 @@ class SiteSetting(models.Model):
     Methods:
         __str__:
             Represents setting key instead of the primary key.
+        clean:
+            Validates value against the declared setting type.
     """
     key = models.CharField(max_length=100, unique=True, verbose_name="Ключ")
     value = models.TextField(verbose_name="Значение")
@@ -142,3 +174,8 @@ class SiteSetting(models.Model):
 
     def __str__(self):
         return self.key
+
+    def clean(self):
+        from .site_settings import coerce_setting
+
+        coerce_setting(self.key, self.value)
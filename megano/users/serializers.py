@@ -55,4 +55,4 @@ class PaymentSerializer(serializers.ModelSerializer):
     """
     class Meta:
         model = Payment
-        fields = '__all__'
+        fields = 'number', 'name', 'month', 'year', 'code'
@@ -0,0 +1,17 @@
+"""
+Signal receivers for users app models.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import SiteSetting
+from .site_settings import site_settings
+
+
+@receiver([post_save, post_delete], sender=SiteSetting)
+def invalidate_site_settings(sender, **kwargs) -> None:
+    """
+    Make every worker reload site settings after one of them was changed.
+    """
+    transaction.on_commit(site_settings.invalidate)
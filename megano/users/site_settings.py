@@ -0,0 +1,140 @@
+"""
+Typed registry of site global settings.
+
+All SiteSetting rows are loaded with a single query into an in-process map of
+typed values. Every save or delete of a setting bumps a version key in the
+cache, so the other worker processes notice the change and reload the map.
+
+Attributes:
+    JSON: Marker of the settings that store JSON documents.
+    SETTING_DEFINITIONS: Declared settings with their types and default values.
+    site_settings: Registry instance used by the project.
+"""
+import json
+import threading
+import time
+from decimal import Decimal, InvalidOperation
+from typing import Any
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+
+from megano.cache import bump_version
+
+JSON = 'json'
+
+SETTING_DEFINITIONS: dict[str, tuple[Any, Any]] = {
+    'express_delivery_price': (Decimal, Decimal('5')),
+    'free_delivery_min_price': (Decimal, Decimal('20')),
+    'default_delivery_price': (Decimal, Decimal('2')),
+}
+
+_TRUE_VALUES = ('1', 'true', 'yes', 'on')
+_FALSE_VALUES = ('0', 'false', 'no', 'off', '')
+
+
+def coerce_setting(key: str, raw_value: str) -> Any:
+    """
+    Convert raw setting value to the declared type.
+
+    Args:
+        key: Setting key.
+        raw_value: Value as it is stored in the database.
+
+    Returns:
+        Any: Typed value. Undeclared settings are returned as strings.
+
+    Raises:
+        ValidationError: If the value can't be converted to the declared type.
+    """
+    definition = SETTING_DEFINITIONS.get(key)
+    if definition is None:
+        return raw_value
+    value_type = definition[0]
+    try:
+        if value_type is bool:
+            value = raw_value.strip().lower()
+            if value not in _TRUE_VALUES + _FALSE_VALUES:
+                raise ValueError(raw_value)
+            return value in _TRUE_VALUES
+        if value_type == JSON:
+            return json.loads(raw_value)
+        return value_type(raw_value.strip())
+    except (ValueError, TypeError, InvalidOperation):
+        raise ValidationError(
+            '%(value)s is not a valid value for %(key)s',
+            params={'value': raw_value, 'key': key},
+        )
+
+
+class SiteSettingsRegistry:
+    """
+    In-process map of typed site settings.
+
+    Attributes:
+        version_key: Cache key of the settings version shared by all workers.
+
+    Methods:
+        get: Get setting value.
+        invalidate: Bump shared settings version.
+    """
+    version_key = 'site_settings_version'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values: dict[str, Any] | None = None
+        self._version = None
+        self._checked_at = 0.0
+
+    def _load(self, version) -> None:
+        from .models import SiteSetting
+
+        values = {}
+        for key, raw_value in SiteSetting.objects.values_list('key', 'value'):
+            try:
+                values[key] = coerce_setting(key, raw_value)
+            except ValidationError:
+                continue
+        self._values = values
+        self._version = version
+
+    def _ensure_loaded(self) -> dict[str, Any]:
+        now = time.monotonic()
+        if self._values is not None and now - self._checked_at < settings.SITE_SETTINGS_CHECK_INTERVAL:
+            return self._values
+        with self._lock:
+            version = cache.get(self.version_key)
+            if self._values is None or version != self._version:
+                self._load(version)
+            self._checked_at = now
+            return self._values
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Get setting value.
+
+        Args:
+            key: Name of setting to retrieve.
+            default: Value used if the setting is neither stored nor declared.
+
+        Returns:
+            Any: Setting value.
+        """
+        values = self._ensure_loaded()
+        if key in values:
+            return values[key]
+        definition = SETTING_DEFINITIONS.get(key)
+        if default is None and definition is not None:
+            return definition[1]
+        return default
+
+    def invalidate(self) -> None:
+        """
+        Bump shared settings version so every worker reloads settings.
+        """
+        bump_version(cache, self.version_key)
+        self._checked_at = 0.0
+
+
+site_settings = SiteSettingsRegistry()
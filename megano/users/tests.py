@@ -0,0 +1,46 @@
+"""
+Users app tests.
+"""
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.test import TestCase, override_settings
+
+from .models import SiteSetting
+from .site_settings import SiteSettingsRegistry
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SITE_SETTINGS_CHECK_INTERVAL=0)
+class SiteSettingsRegistryTests(TestCase):
+    """
+    Tests of the typed site settings registry.
+    """
+    def save_setting(self, key: str, value: str) -> None:
+        with self.captureOnCommitCallbacks(execute=True):
+            SiteSetting.objects.update_or_create(key=key, defaults={'value': value})
+
+    def test_values_are_typed(self):
+        self.save_setting('express_delivery_price', ' 7.50 ')
+        self.assertEqual(SiteSettingsRegistry().get('express_delivery_price'), Decimal('7.50'))
+
+    def test_declared_default_is_used(self):
+        self.assertEqual(SiteSettingsRegistry().get('free_delivery_min_price'), Decimal('20'))
+        self.assertEqual(SiteSettingsRegistry().get('unknown', 'fallback'), 'fallback')
+
+    def test_invalid_value_falls_back_to_default(self):
+        SiteSetting.objects.create(key='default_delivery_price', value='free')
+        self.assertEqual(SiteSettingsRegistry().get('default_delivery_price'), Decimal('2'))
+
+    def test_invalid_value_is_rejected(self):
+        with self.assertRaises(ValidationError):
+            SiteSetting(key='default_delivery_price', value='free').clean()
+
+    def test_change_is_seen_by_other_workers(self):
+        worker = SiteSettingsRegistry()
+        self.assertEqual(worker.get('express_delivery_price'), Decimal('5'))
+        with self.assertNumQueries(0):
+            worker.get('express_delivery_price')
+        self.save_setting('express_delivery_price', '9')
+        self.assertEqual(worker.get('express_delivery_price'), Decimal('9'))
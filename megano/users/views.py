@@ -4,7 +4,6 @@ A module contains views for users app requests.
 from json import loads
 from typing import Any
 
-from django.core.cache import cache
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User, Permission
 from django.db import IntegrityError
@@ -14,8 +13,10 @@ from rest_framework.views import APIView, Response, Request
 from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.permissions import IsAuthenticated
 
-from .models import Profile, Image, SiteSetting
+from basket.misc import merge_baskets
+from .models import Profile, Image
 from .serializers import ProfileSerializer
+from .site_settings import site_settings
 
 
 class SignUpView(APIView):
@@ -52,6 +53,7 @@ class SignUpView(APIView):
             user = authenticate(request, username=username, password=password)
         Profile.objects.create(user=user, fullName=full_name)
         login(request=self.request, user=user)
+        merge_baskets(request, user)
 
         return Response(status=status.HTTP_201_CREATED)
 
@@ -89,6 +91,7 @@ class SignInView(APIView):
         user = authenticate(request, username=username, password=password)
         if user is not None:
             login(request, user)
+            merge_baskets(request, user)
             return Response(status=status.HTTP_200_OK)
         raise AuthenticationFailed('Invalid credentials')
 
@@ -107,15 +110,18 @@ class SignOutView(APIView):
     permission_classes: list[Permission] = [IsAuthenticated]
 
     @classmethod
-    def post(cls, request: Request) -> None:
+    def post(cls, request: Request) -> Response:
         """
         Handle post requests
 
         Args:
             request: Current HTTP request.
 
+        Returns:
+            Response: The response with 200 status code.
         """
         logout(request)
+        return Response(status=status.HTTP_200_OK)
 
 
 class ProfileView(APIView):
@@ -223,15 +229,6 @@ def get_setting(key, default=None) -> Any:
         default: Default value of setting. Used if the value isn't found in the database.
 
     Returns:
-        Any: Setting value.
+        Any: Typed setting value.
     """
-    cached_value = cache.get(f'{key}')
-    if cached_value is not None:
-        return cached_value
-
-    try:
-        setting = SiteSetting.objects.get(key=key)
-        cache.set(f'site_setting_{key}', setting.value, timeout=3600)
-        return setting.value
-    except SiteSetting.DoesNotExist:
-        return default
+    return site_settings.get(key, default)